@@ -0,0 +1,41 @@
+"""row versions for tasks and users
+
+Revision ID: 3f6c1d9e2b70
+Revises: 8a4d2b7e6f13
+Create Date: 2026-10-17 19:12:44.210385
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6c1d9e2b70'
+down_revision: Union[str, None] = '8a4d2b7e6f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant server default does not rewrite the table on Postgres 11+
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+    op.add_column('tasks', sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+    op.execute(
+        "CREATE OR REPLACE FUNCTION bump_row_version() RETURNS trigger AS $$ "
+        "BEGIN NEW.version := OLD.version + 1; RETURN NEW; END $$ LANGUAGE plpgsql"
+    )
+    for table in ('users', 'tasks'):
+        op.execute(
+            f"CREATE TRIGGER {table}_bump_version BEFORE UPDATE ON {table} "
+            "FOR EACH ROW EXECUTE FUNCTION bump_row_version()"
+        )
+
+
+def downgrade() -> None:
+    for table in ('tasks', 'users'):
+        op.execute(f"DROP TRIGGER {table}_bump_version ON {table}")
+    op.execute("DROP FUNCTION bump_row_version()")
+    op.drop_column('tasks', 'version')
+    op.drop_column('users', 'version')
@@ -0,0 +1,31 @@
+"""add keyset pagination indexes on tasks
+
+Revision ID: 5c1e8f3a9d42
+Revises: b732f0cec12b
+Create Date: 2026-10-17 10:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e8f3a9d42'
+down_revision: Union[str, None] = 'b732f0cec12b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so the tasks table stays writable while the indexes are created
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tasks_creation_date_id', 'tasks', ['creation_date', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_tasks_due_date_id', 'tasks', ['due_date', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_tasks_due_date_id', table_name='tasks', postgresql_concurrently=True)
+        op.drop_index('ix_tasks_creation_date_id', table_name='tasks', postgresql_concurrently=True)
@@ -0,0 +1,40 @@
+"""owner-scoped task listing indexes
+
+Revision ID: 8a4d2b7e6f13
+Revises: 5c1e8f3a9d42
+Create Date: 2026-10-17 11:03:27.581940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4d2b7e6f13'
+down_revision: Union[str, None] = '5c1e8f3a9d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Listings are now always scoped to one user, so the unscoped keyset indexes are replaced
+    # by user-prefixed ones; built concurrently so the tasks table stays writable
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tasks_user_id_creation_date_id', 'tasks', ['user_id', 'creation_date', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_tasks_user_id_due_date_id', 'tasks', ['user_id', 'due_date', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_tasks_user_id_completed_creation_date_id', 'tasks', ['user_id', 'completed', 'creation_date', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_tasks_user_id_completed_due_date_id', 'tasks', ['user_id', 'completed', 'due_date', 'id'], unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_tasks_due_date_id', table_name='tasks', postgresql_concurrently=True)
+        op.drop_index('ix_tasks_creation_date_id', table_name='tasks', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tasks_creation_date_id', 'tasks', ['creation_date', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_tasks_due_date_id', 'tasks', ['due_date', 'id'], unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_tasks_user_id_completed_due_date_id', table_name='tasks', postgresql_concurrently=True)
+        op.drop_index('ix_tasks_user_id_completed_creation_date_id', table_name='tasks', postgresql_concurrently=True)
+        op.drop_index('ix_tasks_user_id_due_date_id', table_name='tasks', postgresql_concurrently=True)
+        op.drop_index('ix_tasks_user_id_creation_date_id', table_name='tasks', postgresql_concurrently=True)
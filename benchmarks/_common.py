@@ -0,0 +1,106 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Functions:
+    - percentile: Returns the given percentile of a list of samples.
+    - summarise: Summarises latency samples, errors and elapsed time as throughput and percentiles.
+    - run_load: Issues requests with bounded concurrency and summarises latency and throughput.
+    - print_report: Prints one summary line per scenario.
+"""
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Returns the given percentile of a list of samples (nearest-rank method).
+
+    Args:
+        samples (List[float]): The measured values.
+        pct (float): The percentile to compute, between 0 and 100.
+
+    Returns:
+        float: The percentile value, or 0.0 for an empty sample list.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(int(math.ceil(pct / 100.0 * len(ordered))) - 1, 0)
+    return ordered[rank]
+
+
+def summarise(latencies: List[float], errors: int, elapsed: float, total: Optional[int] = None) -> Dict[str, float]:
+    """
+    Summarises a run as throughput and latency percentiles.
+
+    Args:
+        latencies (List[float]): Per-request latencies in milliseconds.
+        errors (int): Number of failed requests.
+        elapsed (float): Wall-clock duration of the run in seconds.
+        total (int, optional): Requests issued; defaults to the number of latency samples.
+
+    Returns:
+        Dict[str, float]: Throughput (requests/s), error count and p50/p95/p99 latency in milliseconds.
+    """
+    total = len(latencies) if total is None else total
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def run_load(
+    make_request: Callable[[int], Awaitable[object]],
+    total: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    """
+    Issues `total` requests with at most `concurrency` of them in flight.
+
+    Args:
+        make_request (Callable[[int], Awaitable]): Coroutine factory called with the request index.
+        total (int): Number of requests to issue.
+        concurrency (int): Maximum number of requests in flight at once.
+
+    Returns:
+        Dict[str, float]: Throughput (requests/s), error count and p50/p95/p99 latency in milliseconds.
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            started = time.perf_counter()
+            try:
+                await make_request(index)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarise(latencies, errors, time.perf_counter() - started, total)
+
+
+def print_report(name: str, result: Dict[str, float]) -> None:
+    """
+    Prints one summary line for a scenario.
+
+    Args:
+        name (str): The scenario name.
+        result (Dict[str, float]): The summary returned by `run_load`.
+    """
+    print(
+        f"{name:<28} {result['throughput']:>10.1f} req/s  "
+        f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms p99={result['p99_ms']:.2f}ms  "
+        f"errors={result['errors']}"
+    )
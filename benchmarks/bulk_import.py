@@ -0,0 +1,104 @@
+"""
+Task import throughput: COPY through a staging table vs one create_new_task per row
+
+Generates an NDJSON and a CSV upload of tasks and imports them for a scratch user with
+`importer.import_tasks`, which validates every row and streams it into a COPY, and imports a
+smaller sample through `services.create_new_task`, one validated `INSERT ... RETURNING` and commit
+per task. Prints rows per second for each.
+
+Usage:
+    python -m benchmarks.bulk_import --rows 200000 --sample 2000
+
+Requires the database configured through the usual POSTGRES_* environment variables, migrated to
+the latest revision, and writes (then deletes) a scratch user and their tasks.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import delete, select
+
+from config import db_settings
+from tasks_app.auth.schema import TokenData
+from tasks_app.db_models.models import User
+from tasks_app.tasks import importer, services
+from tasks_app.tasks.schema import TaskCreate
+
+EMAIL = "bulk-import@bench.invalid"
+
+
+def task(number: int) -> dict:
+    return {
+        "title": f"imported task {number}",
+        "description": f"moved over from another tool, row {number}",
+        "due_date": f"2030-01-{number % 28 + 1:02d}T09:00:00",
+        "creation_date": "2024-01-01T00:00:00",
+    }
+
+
+def ndjson_upload(rows: int) -> bytes:
+    return "".join(json.dumps(task(number)) + "\n" for number in range(rows)).encode()
+
+
+def csv_upload(rows: int) -> bytes:
+    lines = ["title,description,due_date,creation_date"]
+    lines += [",".join(f'"{value}"' for value in task(number).values()) for number in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def chunked(data: bytes, size: int = 1 << 16):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def timed_import(data: bytes, format: str, owner_id: int) -> dict:
+    started = time.perf_counter()
+    async with db_settings.AsyncSessionLocal() as database:
+        result = await importer.import_tasks(chunked(data), format, owner_id, database)
+    elapsed = time.perf_counter() - started
+    return {"name": f"COPY import, {format}", "rows": result.imported, "rejected": result.rejected,
+            "seconds": elapsed}
+
+
+async def timed_creates(rows: int, principal: TokenData) -> dict:
+    started = time.perf_counter()
+    for number in range(rows):
+        async with db_settings.AsyncSessionLocal() as database:
+            await services.create_new_task(TaskCreate.model_validate(task(number)), principal, database)
+    elapsed = time.perf_counter() - started
+    return {"name": "create_new_task per row", "rows": rows, "rejected": 0, "seconds": elapsed}
+
+
+async def main(rows: int, sample: int) -> None:
+    try:
+        async with db_settings.AsyncSessionLocal() as database:
+            database.add(User(name="bench", email=EMAIL, password_hash="-"))
+            await database.commit()
+            owner_id = (await database.scalars(select(User.id).where(User.email == EMAIL))).one()
+        principal = TokenData(email=EMAIL, id=owner_id)
+
+        results = [
+            await timed_import(ndjson_upload(rows), "ndjson", owner_id),
+            await timed_import(csv_upload(rows), "csv", owner_id),
+            await timed_creates(sample, principal),
+        ]
+    finally:
+        async with db_settings.AsyncSessionLocal() as database:
+            # The tasks go with the user (ON DELETE CASCADE)
+            await database.execute(delete(User).where(User.email == EMAIL))
+            await database.commit()
+        await db_settings.async_engine.dispose()
+
+    print(f"{'import':<26} {'rows':>8} {'rejected':>9} {'seconds':>8} {'rows/s':>9}")
+    for result in results:
+        print(f"{result['name']:<26} {result['rows']:>8} {result['rejected']:>9} {result['seconds']:>8.2f} "
+              f"{result['rows'] / result['seconds']:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=200000, help="rows per COPY import")
+    parser.add_argument("--sample", type=int, default=2000, help="rows created one by one")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.sample))
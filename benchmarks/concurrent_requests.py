@@ -0,0 +1,66 @@
+"""
+Concurrent-request throughput: blocking `Session` vs `AsyncSession`
+
+Mounts two otherwise identical `async def` routes on a scratch FastAPI app, one querying through the
+synchronous `db_settings.get_db` session (the old code path) and one through `db_settings.get_async_db`,
+and drives both in-process with `httpx.AsyncClient` at the same concurrency. Each request runs
+`SELECT pg_sleep(:delay)` to stand in for a slow query.
+
+With the synchronous session every query stalls the event loop, so throughput is capped at roughly
+`1 / delay` requests per second no matter how many requests are in flight. With the async session the
+cap becomes the connection pool size divided by the delay.
+
+Usage:
+    python -m benchmarks.concurrent_requests --requests 1000 --concurrency 200 --delay 0.02
+
+Requires the database configured through the usual POSTGRES_* environment variables.
+"""
+import argparse
+import asyncio
+
+from fastapi import Depends, FastAPI
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import db_settings
+from benchmarks._common import print_report, run_load
+
+QUERY = text("SELECT pg_sleep(:delay)")
+
+
+def build_app(delay: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/blocking")
+    async def blocking():
+        # Opened inline rather than through `Depends(get_db)`: under high concurrency the threadpool
+        # that runs sync dependency teardown fills with checkouts waiting on the pool and deadlocks.
+        with db_settings.SessionLocal() as database:
+            database.execute(QUERY, {"delay": delay})
+        return {"ok": True}
+
+    @app.get("/async")
+    async def non_blocking(database: AsyncSession = Depends(db_settings.get_async_db)):
+        await database.execute(QUERY, {"delay": delay})
+        return {"ok": True}
+
+    return app
+
+
+async def main(total: int, concurrency: int, delay: float) -> None:
+    app = build_app(delay)
+    async with AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+        for name, path in (("before: blocking Session", "/blocking"), ("after: AsyncSession", "/async")):
+            result = await run_load(lambda _: client.get(path), total, concurrency)
+            print_report(name, result)
+    await db_settings.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.02, help="seconds each query sleeps server-side")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.delay))
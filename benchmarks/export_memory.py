@@ -0,0 +1,130 @@
+"""
+Worker memory while exporting a large task list: streamed export vs materialized ORM objects
+
+Gives a scratch user generated tasks, then measures the process' resident set size (RSS) while
+`GET /task/export` streams them through the application, and, for comparison, while the same
+tasks are loaded as ORM objects and encoded in one piece as the export would without a
+server-side cursor. The ASGI app is called directly with a `send` that counts and discards the
+body, so no client buffers the response; RSS is sampled on every body chunk.
+
+Usage:
+    python -m benchmarks.export_memory --tasks 1000000
+
+Requires the database configured through the usual POSTGRES_* environment variables, migrated to
+the latest revision, and writes (then deletes) a scratch user and their tasks.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from sqlalchemy import delete, select, text
+
+from config import db_settings
+from main import app
+from tasks_app.auth.jwt import create_access_token
+from tasks_app.db_models.models import Task, User
+from tasks_app.tasks.export import EXPORT_COLUMNS
+
+EMAIL = "export-memory@bench.invalid"
+
+FILL = text("""
+    INSERT INTO tasks (title, description, due_date, creation_date, completed, user_id)
+    SELECT 'task ' || i, repeat('exported task ', 8), now() + i * interval '1 minute', now(), i % 3 = 0, :user_id
+    FROM generate_series(1, :total) AS i
+""")
+
+
+def rss_mib() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+async def streamed(token: str, export_format: str, encoding: str) -> dict:
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "path": "/task/export",
+        "raw_path": b"/task/export", "root_path": "", "query_string": f"format={export_format}".encode(),
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode()),
+                    (b"accept-encoding", encoding.encode())],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    received = {"bytes": 0, "peak": rss_mib(), "status": None}
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+    disconnected = asyncio.Event()
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # The client stays connected until the whole body has been sent
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            received["bytes"] += len(message.get("body", b""))
+            received["peak"] = max(received["peak"], rss_mib())
+
+    before = rss_mib()
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    disconnected.set()
+    return {
+        "name": f"streamed {export_format}, {encoding}", "status": received["status"],
+        "mib": received["bytes"] / 2 ** 20, "seconds": time.perf_counter() - started,
+        "growth": received["peak"] - before,
+    }
+
+
+async def materialized(owner_id: int) -> dict:
+    before = rss_mib()
+    started = time.perf_counter()
+    async with db_settings.AsyncSessionLocal() as database:
+        tasks = (await database.scalars(select(Task).where(Task.user_id == owner_id).order_by(Task.id))).all()
+        body = "".join(
+            json.dumps({name: getattr(task, name) for name in EXPORT_COLUMNS}, default=str) + "\n" for task in tasks
+        ).encode()
+        peak = rss_mib()
+    return {
+        "name": "materialized ORM, ndjson", "status": 200, "mib": len(body) / 2 ** 20,
+        "seconds": time.perf_counter() - started, "growth": peak - before,
+    }
+
+
+async def main(total: int) -> None:
+    try:
+        async with db_settings.AsyncSessionLocal() as database:
+            database.add(User(name="bench", email=EMAIL, password_hash="-"))
+            await database.commit()
+            owner_id = (await database.scalars(select(User.id).where(User.email == EMAIL))).one()
+            await database.execute(FILL, {"user_id": owner_id, "total": total})
+            await database.commit()
+        token = create_access_token({"sub": EMAIL, "uid": owner_id})
+
+        # The streamed runs go first, before the materialized run has grown the heap
+        rows = [
+            await streamed(token, "ndjson", "identity"),
+            await streamed(token, "csv", "identity"),
+            await streamed(token, "ndjson", "gzip"),
+            await materialized(owner_id),
+        ]
+    finally:
+        async with db_settings.AsyncSessionLocal() as database:
+            # The tasks go with the user (ON DELETE CASCADE)
+            await database.execute(delete(User).where(User.email == EMAIL))
+            await database.commit()
+        await db_settings.async_engine.dispose()
+
+    print(f"{total} tasks")
+    print(f"{'export':<28} {'status':>6} {'MiB sent':>9} {'seconds':>8} {'RSS growth MiB':>15}")
+    for row in rows:
+        print(f"{row['name']:<28} {row['status']:>6} {row['mib']:>9.1f} {row['seconds']:>8.2f} {row['growth']:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tasks", type=int, default=1000000, help="tasks of the exporting user")
+    args = parser.parse_args()
+    asyncio.run(main(args.tasks))
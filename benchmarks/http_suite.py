@@ -0,0 +1,545 @@
+"""
+HTTP benchmark suite: throughput and p50/p95/p99 latency of every route, saved as JSON and compared
+
+Drives the application from `main.py` in-process with concurrent `httpx.AsyncClient` workloads
+against the database configured through the usual POSTGRES_* environment variables. WebSockets
+are driven through the ASGI interface directly, since httpx has no WebSocket client. Scenarios:
+
+    - login_storm: concurrent POST /login for the suite's users.
+    - task_crud: a seeded mix of task creates, reads, lists, full and partial updates, deletes and
+      batches plus user lookups, summarised overall and per route.
+    - deep_pagination: walkers follow next_cursor through every task of a user with --page-tasks
+      tasks, in both sort orders, and through a search matching all of them.
+    - bulk_transfer: full exports of that user's tasks alternating with small NDJSON imports.
+    - ws_fanout: each user holds --ws-sockets task streams while writers create tasks; latency runs
+      from sending the POST to each socket receiving the event, and throughput counts deliveries.
+
+Every scenario first runs --warmup operations that are not recorded, then is measured --rounds
+times, keeping the round with the median throughput. Which operation each index performs depends
+only on --seed, so runs issue the same request mix. The results are written as JSON together with
+the git revision, the Python and Postgres versions, the CPU count, the parameters and the pool,
+hashing, WebSocket and cache settings, so that runs on different machines or settings are not
+mistaken for regressions.
+
+`compare` reads two result files and flags every scenario or route whose throughput fell, or
+whose p50, p95 or p99 rose, by more than --threshold percent (latencies also by more than
+--min-ms), or that failed more requests. It exits with status 1 if anything regressed.
+
+Usage:
+    python -m benchmarks.http_suite run --output baseline.json
+    python -m benchmarks.http_suite run --scenarios task_crud,deep_pagination --output candidate.json
+    python -m benchmarks.http_suite compare baseline.json candidate.json --threshold 10
+
+Requires the database migrated to the latest revision, e.g. a local one started with
+`docker compose up -d db_postgres` and POSTGRES_SERVER=localhost, and writes (then deletes)
+scratch users and their tasks.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from httpx import AsyncClient, Response
+from sqlalchemy import delete, select, text
+
+from config import db_settings
+from main import app
+from tasks_app.db_models.models import User
+from benchmarks._common import print_report, run_load, summarise
+
+EMAIL = "http-suite-{}@example.com"
+PASSWORD = "http-suite-password"
+
+SCENARIOS = ("login_storm", "task_crud", "deep_pagination", "bulk_transfer", "ws_fanout")
+
+# Relative frequency of each request in the task_crud mix
+CRUD_MIX = {
+    "GET /task/{task_id}": 30,
+    "GET /task/": 20,
+    "POST /task/tasks/": 15,
+    "PUT /task/tasks/{task_id}": 10,
+    "PATCH /task/{task_id}": 10,
+    "DELETE /task/{task_id}": 5,
+    "POST /task/tasks/batch": 5,
+    "GET /user/{user_id}": 5,
+}
+
+# Tasks each user starts the task_crud mix with
+CRUD_SEED_TASKS = 50
+
+# The deep_pagination walks: route and query parameters
+WALKS = (
+    ("GET /task/", {"order_by": "creation_date", "direction": "asc"}),
+    ("GET /task/", {"order_by": "due_date", "direction": "desc"}),
+    ("GET /task/search", {"q": "paged"}),
+)
+
+FILL = text("""
+    INSERT INTO tasks (title, description, due_date, creation_date, completed, user_id)
+    SELECT 'paged task ' || i, repeat('paginated by the suite ', 4),
+           timestamp '2030-01-01' + (i % 1000) * interval '1 hour',
+           timestamp '2024-01-01' + i * interval '1 second', i % 3 = 0, :user_id
+    FROM generate_series(1, :total) AS i
+""")
+
+# Environment settings recorded with each run
+SETTING_PREFIXES = ("DB_POOL_", "DB_MAX_OVERFLOW", "ARGON2_", "HASH_", "WS_", "TASK_EVENTS_", "READ_CACHE_", "EXPORT_")
+
+# Summary fields compared between runs; throughput regresses when it falls, latencies when they rise
+LATENCIES = ("p50_ms", "p95_ms", "p99_ms")
+
+# An operation of a scenario, the number of operations per round and how many run at once
+Workload = Tuple[Callable[[int], Awaitable[None]], int, int]
+
+
+class Recorder:
+    """
+    Collects the per-route latencies and failures of one round.
+
+    Attributes:
+        enabled (bool): Whether requests are recorded; off during the warm-up.
+        latencies (Dict[str, List[float]]): Latencies in milliseconds by route.
+        errors (Dict[str, int]): Failed requests by route.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, route: str, latencies: List[float], errors: int = 0) -> None:
+        if self.enabled:
+            self.latencies[route].extend(latencies)
+            self.errors[route] += errors
+
+    async def send(self, route: str, request: Awaitable[Response], expected: Tuple[int, ...] = (200,)) -> Response:
+        """
+        Awaits a request and records its latency under `route`.
+
+        Raises:
+            RuntimeError: If the request failed or answered with an unexpected status.
+        """
+        started = time.perf_counter()
+        try:
+            response = await request
+        except Exception as error:
+            self.record(route, [(time.perf_counter() - started) * 1000], 1)
+            raise RuntimeError(f"{route}: {error!r}") from error
+        failed = response.status_code not in expected
+        self.record(route, [(time.perf_counter() - started) * 1000], int(failed))
+        if failed:
+            raise RuntimeError(f"{route}: {response.status_code} {response.text[:200]}")
+        return response
+
+    def result(self, elapsed: float) -> dict:
+        latencies = [latency for samples in self.latencies.values() for latency in samples]
+        result = summarise(latencies, sum(self.errors.values()), elapsed)
+        if len(self.latencies) > 1:
+            result["routes"] = {
+                route: summarise(samples, self.errors[route], elapsed) for route, samples in sorted(self.latencies.items())
+            }
+        return result
+
+
+class WebSocketClient:
+    """
+    A task stream opened on the ASGI app, recording when each task event arrives.
+
+    Args:
+        path (str): The WebSocket path, including the query string.
+        arrivals (Dict[int, List[float]]): Shared by the sockets; receives the arrival times of
+            each task's events, keyed by task id.
+    """
+
+    def __init__(self, path: str, arrivals: Dict[int, List[float]]):
+        self.path, _, self.query = path.partition("?")
+        self.arrivals = arrivals
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.accepted = asyncio.Event()
+        self.closed: Optional[dict] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "ws",
+            "path": self.path, "raw_path": self.path.encode(), "root_path": "", "query_string": self.query.encode(),
+            "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 0), "server": ("bench", 80), "subprotocols": [],
+        }
+        self.incoming.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.create_task(app(scope, self.incoming.get, self._send))
+        await self.accepted.wait()
+        if self.closed is not None:
+            raise RuntimeError(f"WebSocket refused: {self.closed}")
+
+    async def _send(self, message: dict) -> None:
+        if message["type"] == "websocket.accept":
+            self.accepted.set()
+        elif message["type"] == "websocket.send":
+            arrived = time.perf_counter()
+            event = json.loads(message.get("text") or "null")
+            if isinstance(event, dict) and "task_id" in event:
+                self.arrivals[event["task_id"]].append(arrived)
+        elif message["type"] == "websocket.close":
+            self.closed = message
+            self.accepted.set()
+
+    async def close(self) -> None:
+        self.incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+class Suite:
+    """
+    The client, scratch users and options shared by the scenarios.
+
+    Attributes:
+        users (List[dict]): The scratch users, each with its id, email, token and Authorization headers.
+        sockets (List[WebSocketClient]): Task streams held open by ws_fanout until the suite ends.
+        recorder (Recorder): Where the running round records its requests.
+    """
+
+    def __init__(self, client: AsyncClient, args: argparse.Namespace):
+        self.client = client
+        self.args = args
+        self.users: List[dict] = []
+        self.pager: Optional[dict] = None
+        self.sockets: List[WebSocketClient] = []
+        self.recorder = Recorder()
+
+    def rng(self, index: int) -> random.Random:
+        # Seeded per operation so that the mix does not depend on how the workers interleave
+        return random.Random(self.args.seed * 1000003 + index)
+
+    async def add_user(self, number: int) -> dict:
+        email = EMAIL.format(number)
+        response = await self.client.post("/user/", json={"name": f"suite {number}", "email": email, "password": PASSWORD})
+        if response.status_code != 201:
+            raise RuntimeError(f"Could not register {email}: {response.text}")
+        response = await self.client.post("/login", data={"username": email, "password": PASSWORD})
+        token = response.json()["access_token"]
+        async with db_settings.AsyncSessionLocal() as database:
+            user_id = await database.scalar(select(User.id).where(User.email == email))
+        return {"id": user_id, "email": email, "token": token, "headers": {"Authorization": f"Bearer {token}"}}
+
+    async def paged_user(self) -> dict:
+        # Created on first use, shared by deep_pagination and bulk_transfer
+        if self.pager is None:
+            self.pager = await self.add_user(len(self.users))
+            async with db_settings.AsyncSessionLocal() as database:
+                await database.execute(FILL, {"user_id": self.pager["id"], "total": self.args.page_tasks})
+                await database.commit()
+        return self.pager
+
+
+def task_payload(rng: random.Random) -> dict:
+    number = rng.randrange(10 ** 6)
+    return {
+        "title": f"suite task {number}",
+        "description": f"written by the benchmark suite, #{number}",
+        "due_date": f"2030-01-{number % 28 + 1:02d}T09:00:00",
+        "creation_date": "2024-01-01T00:00:00",
+    }
+
+
+async def login_storm(suite: Suite) -> Workload:
+    async def login(index: int) -> None:
+        user = suite.users[index % len(suite.users)]
+        await suite.recorder.send("POST /login", suite.client.post(
+            "/login", data={"username": user["email"], "password": PASSWORD}
+        ))
+
+    return login, suite.args.logins, suite.args.login_concurrency
+
+
+async def task_crud(suite: Suite) -> Workload:
+    # Reads and updates use each user's seeded tasks; deletes only take tasks the mix created, so no
+    # request races a deletion of its task
+    seeded: Dict[int, List[int]] = {}
+    created: Dict[int, List[int]] = defaultdict(list)
+    for user in suite.users:
+        batch = {"create": [task_payload(suite.rng(-1 - number)) for number in range(CRUD_SEED_TASKS)]}
+        response = await suite.client.post("/task/tasks/batch", json=batch, headers=user["headers"])
+        seeded[user["id"]] = [result["id"] for result in response.json()["results"]]
+    routes, weights = list(CRUD_MIX), list(CRUD_MIX.values())
+
+    async def operation(index: int) -> None:
+        rng = suite.rng(index)
+        user = suite.users[index % len(suite.users)]
+        route = rng.choices(routes, weights)[0]
+        task_id = rng.choice(seeded[user["id"]])
+        send, client, headers = suite.recorder.send, suite.client, user["headers"]
+        if route == "DELETE /task/{task_id}" and not created[user["id"]]:
+            route = "POST /task/tasks/"
+
+        if route == "GET /task/{task_id}":
+            await send(route, client.get(f"/task/{task_id}", headers=headers))
+        elif route == "GET /task/":
+            await send(route, client.get("/task/", params={"limit": 20}, headers=headers))
+        elif route == "POST /task/tasks/":
+            response = await send(route, client.post("/task/tasks/", json=task_payload(rng), headers=headers), (201,))
+            created[user["id"]].append(response.json()["id"])
+        elif route == "PUT /task/tasks/{task_id}":
+            await send(route, client.put(f"/task/tasks/{task_id}", json=task_payload(rng), headers=headers))
+        elif route == "PATCH /task/{task_id}":
+            await send(route, client.patch(f"/task/{task_id}", json={"completed": rng.random() < 0.5}, headers=headers))
+        elif route == "DELETE /task/{task_id}":
+            doomed = created[user["id"]].pop(rng.randrange(len(created[user["id"]])))
+            await send(route, client.delete(f"/task/{doomed}", headers=headers))
+        elif route == "POST /task/tasks/batch":
+            doomed = created[user["id"]][-2:]
+            del created[user["id"]][-2:]
+            batch = {
+                "create": [task_payload(rng) for _ in range(5)],
+                "update": [{"id": rng.choice(seeded[user["id"]]), **task_payload(rng)} for _ in range(3)],
+                "delete": doomed,
+            }
+            response = await send(route, client.post("/task/tasks/batch", json=batch, headers=headers))
+            created[user["id"]].extend(result["id"] for result in response.json()["results"] if result["op"] == "create")
+        else:
+            await send(route, client.get(f"/user/{user['id']}", headers=headers))
+
+    return operation, suite.args.crud_requests, suite.args.concurrency
+
+
+async def deep_pagination(suite: Suite) -> Workload:
+    user = await suite.paged_user()
+
+    async def walk(index: int) -> None:
+        route, params = WALKS[index % len(WALKS)]
+        params = {**params, "limit": suite.args.page_size}
+        while True:
+            response = await suite.recorder.send(route, suite.client.get(
+                route.split(" ", 1)[1], params=params, headers=user["headers"]
+            ))
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                return
+            params["cursor"] = cursor
+
+    return walk, suite.args.walks, suite.args.walkers
+
+
+async def bulk_transfer(suite: Suite) -> Workload:
+    pager = await suite.paged_user()
+
+    async def transfer(index: int) -> None:
+        if index % 2 == 0:
+            await suite.recorder.send("GET /task/export", suite.client.get("/task/export", headers=pager["headers"]))
+            return
+        rng = suite.rng(index)
+        body = "".join(json.dumps(task_payload(rng)) + "\n" for _ in range(suite.args.import_rows))
+        user = suite.users[index % len(suite.users)]
+        await suite.recorder.send("POST /task/import", suite.client.post(
+            "/task/import", content=body.encode(), headers=user["headers"]
+        ))
+
+    return transfer, suite.args.transfers, suite.args.transfer_concurrency
+
+
+async def ws_fanout(suite: Suite) -> Workload:
+    arrivals: Dict[int, List[float]] = defaultdict(list)
+    sockets = [
+        WebSocketClient(f"/task/ws/tasks/{number}?token={user['token']}", arrivals)
+        for user in suite.users for number in range(suite.args.ws_sockets)
+    ]
+    for socket in sockets:
+        suite.sockets.append(socket)
+        await socket.connect()
+
+    async def write(index: int) -> None:
+        user = suite.users[index % len(suite.users)]
+        sent = time.perf_counter()
+        response = await suite.client.post("/task/tasks/", json=task_payload(suite.rng(index)), headers=user["headers"])
+        if response.status_code != 201:
+            suite.recorder.record("POST /task/tasks/", [], 1)
+            raise RuntimeError(response.text)
+        task_id = response.json()["id"]
+        deadline = sent + suite.args.ws_timeout
+        while len(arrivals[task_id]) < suite.args.ws_sockets and time.perf_counter() < deadline:
+            await asyncio.sleep(0.001)
+        delivered = arrivals.pop(task_id, [])
+        suite.recorder.record(
+            "WS task.created", [(arrived - sent) * 1000 for arrived in delivered],
+            suite.args.ws_sockets - len(delivered),
+        )
+
+    return write, suite.args.ws_events, len(suite.users)
+
+
+async def run_scenario(suite: Suite, name: str) -> dict:
+    operation, total, concurrency = await globals()[name](suite)
+    suite.recorder = Recorder(enabled=False)
+    await run_load(operation, min(suite.args.warmup, total), concurrency)
+
+    rounds = []
+    for _ in range(suite.args.rounds):
+        suite.recorder = Recorder()
+        started = time.perf_counter()
+        await run_load(operation, total, concurrency)
+        rounds.append(suite.recorder.result(time.perf_counter() - started))
+    result = sorted(rounds, key=lambda round_: round_["throughput"])[len(rounds) // 2]
+    result["round_throughputs"] = [round_["throughput"] for round_ in rounds]
+    return result
+
+
+def git_revision() -> Optional[str]:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision.strip() + ("-dirty" if dirty.stdout.strip() else "")
+
+
+async def environment() -> dict:
+    async with db_settings.AsyncSessionLocal() as database:
+        postgres = await database.scalar(text("SHOW server_version"))
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "postgres": postgres,
+        "settings": {name: value for name, value in sorted(os.environ.items()) if name.startswith(SETTING_PREFIXES)},
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = {"environment": await environment(), "parameters": vars(args), "scenarios": {}}
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+            suite = Suite(client, args)
+            try:
+                for number in range(args.users):
+                    suite.users.append(await suite.add_user(number))
+                for name in names:
+                    report["scenarios"][name] = result = await run_scenario(suite, name)
+                    print_report(name, result)
+                    for route, summary in result.get("routes", {}).items():
+                        print_report(f"  {route}", summary)
+            finally:
+                for socket in suite.sockets:
+                    await socket.close()
+                async with db_settings.AsyncSessionLocal() as database:
+                    # The tasks go with the users (ON DELETE CASCADE)
+                    await database.execute(delete(User).where(User.email.like(EMAIL.format("%"))))
+                    await database.commit()
+    await db_settings.async_engine.dispose()
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+            output.write("\n")
+        print(f"Results written to {args.output}")
+
+
+def summaries(report: dict) -> Dict[str, dict]:
+    # Scenario summaries and their per-route breakdowns, keyed "scenario" and "scenario route"
+    flat = {}
+    for name, result in report["scenarios"].items():
+        flat[name] = result
+        for route, summary in result.get("routes", {}).items():
+            flat[f"{name} {route}"] = summary
+    return flat
+
+
+def regressions(base: dict, candidate: dict, threshold: float, min_ms: float) -> List[str]:
+    """
+    Compares two summaries and describes each metric that got worse beyond the threshold.
+
+    Args:
+        base (dict): The summary of the baseline run.
+        candidate (dict): The summary of the run being checked.
+        threshold (float): Allowed change, in percent.
+        min_ms (float): Latency increases up to this many milliseconds are never regressions.
+
+    Returns:
+        List[str]: One description per regressed metric.
+    """
+    found = []
+    if base["throughput"] and candidate["throughput"] < base["throughput"] * (1 - threshold / 100):
+        found.append(f"throughput {base['throughput']:.1f} -> {candidate['throughput']:.1f}/s")
+    for metric in LATENCIES:
+        before, after = base[metric], candidate[metric]
+        if after > before * (1 + threshold / 100) and after - before > min_ms:
+            found.append(f"{metric[:3]} {before:.2f} -> {after:.2f}ms")
+    if candidate["errors"] > base["errors"]:
+        found.append(f"errors {base['errors']} -> {candidate['errors']}")
+    return found
+
+
+def compare(args: argparse.Namespace) -> int:
+    with open(args.baseline) as baseline, open(args.candidate) as candidate:
+        base_report, candidate_report = json.load(baseline), json.load(candidate)
+    base, new = summaries(base_report), summaries(candidate_report)
+    for side, report in (("baseline", base_report), ("candidate", candidate_report)):
+        env = report["environment"]
+        print(f"{side:<10} {env['timestamp']} git={env['git']} cpus={env['cpus']} postgres={env['postgres']}")
+    if base_report["environment"]["settings"] != candidate_report["environment"]["settings"]:
+        print("warning: the runs used different settings")
+
+    regressed = 0
+    print(f"{'scenario / route':<48} {'req/s':>16} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}  verdict")
+    for key in sorted(set(base) & set(new)):
+        found = regressions(base[key], new[key], args.threshold, args.min_ms)
+        regressed += bool(found)
+        cells = [f"{base[key][metric]:>7.1f}>{new[key][metric]:<8.1f}" for metric in ("throughput",) + LATENCIES]
+        print(f"{key:<48} {' '.join(cells)}  {'REGRESSED: ' + ', '.join(found) if found else 'ok'}")
+    for key in sorted(set(base) ^ set(new)):
+        print(f"{key:<48} only in the {'baseline' if key in base else 'candidate'}")
+
+    print(f"{regressed} regression(s) beyond {args.threshold:g}%")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the scenarios and write their results")
+    run_parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenarios to run")
+    run_parser.add_argument("--output", help="JSON file to write the results to")
+    run_parser.add_argument("--seed", type=int, default=1, help="seed of the request mix")
+    run_parser.add_argument("--rounds", type=int, default=3, help="measured rounds per scenario; the median is kept")
+    run_parser.add_argument("--warmup", type=int, default=20, help="unrecorded operations before the rounds")
+    run_parser.add_argument("--users", type=int, default=8, help="scratch users sharing the load")
+    run_parser.add_argument("--concurrency", type=int, default=50, help="requests in flight in task_crud")
+    run_parser.add_argument("--logins", type=int, default=100)
+    run_parser.add_argument("--login-concurrency", type=int, default=20)
+    run_parser.add_argument("--crud-requests", type=int, default=2000)
+    run_parser.add_argument("--page-tasks", type=int, default=20000, help="tasks of the deep_pagination user")
+    run_parser.add_argument("--page-size", type=int, default=100)
+    run_parser.add_argument("--walks", type=int, default=3, help="walks to the last page per round")
+    run_parser.add_argument("--walkers", type=int, default=3, help="walks in progress at once")
+    run_parser.add_argument("--transfers", type=int, default=10, help="exports and imports per round")
+    run_parser.add_argument("--transfer-concurrency", type=int, default=2)
+    run_parser.add_argument("--import-rows", type=int, default=500)
+    run_parser.add_argument("--ws-sockets", type=int, default=20, help="task streams per user")
+    run_parser.add_argument("--ws-events", type=int, default=200, help="tasks created while the streams listen")
+    run_parser.add_argument("--ws-timeout", type=float, default=5.0, help="seconds to wait for an event's deliveries")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="allowed change in percent")
+    compare_parser.add_argument("--min-ms", type=float, default=1.0, help="latency increases ignored below this")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        asyncio.run(run(args))
+    else:
+        sys.exit(compare(args))
@@ -0,0 +1,101 @@
+"""
+Login storm: inline Argon2 vs the bounded hashing pool
+
+Fires a burst of concurrent logins at the app while a single client keeps polling an unrelated
+endpoint (GET /user/{id}), and reports login throughput plus the unrelated endpoint's latency.
+
+Two login routes are compared:
+    - before: a scratch `async def` route that verifies the password inline on the event loop,
+      which is what registration did before hashing moved to the pool;
+    - after: the real POST /login, which verifies on `hashing.hashing_pool`.
+
+Under the storm the inline route freezes the loop for every verify, so the unrelated endpoint's
+p99 grows to many hash durations; with the pool it stays close to its unloaded latency. Logins
+beyond HASH_MAX_PENDING are answered with 503 and counted separately.
+
+Usage:
+    python -m benchmarks.login_storm --logins 400 --concurrency 100
+
+Requires the database configured through the usual POSTGRES_* environment variables.
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import db_settings
+from main import app
+from tasks_app.db_models import hashing
+from tasks_app.db_models.models import User
+from benchmarks._common import percentile, print_report, run_load
+
+EMAIL = "login-storm@example.com"
+PASSWORD = "login-storm-password"
+
+
+@app.post("/bench/login-inline", include_in_schema=False)
+async def login_inline(
+    request: OAuth2PasswordRequestForm = Depends(),
+    database: AsyncSession = Depends(db_settings.get_async_db),
+):
+    user = (await database.execute(select(User).where(User.email == request.username))).scalars().first()
+    if not user or not hashing.verify_password(request.password, user.password):
+        raise HTTPException(status_code=400, detail="Invalid Password")
+    return {"ok": True}
+
+
+async def storm(client: AsyncClient, path: str, total: int, concurrency: int, user_id: int):
+    probe_latencies = []
+    rejected = 0
+    done = asyncio.Event()
+
+    async def login(_):
+        nonlocal rejected
+        response = await client.post(path, data={"username": EMAIL, "password": PASSWORD})
+        if response.status_code == 503:
+            rejected += 1
+        elif response.status_code != 200:
+            raise RuntimeError(response.text)
+
+    async def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.get(f"/user/{user_id}")
+            probe_latencies.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0.005)
+
+    prober = asyncio.create_task(probe())
+    result = await run_load(login, total, concurrency)
+    done.set()
+    await prober
+    return result, rejected, probe_latencies
+
+
+async def main(total: int, concurrency: int) -> None:
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+            await client.post("/user/", json={"name": "Storm", "email": EMAIL, "password": PASSWORD})
+            async with db_settings.AsyncSessionLocal() as database:
+                user_id = await database.scalar(select(User.id).where(User.email == EMAIL))
+
+            for name, path in (("before: inline verify", "/bench/login-inline"), ("after: hashing pool", "/login")):
+                result, rejected, probes = await storm(client, path, total, concurrency, user_id)
+                print_report(name, result)
+                print(
+                    f"{'':<28} rejected(503)={rejected}  unrelated GET /user/{{id}}: {len(probes)} requests "
+                    f"p50={percentile(probes, 50):.2f}ms p99={percentile(probes, 99):.2f}ms"
+                )
+    await db_settings.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.concurrency))
@@ -0,0 +1,119 @@
+"""
+Full-text task search latency over one user's large task list
+
+Fills the tasks of a scratch user (and optionally of other users) with generated titles and
+descriptions drawn from a skewed vocabulary, so that some words are in most tasks and others in a
+handful, then times `services.search_tasks` for rare, common and type-ahead (two-letter prefix)
+queries: the first page, and the page after it through the returned cursor.
+
+Usage:
+    python -m benchmarks.task_search --tasks 100000 --other-tasks 100000
+
+Requires the database configured through the usual POSTGRES_* environment variables, migrated to
+the latest revision, and writes (then deletes) the scratch users and their tasks.
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from typing import List
+
+from sqlalchemy import delete, func, literal, select, text
+from sqlalchemy.dialects.postgresql import REGCONFIG
+
+from benchmarks._common import percentile
+from config import db_settings
+from tasks_app.auth.schema import TokenData
+from tasks_app.db_models.models import TASK_SEARCH_CONFIG, Task, User
+from tasks_app.tasks import services
+
+EMAIL = "task-search@bench.invalid"
+OTHER_EMAIL = "task-search-other@bench.invalid"
+
+# 1000 pronounceable words; generated rows pick from them with a quadratic skew towards the first ones
+SYLLABLES = ["ka", "lo", "mi", "ren", "tas", "vo", "pe", "dri", "sun", "gal"]
+VOCABULARY = ["".join(parts) for parts in itertools.product(SYLLABLES, repeat=3)]
+
+FILL = text("""
+    INSERT INTO tasks (title, description, due_date, creation_date, completed, user_id)
+    SELECT
+        (SELECT string_agg(words[1 + floor(1000 * random() ^ 2)::int + 0 * g], ' ') FROM generate_series(1, 3 + 0 * i) AS g),
+        (SELECT string_agg(words[1 + floor(1000 * random() ^ 2)::int + 0 * g], ' ') FROM generate_series(1, 12 + 0 * i) AS g),
+        now() + i * interval '1 minute', now(), i % 3 = 0, :user_id
+    FROM generate_series(1, :total) AS i, CAST(:words AS text[]) AS words
+""")
+
+
+async def create_user(email: str, total: int) -> int:
+    async with db_settings.AsyncSessionLocal() as database:
+        database.add(User(name="bench", email=email, password_hash="-"))
+        await database.commit()
+        user_id = (await database.scalars(select(User.id).where(User.email == email))).one()
+        # `0 * i` makes each row run the subqueries again, so it gets its own words, and `0 * g` makes
+        # the aggregates belong to the subqueries rather than to the outer query
+        await database.execute(FILL, {"words": VOCABULARY, "user_id": user_id, "total": total})
+        await database.commit()
+    return user_id
+
+
+async def measure(principal: TokenData, query: str, rounds: int) -> dict:
+    first: List[float] = []
+    second: List[float] = []
+    for _ in range(rounds):
+        async with db_settings.AsyncSessionLocal() as database:
+            started = time.perf_counter()
+            tasks, cursor = await services.search_tasks(database, principal, query, 20)
+            first.append((time.perf_counter() - started) * 1000)
+            if cursor is not None:
+                started = time.perf_counter()
+                await services.search_tasks(database, principal, query, 20, cursor)
+                second.append((time.perf_counter() - started) * 1000)
+    async with db_settings.AsyncSessionLocal() as database:
+        tsquery = func.to_tsquery(literal(TASK_SEARCH_CONFIG, REGCONFIG), services.prefix_tsquery(query))
+        matches = await database.scalar(
+            select(func.count()).where(Task.user_id == principal.id, Task.search_vector.bool_op("@@")(tsquery))
+        )
+    return {
+        "query": query, "matches": matches,
+        "first_p50": percentile(first, 50), "first_p95": percentile(first, 95),
+        "next_p50": percentile(second, 50),
+    }
+
+
+async def main(total: int, other_total: int, rounds: int) -> None:
+    user_ids = []
+    try:
+        user_ids.append(await create_user(EMAIL, total))
+        if other_total:
+            user_ids.append(await create_user(OTHER_EMAIL, other_total))
+        async with db_settings.AsyncSessionLocal() as database:
+            await database.execute(text("ANALYZE tasks"))
+            await database.commit()
+        principal = TokenData(email=EMAIL, id=user_ids[0])
+        async with db_settings.AsyncSessionLocal() as database:
+            await services._get_owner_id(principal, database)
+
+        rare, common = VOCABULARY[-1], VOCABULARY[0]
+        rows = [await measure(principal, query, rounds)
+                for query in (rare, f"{common} {rare}", VOCABULARY[500], common, common[:2])]
+    finally:
+        async with db_settings.AsyncSessionLocal() as database:
+            # Their tasks go with them (ON DELETE CASCADE)
+            await database.execute(delete(User).where(User.email.in_([EMAIL, OTHER_EMAIL])))
+            await database.commit()
+        await db_settings.async_engine.dispose()
+
+    print(f"{total} tasks for the searching user, {other_total} for another user, 20 per page")
+    print(f"{'query':<22} {'matches':>8} {'page 1 p50 ms':>14} {'p95 ms':>8} {'page 2 p50 ms':>14}")
+    for row in rows:
+        print(f"{row['query']:<22} {row['matches']:>8} {row['first_p50']:>14.2f} {row['first_p95']:>8.2f} "
+              f"{row['next_p50']:>14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tasks", type=int, default=100000, help="tasks of the searching user")
+    parser.add_argument("--other-tasks", type=int, default=100000, help="tasks of another user")
+    parser.add_argument("--rounds", type=int, default=20, help="searches timed per query")
+    args = parser.parse_args()
+    asyncio.run(main(args.tasks, args.other_tasks, args.rounds))
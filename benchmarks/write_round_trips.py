@@ -0,0 +1,133 @@
+"""
+Round trips per single-task write: read-modify-write vs `... RETURNING`
+
+Runs the same create, update, partial update and delete sequence through the previous ORM
+read-modify-write implementations (INSERT then refresh; SELECT, setattr, COMMIT, refresh; SELECT
+then DELETE) and through the current service functions, which issue one `INSERT`/`UPDATE`/`DELETE
+... RETURNING` per write. Statements are counted with the query instrumentation of
+`config.db_queries`; the COMMIT every write ends with is not a statement and is not counted in
+either column.
+
+Usage:
+    python -m benchmarks.write_round_trips --tasks 200
+
+Requires the database configured through the usual POSTGRES_* environment variables, with the
+tables created, and writes (then deletes) tasks of a scratch user.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict
+
+from sqlalchemy import delete, select
+
+from config import db_queries, db_settings
+from tasks_app.auth.schema import TokenData
+from tasks_app.db_models.models import Task, User
+from tasks_app.realtime import events
+from tasks_app.tasks import services
+from tasks_app.tasks.schema import TaskCreate, TaskPatch, TaskUpdate
+
+EMAIL = "write-round-trips@bench.invalid"
+
+
+async def legacy_create(data: TaskCreate, owner_id: int, database) -> Task:
+    task = Task(**data.model_dump(), user_id=owner_id)
+    database.add(task)
+    await database.flush()
+    await services._commit_with_events(database, [events.task_event(events.TASK_CREATED, task.id, owner_id)])
+    await database.refresh(task)
+    return task
+
+
+async def legacy_update(task_id: int, changes: dict, database) -> Task:
+    task = await database.get(Task, task_id)
+    for key, value in changes.items():
+        setattr(task, key, value)
+    await services._commit_with_events(database, [events.task_event(events.TASK_UPDATED, task.id, task.user_id)])
+    await database.refresh(task)
+    return task
+
+
+async def legacy_delete(task_id: int, database) -> None:
+    task = await database.get(Task, task_id)
+    await database.delete(task)
+    await services._commit_with_events(database, [events.task_event(events.TASK_DELETED, task.id, task.user_id)])
+
+
+async def measure(name: str, write: Callable[[object], Awaitable], total: int) -> Dict[str, float]:
+    statements = 0
+    started = time.perf_counter()
+    for _ in range(total):
+        async with db_settings.AsyncSessionLocal() as database:
+            token = db_queries.start_request()
+            try:
+                await write(database)
+                statements += db_queries.current_stats().count
+            finally:
+                db_queries.end_request(token)
+    elapsed = time.perf_counter() - started
+    return {"name": name, "statements": statements / total, "ms": elapsed / total * 1000}
+
+
+async def main(total: int) -> None:
+    async with db_settings.AsyncSessionLocal() as database:
+        database.add(User(name="bench", email=EMAIL, password_hash="-"))
+        await database.commit()
+        owner_id = (await database.scalars(select(User.id).where(User.email == EMAIL))).one()
+    principal = TokenData(email=EMAIL, id=owner_id)
+    data = TaskCreate(title="bench", description="round trips", due_date=datetime(2030, 1, 1),
+                      creation_date=datetime(2024, 1, 1))
+    update = TaskUpdate(**{**data.model_dump(), "title": "renamed"})
+    patch = TaskPatch(completed=True)
+
+    ids = {"before": [], "after": []}
+
+    async def create_before(database):
+        ids["before"].append((await legacy_create(data, owner_id, database)).id)
+
+    async def create_after(database):
+        ids["after"].append((await services.create_new_task(data, principal, database)).id)
+
+    def cycle(key):
+        return iter(list(ids[key]))
+
+    try:
+        # Warm the user cache so that both sides count writes only
+        async with db_settings.AsyncSessionLocal() as database:
+            await services._get_owner_id(principal, database)
+        rows = [await measure("create", create_before, total), await measure("create", create_after, total)]
+
+        before, after = cycle("before"), cycle("after")
+        rows += [
+            await measure("update (PUT)", lambda db: legacy_update(next(before), update.model_dump(), db), total),
+            await measure("update (PUT)", lambda db: services.update_task_by_id(next(after), update, db), total),
+        ]
+        before, after = cycle("before"), cycle("after")
+        rows += [
+            await measure("partial update", lambda db: legacy_update(next(before), {"completed": True}, db), total),
+            await measure("partial update", lambda db: services.patch_task_by_id(next(after), patch, db), total),
+        ]
+        before, after = cycle("before"), cycle("after")
+        rows += [
+            await measure("delete", lambda db: legacy_delete(next(before), db), total),
+            await measure("delete", lambda db: services.delete_task_by_id(next(after), db), total),
+        ]
+    finally:
+        async with db_settings.AsyncSessionLocal() as database:
+            await database.execute(delete(Task).where(Task.user_id == owner_id))
+            await database.execute(delete(User).where(User.id == owner_id))
+            await database.commit()
+        await db_settings.async_engine.dispose()
+
+    print(f"{'write':<16} {'before: statements':>20} {'ms':>8}   {'after: statements':>19} {'ms':>8}")
+    for old, new in zip(rows[::2], rows[1::2]):
+        print(f"{old['name']:<16} {old['statements']:>20.1f} {old['ms']:>8.2f}   {new['statements']:>19.1f} {new['ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tasks", type=int, default=200, help="tasks written per scenario")
+    args = parser.parse_args()
+    asyncio.run(main(args.tasks))
@@ -0,0 +1,183 @@
+"""
+WebSocket broadcast: sequential sends vs the backpressured hub
+
+Simulates thousands of connected clients in-process, a small fraction of them slow (every send
+takes `--slow-delay` seconds, like a client on a congested link), and publishes a stream of
+messages to all of them. Reports the delivery latency seen by the fast clients.
+
+Two fan-out strategies are compared:
+    - before: the old endpoint loop, which awaits `send_text` on every socket in turn, so each
+      message reaches a fast client only after the slow clients ahead of it in the set;
+    - after: `BroadcastHub`, where each connection has its own queue and sender task.
+
+With the hub the fast clients' latency stays near zero regardless of the slow ones, whose excess
+messages are dropped (drop_oldest) once their queue is full.
+
+Finally it times `publish` for one user's event with every client subscribed to its own user
+topic, against broadcasting the same event to all clients: with the topic index the cost depends
+on the number of subscribers (one here), not on the number of connected clients.
+
+It also replays a sync burst (every task updated a few times) to one client per wire format, with
+and without batching, and reports the frames and bytes written.
+
+Usage:
+    python -m benchmarks.ws_broadcast --clients 5000 --slow 50 --messages 20
+
+No database is needed.
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from tasks_app.realtime import events
+from tasks_app.realtime.hub import BroadcastHub
+from benchmarks._common import percentile
+
+
+class SimulatedClient:
+    """
+    Stands in for a WebSocket: records when each message arrived.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.latencies: List[float] = []
+
+    async def send_text(self, message: str) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)
+        self.latencies.append((time.perf_counter() - float(message)) * 1000)
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def build_clients(total: int, slow: int, slow_delay: float) -> List[SimulatedClient]:
+    # Slow clients are spread through the set so the sequential loop meets them early
+    step = max(total // max(slow, 1), 1)
+    return [SimulatedClient(slow_delay if index % step == 0 and index // step < slow else 0.0) for index in range(total)]
+
+
+async def sequential(clients: List[SimulatedClient], messages: int, interval: float) -> float:
+    async def broadcast(message: str):
+        for client in clients:
+            await client.send_text(message)
+
+    started = time.perf_counter()
+    senders = []
+    for _ in range(messages):
+        senders.append(asyncio.create_task(broadcast(repr(time.perf_counter()))))
+        await asyncio.sleep(interval)
+    await asyncio.gather(*senders)
+    return time.perf_counter() - started
+
+
+async def with_hub(clients: List[SimulatedClient], messages: int, interval: float, queue_size: int) -> float:
+    hub = BroadcastHub(queue_size=queue_size, policy="drop_oldest")
+    for client in clients:
+        hub.connect(client)
+
+    started = time.perf_counter()
+    for _ in range(messages):
+        hub.publish(repr(time.perf_counter()))
+        await asyncio.sleep(interval)
+    # Wait for the fast clients' queues to drain; slow ones may still hold queued messages
+    while any(connection.queue_depth and not connection.websocket.delay for connection in hub.connections):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    stats = hub.stats()
+    await hub.close()
+    print(f"{'':<28} hub: dropped={stats['dropped']} max queue depth={stats['queue_depth_max']}")
+    return elapsed
+
+
+async def topic_fanout(total: int, rounds: int = 1000) -> None:
+    hub = BroadcastHub(queue_size=rounds + 1)
+    for index in range(total):
+        hub.connect(SimulatedClient(0.0), [f"user:{index}"])
+    message = repr(time.perf_counter())
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        hub.publish(message, ["user:0", "task:1"])
+    per_topic = (time.perf_counter() - started) / rounds * 1e6
+
+    started = time.perf_counter()
+    for _ in range(rounds // 100 or 1):
+        hub.publish(message)
+    per_broadcast = (time.perf_counter() - started) / (rounds // 100 or 1) * 1e6
+    await hub.close()
+    print(f"{'publish one user event':<28} to its topic: {per_topic:.1f}us  broadcast to {total}: {per_broadcast:.1f}us")
+
+
+class CountingClient:
+    """
+    Stands in for a WebSocket: counts frames and bytes.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def send_text(self, message: str) -> None:
+        self.frames += 1
+        self.bytes += len(message.encode())
+
+    async def send_bytes(self, message: bytes) -> None:
+        self.frames += 1
+        self.bytes += len(message)
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+async def sync_burst(tasks: int = 300, updates: int = 3) -> None:
+    for encoding in ("json", "msgpack"):
+        for batch in (False, True):
+            hub = BroadcastHub(queue_size=tasks * updates, batch_max_events=tasks * updates)
+            client = CountingClient()
+            hub.connect(client, encoding=encoding, batch=batch)
+            for _ in range(updates):
+                for task_id in range(tasks):
+                    hub.publish(events.TaskEvent(events.task_event(events.TASK_UPDATED, task_id, 1)))
+            while hub.stats()["queue_depth_total"]:
+                await asyncio.sleep(0.005)
+            await asyncio.sleep(0.005)
+            await hub.close()
+            print(f"{'burst ' + encoding + (' batched' if batch else ''):<28} {client.frames:>5} frames {client.bytes:>7} bytes")
+
+
+def report(name: str, clients: List[SimulatedClient], elapsed: float) -> None:
+    fast = [latency for client in clients if not client.delay for latency in client.latencies]
+    slow = [latency for client in clients if client.delay for latency in client.latencies]
+    print(
+        f"{name:<28} {elapsed:>7.2f}s  fast clients: {len(fast)} deliveries "
+        f"p50={percentile(fast, 50):.2f}ms p99={percentile(fast, 99):.2f}ms  "
+        f"slow clients: {len(slow)} deliveries p99={percentile(slow, 99):.2f}ms"
+    )
+
+
+async def main(total: int, slow: int, slow_delay: float, messages: int, interval: float, queue_size: int) -> None:
+    clients = build_clients(total, slow, slow_delay)
+    report("before: sequential send", clients, await sequential(clients, messages, interval))
+
+    clients = build_clients(total, slow, slow_delay)
+    report("after: broadcast hub", clients, await with_hub(clients, messages, interval, queue_size))
+
+    await topic_fanout(total)
+    await sync_burst()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--slow", type=int, default=50, help="number of slow clients")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="seconds each send to a slow client takes")
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between published messages")
+    parser.add_argument("--queue-size", type=int, default=8, help="per-connection queue size for the hub")
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.slow, args.slow_delay, args.messages, args.interval, args.queue_size))
@@ -1,14 +1,47 @@
+"""
+Test Database Harness
+
+Points the application at the test database and isolates the tests from each other. The schema is
+created once per test session (`create_schema`), and each test runs inside a transaction that is
+rolled back when it ends (`rollback_transaction`), so tests do not clean up after themselves and
+the cost of a test does not grow with the number of tests before it. Under pytest-xdist every
+worker uses a database of its own, named after the worker (e.g. `test_gw0`), so workers neither
+see each other's rows nor each other's task event notifications.
+
+Functions:
+    - create_schema(): Creates the worker's database if needed and (re)creates the tables.
+    - rollback_transaction() -> AsyncIterator[AsyncSession]: Binds the app's sessions to one
+      connection whose transaction is rolled back on exit.
+    - override_get_db(): Sync session dependency on the test database.
+    - override_get_async_db(): Async session dependency on the test database, committing for real.
+
+Environment Variables:
+    - TEST_POSTGRES_USER, TEST_POSTGRES_PASSWORD, TEST_POSTGRES_HOST, TEST_POSTGRES_DB: The test database.
+    - PYTEST_XDIST_WORKER: Set by pytest-xdist; selects the worker's database.
+    - INTERNAL_API_TOKEN: Token of the internal endpoints (default test-internal-token); `INTERNAL_HEADERS` carries it.
+"""
 import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from dotenv import load_dotenv
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
-from config.db_settings import Base, get_db
+from config.db_settings import Base, get_db, get_async_db
 
 load_dotenv()
 
+# Enables the internal endpoints, unless the environment already names a token; set before the app
+# is imported, since the token is read at import time
+os.environ["INTERNAL_API_TOKEN"] = os.getenv("INTERNAL_API_TOKEN") or "test-internal-token"
+INTERNAL_HEADERS = {"X-Internal-Token": os.environ["INTERNAL_API_TOKEN"]}
+
 from main import app
+from tasks_app.realtime.listener import task_listener
 
 
 
@@ -17,16 +50,41 @@ from main import app
 DATABASE_USERNAME = os.getenv("TEST_POSTGRES_USER")
 DATABASE_PASSWORD = os.getenv("TEST_POSTGRES_PASSWORD")
 DATABASE_HOST = os.getenv("TEST_POSTGRES_HOST")
-DATABASE_NAME = os.getenv("TEST_POSTGRES_DB")
+BASE_DATABASE_NAME = os.getenv("TEST_POSTGRES_DB")
+
+# "gw0", "gw1", ... under pytest-xdist
+WORKER = os.getenv("PYTEST_XDIST_WORKER")
+DATABASE_NAME = f"{BASE_DATABASE_NAME}_{WORKER}" if WORKER else BASE_DATABASE_NAME
 
 
-SQLALCHEMY_DATABASE_URL = f"postgresql://{DATABASE_USERNAME}:{DATABASE_PASSWORD}@{DATABASE_HOST}/{DATABASE_NAME}"
+SERVER_URL = f"{DATABASE_USERNAME}:{DATABASE_PASSWORD}@{DATABASE_HOST}"
+SQLALCHEMY_DATABASE_URL = f"postgresql://{SERVER_URL}/{DATABASE_NAME}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{SERVER_URL}/{DATABASE_NAME}"
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
+# pytest-asyncio runs every test in a fresh event loop and asyncpg connections are bound to the
+# loop that opened them, so test connections are not pooled across tests
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def create_schema():
+    """
+    Creates the worker's database if it does not exist yet, then drops and creates the tables.
+    Called once per test session.
+    """
+    if DATABASE_NAME != BASE_DATABASE_NAME:
+        server = create_engine(f"postgresql://{SERVER_URL}/{BASE_DATABASE_NAME}", isolation_level="AUTOCOMMIT",
+                               poolclass=NullPool)
+        with server.connect() as connection:
+            exists = connection.scalar(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": DATABASE_NAME})
+            if not exists:
+                connection.exec_driver_sql(f'CREATE DATABASE "{DATABASE_NAME}"')
+        server.dispose()
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
 
 
 def override_get_db():
@@ -37,4 +95,46 @@ def override_get_db():
         db.close()
 
 
-app.dependency_overrides[get_db] = override_get_db
\ No newline at end of file
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
+
+@asynccontextmanager
+async def rollback_transaction() -> AsyncIterator[AsyncSession]:
+    """
+    Runs the app's async sessions on one connection inside a transaction that is rolled back on exit.
+
+    The sessions join the transaction with a SAVEPOINT each, so a `commit()` in the app releases its
+    savepoint and a `rollback()` returns to it, while nothing is ever committed for real. Rows
+    written this way are visible to the app and the yielded session only: other connections, such
+    as those of `engine` or of other processes, do not see them.
+
+    Yields:
+        AsyncSession: A session on the same connection, for the test's own setup and checks.
+    """
+    async with async_engine.connect() as connection:
+        transaction = await connection.begin()
+        sessions = async_sessionmaker(
+            bind=connection, class_=AsyncSession, autoflush=False, expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
+
+        async def get_transactional_db():
+            async with sessions() as db:
+                yield db
+
+        app.dependency_overrides[get_async_db] = get_transactional_db
+        try:
+            async with sessions() as session:
+                yield session
+        finally:
+            app.dependency_overrides[get_async_db] = override_get_async_db
+            await transaction.rollback()
+
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+# The task event listener started by the app's lifespan listens on the test database as well
+task_listener.dsn = SQLALCHEMY_DATABASE_URL
@@ -0,0 +1,157 @@
+"""
+Instrumented Connection Pools
+
+This module provides drop-in replacements for SQLAlchemy's `QueuePool` and `AsyncAdaptedQueuePool`
+that record how long each checkout waited for a connection and how many checkouts timed out.
+Together with the pool's own counters this tells whether requests are queueing on the pool.
+
+Classes:
+    - PoolStats: Thread-safe counters and a wait-time histogram for one pool.
+    - InstrumentedQueuePool: `QueuePool` that records checkout statistics.
+    - InstrumentedAsyncAdaptedQueuePool: `AsyncAdaptedQueuePool` that records checkout statistics.
+
+Functions:
+    - pool_status(pool) -> dict: Returns the live state and recorded statistics of a pool.
+"""
+
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+# Upper bounds (in seconds) of the checkout wait-time histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PoolStats:
+    """
+    Thread-safe counters and a wait-time histogram for one pool.
+
+    Attributes:
+        checkouts (int): Number of successful checkouts.
+        checkout_timeouts (int): Number of checkouts that gave up after `pool_timeout`.
+        wait_seconds_sum (float): Total time spent waiting for successful checkouts.
+        wait_bucket_counts (list[int]): Non-cumulative counts per `WAIT_BUCKETS` bound, plus +Inf.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds_sum = 0.0
+        self.wait_bucket_counts = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def observe_wait(self, seconds: float) -> None:
+        """
+        Records the wait time of a successful checkout.
+
+        Args:
+            seconds (float): Time between requesting and receiving the connection.
+        """
+        index = len(WAIT_BUCKETS)
+        for position, bound in enumerate(WAIT_BUCKETS):
+            if seconds <= bound:
+                index = position
+                break
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_sum += seconds
+            self.wait_bucket_counts[index] += 1
+
+    def record_timeout(self) -> None:
+        """
+        Records a checkout that raised `sqlalchemy.exc.TimeoutError`.
+        """
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def snapshot(self) -> Dict:
+        """
+        Returns a consistent copy of the counters.
+
+        Returns:
+            dict: Checkout counts and a cumulative wait-time histogram keyed by bucket upper bound.
+        """
+        with self._lock:
+            counts = list(self.wait_bucket_counts)
+            checkouts = self.checkouts
+            timeouts = self.checkout_timeouts
+            wait_sum = self.wait_seconds_sum
+
+        histogram = {}
+        running = 0
+        for bound, count in zip(WAIT_BUCKETS + (float("inf"),), counts):
+            running += count
+            histogram["+Inf" if bound == float("inf") else str(bound)] = running
+
+        return {
+            "checkouts": checkouts,
+            "checkout_timeouts": timeouts,
+            "wait_seconds_sum": round(wait_sum, 6),
+            "wait_seconds_histogram": histogram,
+        }
+
+
+class _InstrumentedPoolMixin:
+    """
+    Times `Pool.connect()` and counts checkout timeouts into a `PoolStats` instance.
+
+    The stats object survives `recreate()` (used by `Engine.dispose()`), so counters are cumulative
+    for the lifetime of the engine.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        self.stats.observe_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """
+    `QueuePool` that records checkout wait times and timeouts.
+    """
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """
+    `AsyncAdaptedQueuePool` that records checkout wait times and timeouts.
+    """
+
+
+def pool_status(pool: Pool) -> Dict:
+    """
+    Returns the live state and recorded statistics of a pool.
+
+    Args:
+        pool (Pool): The engine's pool (`engine.pool` or `async_engine.pool`).
+
+    Returns:
+        dict: Pool size, checked-in/checked-out/overflow connection counts and, for instrumented
+        pools, the checkout statistics from `PoolStats.snapshot()`. Counters a pool does not keep
+        (e.g. `NullPool` and `StaticPool` keep none) are None.
+    """
+    status = {"pool_class": type(pool).__name__}
+    for key, method in (("size", "size"), ("checked_in", "checkedin"), ("checked_out", "checkedout"),
+                        ("overflow", "overflow"), ("timeout", "timeout")):
+        counter = getattr(pool, method, None)
+        status[key] = counter() if counter is not None else None
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
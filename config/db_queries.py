@@ -0,0 +1,159 @@
+"""
+Query Instrumentation
+
+SQLAlchemy engine event hooks that time every statement and attribute it to the HTTP request that
+issued it. The request's `QueryStats` lives in a context variable, which SQLAlchemy's asyncio layer
+carries into the greenlets it runs statements in, so both the sync and the async engines report
+into the same object.
+
+Per request this yields the statement count and the total time spent in the database (served in
+the `Server-Timing` response header and the access log), and the number of times each distinct
+statement ran: a statement repeated SQL_REPEAT_THRESHOLD times or more in one request is flagged as
+a likely N+1 pattern; savepoint statements are not counted. Independently of requests, statements
+slower than SQL_SLOW_QUERY_MS are logged with their parameters redacted to their types, so no user
+data reaches the log.
+
+Classes:
+    - QueryStats: Statement count, database time and per-statement repeat counts of one request.
+
+Functions:
+    - register(target) -> None: Installs the hooks on an engine or on the `Engine` class.
+    - start_request() -> contextvars.Token: Starts collecting statistics for the current request.
+    - end_request(token) -> None: Stops collecting.
+    - current_stats() -> Optional[QueryStats]: The statistics of the current request, if any.
+    - redact(parameters) -> object: Replaces bound parameter values with their type names.
+
+Environment Variables:
+    - SQL_SLOW_QUERY_MS: Statements at least this slow are logged (default 200, 0 disables).
+    - SQL_REPEAT_THRESHOLD: Repeats of one statement in a request flagged as N+1 (default 5).
+"""
+
+import logging
+import os
+import time
+from contextvars import ContextVar, Token
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# Under `tasks_app` so that the records reach the application log
+logger = logging.getLogger("tasks_app.sql")
+
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "5"))
+
+# Statements SQLAlchemy issues for `begin_nested()`, left out of the per-request statistics
+SAVEPOINT_STATEMENTS = ("SAVEPOINT ", "RELEASE SAVEPOINT ", "ROLLBACK TO SAVEPOINT ")
+
+
+class QueryStats:
+    """
+    Statements issued on behalf of one request.
+
+    Attributes:
+        count (int): Statements executed.
+        seconds (float): Total time spent executing them.
+        statements (Dict[str, int]): Executions per distinct SQL string.
+    """
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+    def repeated(self, threshold: int = SQL_REPEAT_THRESHOLD) -> List[Tuple[str, int]]:
+        """
+        Returns the statements executed at least `threshold` times, most repeated first.
+        """
+        repeats = [(statement, count) for statement, count in self.statements.items() if count >= threshold]
+        return sorted(repeats, key=lambda item: -item[1])
+
+    def server_timing(self) -> str:
+        """
+        Returns the `Server-Timing` header value describing the database time.
+        """
+        return f'db;dur={self.seconds * 1000:.2f};desc="{self.count} queries"'
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def start_request() -> Token:
+    return _current.set(QueryStats())
+
+
+def end_request(token: Token) -> None:
+    _current.reset(token)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def redact(parameters):
+    """
+    Replaces bound parameter values with their type names.
+
+    Args:
+        parameters: The parameters of one execution (mapping or sequence) or of an executemany
+            (a list of them).
+
+    Returns:
+        The same structure with `<type>` strings instead of values; executemany batches are reduced to
+        their first row and size.
+    """
+    if isinstance(parameters, dict):
+        return {key: f"<{type(value).__name__}>" for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {"rows": len(parameters), "first": redact(parameters[0])}
+        return [f"<{type(value).__name__}>" for value in parameters]
+    return f"<{type(parameters).__name__}>"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None and not statement.startswith(SAVEPOINT_STATEMENTS):
+        stats.record(statement, seconds)
+    if SQL_SLOW_QUERY_MS and seconds * 1000 >= SQL_SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query",
+            extra={"fields": {
+                "duration_ms": round(seconds * 1000, 3),
+                "statement": statement,
+                "parameters": redact(parameters),
+            }},
+        )
+
+
+def _handle_error(exception_context):
+    # The after hook does not run for failed statements; drop their start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def register(target) -> None:
+    """
+    Installs the timing hooks.
+
+    Args:
+        target: An `Engine` (use `AsyncEngine.sync_engine` for async engines) or the `Engine` class
+            itself to instrument every engine.
+    """
+    if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+        event.listen(target, "handle_error", _handle_error)
@@ -6,6 +6,7 @@ It utilizes environment variables for configuration, enabling secure and flexibl
 
 Functions:
     get_db(): Provides a database session for use within a context.
+    get_async_db(): Provides an asynchronous database session for use within a context.
 
 Dependencies:
     - os: For interacting with the operating system and reading environment variables.
@@ -13,6 +14,9 @@ Dependencies:
     - sqlalchemy.create_engine: To create a new SQLAlchemy engine instance.
     - sqlalchemy.ext.declarative.declarative_base: To return a new base class for all mapped classes.
     - sqlalchemy.orm.sessionmaker: To create a configurable session factory for database operations.
+    - sqlalchemy.ext.asyncio: To create the asyncpg-backed engine and `AsyncSession` factory.
+    - config.db_pool: Instrumented pool classes recording checkout wait times and timeouts.
+    - config.db_queries: Statement timing hooks attributing queries to the current request.
 
 Environment Variables:
     - POSTGRES_USER: Username for the PostgreSQL database.
@@ -20,13 +24,24 @@ Environment Variables:
     - POSTGRES_SERVER: Host address of the PostgreSQL server.
     - POSTGRES_DB: Name of the PostgreSQL database.
     - POSTGRES_PORT: Port number on which the PostgreSQL server is running.
+    - DB_POOL_SIZE: Connections kept open in each engine's pool (default 5).
+    - DB_MAX_OVERFLOW: Extra connections opened beyond DB_POOL_SIZE under load (default 10).
+    - DB_POOL_TIMEOUT: Seconds a checkout waits for a free connection before failing (default 30).
+    - DB_POOL_RECYCLE: Seconds after which a pooled connection is replaced, -1 to disable (default 1800).
+    - DB_POOL_PRE_PING: Whether to test connections for liveness on checkout (default true).
+    - SQL_SLOW_QUERY_MS, SQL_REPEAT_THRESHOLD: Slow-query logging and N+1 flagging (see config.db_queries).
 """
 
 import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config import db_queries
+from config.db_pool import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool
 
 # Load environment variables from a .env file
 load_dotenv()
@@ -38,15 +53,43 @@ DATABASE_HOST = os.getenv("POSTGRES_SERVER")
 DATABASE_NAME = os.getenv("POSTGRES_DB")
 DATABASE_PORT = os.getenv("POSTGRES_PORT")
 
-# Construct the database URL
+# Connection pool settings, shared by the sync and async engines
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+# Construct the database URLs (psycopg2 for sync code and migrations, asyncpg for the routes)
 SQLALCHEMY_DATABASE_URL = f"postgresql://{DATABASE_USERNAME}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{DATABASE_USERNAME}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+
+# Time every statement and attribute it to the current request. The hooks are installed on the Engine
+# class, so they cover both engines below (an AsyncEngine runs on a sync Engine) and any engine created
+# elsewhere, such as the test database's.
+db_queries.register(Engine)
 
 # Create the SQLAlchemy engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
 
 # Create a configured "Session" class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create the asyncio engine and its "AsyncSession" class. Objects are not expired on
+# commit so that returning them from a route never triggers an implicit (blocking) refresh.
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=InstrumentedAsyncAdaptedQueuePool, **POOL_OPTIONS
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Base class for all ORM models
 Base = declarative_base()
 
@@ -64,3 +107,16 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Provides an asynchronous database session for use within a context.
+
+    Yields:
+        db (AsyncSession): A SQLAlchemy asyncio session object.
+
+    Ensures the session is closed after use.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,30 +1,73 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi import APIRouter, Depends, status, Response, HTTPException, Request
 from sqlalchemy.orm import Session
 from fastapi import WebSocket, WebSocketDisconnect, APIRouter
 from fastapi.responses import JSONResponse
 
-from tasks_app.middleware.fle_logs import logging_middleware, logger
+from tasks_app.middleware import metrics
+from tasks_app.middleware.fle_logs import RequestLoggingMiddleware, log_writer, logger
+from tasks_app.middleware.metrics import MetricsMiddleware
+from tasks_app.middleware.query_stats import QueryStatsMiddleware
 
 
 from tasks_app.auth.jwt import get_current_user
+from tasks_app.db_models import hashing
+from tasks_app.realtime.hub import hub
+from tasks_app.realtime.listener import TASK_EVENTS_LISTEN, task_listener
 
 from tasks_app.user import router as user_router
 from tasks_app.auth import router as auth_router
 from tasks_app.tasks import router as tasks_router
+from tasks_app.internal import router as internal_router
+
 
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if TASK_EVENTS_LISTEN:
+        task_listener.start()
+    metrics_flusher = asyncio.create_task(metrics.run_flusher()) if metrics.METRICS_DIR else None
+    yield
+    if metrics_flusher is not None:
+        metrics_flusher.cancel()
+        with suppress(asyncio.CancelledError):
+            await metrics_flusher
+    await task_listener.stop()
+    await hub.close()
+    hashing.hashing_pool.shutdown()
+    log_writer.flush()
+
 
 app = FastAPI(
     title="TaskApp",
-    version="0.0.1"
-    
+    version="0.0.1",
+    lifespan=lifespan,
 )
 
+app.add_middleware(RequestLoggingMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(user_router.router)
 app.include_router(auth_router.router)
 app.include_router(tasks_router.router, dependencies=[Depends(get_current_user)])
+app.include_router(tasks_router.ws_router)
+app.include_router(internal_router.router)
+app.include_router(internal_router.metrics_router)
+
+
+@app.exception_handler(hashing.HashingOverloaded)
+async def hashing_overloaded_handler(request: Request, exc: hashing.HashingOverloaded):
+    logger.warning("Rejected %s %s: password hashing pool is saturated", request.method, request.url.path)
+    return JSONResponse(
+        status_code=503,
+        content={"error": "Too many concurrent sign-ins, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.exception_handler(Exception)
@@ -5,43 +5,64 @@ This module provides functions and utilities for handling JWT-based authenticati
 in a FastAPI application. It includes functions for creating and verifying JWT tokens and a dependency
 for retrieving the current user based on the provided token.
 
+Verified tokens are kept in a bounded in-process LRU cache keyed by the SHA-256 digest of the token
+until the token's `exp`, so repeat callers skip signature verification and decoding entirely.
+
+Tokens carry the user's email in `sub` and the user's id in `uid`. Tokens issued before `uid` was
+added are still accepted; their `TokenData.id` is None and the user is resolved by email.
+
 Functions:
     create_access_token(data: dict) -> str:
         Creates a JWT access token with an expiration time.
 
     verify_token(token: str, credentials_exception) -> schema.TokenData:
-        Verifies a JWT token and extracts the token data.
+        Verifies a JWT token and extracts the token data, using the verified-token cache.
+
+    get_current_user(request: Request, data: str = Depends(oauth2_scheme)) -> schema.TokenData:
+        Retrieves the current user based on the provided OAuth2 token and records the user's id on
+        the request state for the access log.
 
-    get_current_user(data: str = Depends(oauth2_scheme)) -> schema.TokenData:
-        Retrieves the current user based on the provided OAuth2 token.
+    get_websocket_user(websocket: WebSocket, token: Optional[str] = None) -> schema.TokenData:
+        Retrieves the user of a WebSocket connection from its `token` query parameter or
+        Authorization header.
 
 Dependencies:
     - os: For interacting with the operating system and reading environment variables.
+    - hashlib: For the token digests used as cache keys.
+    - time: For the remaining lifetime of cached tokens.
     - datetime: For handling date and time operations.
     - fastapi.Depends: For declaring dependencies in FastAPI route handlers.
+    - fastapi.Request: For the request state read by the access log middleware.
     - fastapi.HTTPException: For raising HTTP exceptions in FastAPI.
     - fastapi.status: For accessing HTTP status codes.
     - fastapi.security.OAuth2PasswordBearer: For handling OAuth2 password flow.
+    - fastapi.WebSocket, fastapi.WebSocketException: For authenticating WebSocket connections.
     - jose.JWTError, jose.jwt: For encoding and decoding JWT tokens.
     - dotenv.load_dotenv: To load environment variables from a .env file.
     - tasks_app.auth.schema: For defining the data structure of token data.
+    - tasks_app.cache.lru.LRUCache: For the verified-token cache.
 
 Environment Variables:
     - SECRET_KEY: Secret key used for encoding and decoding JWT tokens.
     - ALGORITHM: Algorithm used for encoding the JWT tokens.
     - ACCESS_TOKEN_EXPIRE_MINUTES: Expiration time for access tokens in minutes.
+    - TOKEN_CACHE_SIZE: Maximum number of verified tokens cached per process (default 10000).
 """
 
+import hashlib
 import os
+import time
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, WebSocket, WebSocketException, status
 from fastapi.security import OAuth2PasswordBearer
 
 from jose import JWTError, jwt
 from dotenv import load_dotenv
 
 from tasks_app.auth import schema
+from tasks_app.cache.lru import LRUCache
 
 # Load environment variables from a .env file
 load_dotenv()
@@ -50,6 +71,10 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+# Verified token claims keyed by token digest; each entry lives until its token's `exp`
+token_cache = LRUCache(maxsize=TOKEN_CACHE_SIZE)
 
 def create_access_token(data: dict) -> str:
     """
@@ -71,6 +96,9 @@ def verify_token(token: str, credentials_exception):
     """
     Verifies a JWT token and extracts the token data.
 
+    A token that verified before and has not expired is answered from `token_cache` without
+    decoding it again.
+
     Args:
         token (str): JWT token to verify.
         credentials_exception (HTTPException): Exception to raise if verification fails.
@@ -81,24 +109,43 @@ def verify_token(token: str, credentials_exception):
     Raises:
         HTTPException: If the token is invalid or verification fails.
     """
+    cache_key = hashlib.sha256(token.encode()).digest()
+    token_data = token_cache.get(cache_key)
+    if token_data is not None:
+        return token_data
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = schema.TokenData(email=email)
-        return token_data
+        user_id = payload.get("uid")
+        if not isinstance(user_id, int) or isinstance(user_id, bool):
+            user_id = None
+        token_data = schema.TokenData(email=email, id=user_id)
     except JWTError:
         raise credentials_exception
 
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)) and expires_at > time.time():
+        token_cache.set(cache_key, token_data, ttl=expires_at - time.time())
+    return token_data
+
 # OAuth2 password flow scheme for obtaining tokens
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(data: str = Depends(oauth2_scheme)):
+async def get_current_user(request: Request, data: str = Depends(oauth2_scheme)):
     """
     Retrieves the current user based on the provided OAuth2 token.
 
+    Declared `async` so that the (usually cached) verification runs inline rather than in the
+    threadpool. Router-level and endpoint-level uses of this dependency share FastAPI's per-request
+    dependency cache, so the token is verified once per request.
+
+    The user's id is left on `request.state.user_id`, where `RequestLoggingMiddleware` picks it up.
+
     Args:
+        request (Request): The request being authenticated.
         data (str): Encoded JWT token provided by the OAuth2 scheme.
 
     Returns:
@@ -112,4 +159,32 @@ def get_current_user(data: str = Depends(oauth2_scheme)):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    return verify_token(data, credentials_exception)
+    token_data = verify_token(data, credentials_exception)
+    request.state.user_id = token_data.id
+    return token_data
+
+async def get_websocket_user(websocket: WebSocket, token: Optional[str] = None):
+    """
+    Retrieves the user of a WebSocket connection before it is accepted.
+
+    Browsers cannot set headers on WebSocket handshakes, so the access token may be passed as the
+    `token` query parameter; an `Authorization: Bearer` header is accepted as well.
+
+    Args:
+        websocket (WebSocket): The connection being opened.
+        token (Optional[str]): Encoded JWT token from the query string.
+
+    Returns:
+        schema.TokenData: Extracted token data of the connecting user.
+
+    Raises:
+        WebSocketException: With code 1008 (policy violation) if the token is missing or invalid.
+    """
+    credentials_exception = WebSocketException(
+        code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials"
+    )
+    if token is None:
+        scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise credentials_exception
+    return verify_token(token, credentials_exception)
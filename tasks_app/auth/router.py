@@ -5,7 +5,8 @@ This module defines the authentication routes for a FastAPI application, specifi
 It handles user verification and JWT token generation.
 
 Routes:
-    - POST /login: Authenticates a user and returns a JWT token if credentials are valid.
+    - POST /login: Authenticates a user and returns a JWT token if credentials are valid. A stored
+      password hash made with outdated Argon2 parameters is replaced on successful login.
 
 Dependencies:
     - datetime.timedelta: For handling time intervals.
@@ -14,10 +15,11 @@ Dependencies:
     - fastapi.HTTPException: For raising HTTP exceptions in FastAPI.
     - fastapi.status: For accessing HTTP status codes.
     - fastapi.security.OAuth2PasswordRequestForm: For handling OAuth2 password request forms.
-    - sqlalchemy.orm.Session: For database session handling.
+    - sqlalchemy.ext.asyncio.AsyncSession: For asynchronous database session handling.
     - config.db_settings: For database configuration settings.
-    - tasks_app.db_models.hashing: For password hashing utilities.
+    - tasks_app.db_models.hashing: For password verification on the bounded hashing pool.
     - tasks_app.db_models.models.User: For the User model.
+    - tasks_app.user.services: For dropping a rehashed user from the user caches.
     - .jwt.create_access_token: For creating JWT tokens.
 
 """
@@ -26,11 +28,13 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import db_settings
 from tasks_app.db_models import hashing
 from tasks_app.db_models.models import User
+from tasks_app.user import services as user_services
 from .jwt import create_access_token
 
 # Create a router instance for authentication routes
@@ -39,28 +43,44 @@ router = APIRouter(
 )
 
 @router.post('/login')
-def login(request: OAuth2PasswordRequestForm = Depends(), database: Session = Depends(db_settings.get_db)):
+async def login(request: OAuth2PasswordRequestForm = Depends(), database: AsyncSession = Depends(db_settings.get_async_db)):
     """
     Authenticates a user and returns a JWT token if credentials are valid.
 
     Args:
         request (OAuth2PasswordRequestForm): The login form data, including username and password.
-        database (Session): The database session dependency.
+        database (AsyncSession): The asynchronous database session dependency.
 
     Returns:
         dict: A dictionary containing the access token and token type.
 
     Raises:
         HTTPException: If the user is not found or the password is invalid.
+        HashingOverloaded: If too many password checks are in progress (answered with 503).
     """
-    user = database.query(User).filter(User.email == request.username).first()
+    user = (await database.execute(
+        select(User.id, User.email, User.password).where(User.email == request.username)
+    )).first()
+    # End the read transaction so the pooled connection is not held while the password is verified
+    await database.rollback()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Invalid Credentials')
 
-    if not hashing.verify_password(request.password, user.password):
+    verified, new_hash = await hashing.verify_and_update_async(request.password, user.password)
+    if not verified:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid Password')
 
-    # Generate a JWT token
-    access_token = create_access_token(data={"sub": user.email})
+    if new_hash is not None:
+        # Rehash with the configured cost; skipped if the password changed since it was read. Only this
+        # user is dropped from the caches, instead of every user as for other bulk updates.
+        await database.execute(
+            update(User).where(User.id == user.id, User.password == user.password).values(password=new_hash)
+            .execution_options(**{user_services.INVALIDATES_CACHED_USERS: True})
+        )
+        await database.commit()
+        user_services.invalidate_cached_user(user.id, user.email)
+
+    # Generate a JWT token carrying the user id so requests can skip the lookup by email
+    access_token = create_access_token(data={"sub": user.email, "uid": user.id})
 
     return {"access_token": access_token, "token_type": "bearer"}
@@ -11,7 +11,7 @@ Classes:
 """
 
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class Login(BaseModel):
     """
@@ -39,7 +39,14 @@ class TokenData(BaseModel):
     """
     Represents the data extracted from a JWT token.
 
+    Instances are shared through the verified-token cache, so they are immutable.
+
     Attributes:
         email (Optional[str]): The email of the user associated with the token, if available.
+        id (Optional[int]): The id of the user, carried in the `uid` claim. None for tokens issued
+            before the claim was added.
     """
+    model_config = ConfigDict(frozen=True)
+
     email: Optional[str] = None
+    id: Optional[int] = None
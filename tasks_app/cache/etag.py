@@ -0,0 +1,88 @@
+"""
+Entity Tags for Versioned Rows
+
+Tasks and users carry a row version that the database increments on every write (see
+`tasks_app.db_models.models`). Their representations get a strong ETag made of the row's ID and
+version, `"<id>-<version>"`, so checking whether a client's copy is current only needs the version,
+not the row:
+
+    - `If-None-Match` on a read: the client's copy is current when its tag names the current
+      version, and the answer is `304 Not Modified` without fetching or rendering the row.
+    - `If-Match` on a write: the write only applies to the versions the client names, so two clients
+      editing the same row cannot silently overwrite each other; a mismatch is `412 Precondition
+      Failed`.
+
+Functions:
+    - make_etag(row_id: int, version: int) -> str: The ETag of one version of a row.
+    - none_match(header: Optional[str], etag: str) -> bool: Whether a read must send the representation.
+    - matching_versions(header: str, row_id: int) -> Optional[List[int]]: The row versions an
+      If-Match header accepts.
+    - not_modified(etag: str) -> Response: A 304 response for the given ETag.
+    - precondition_failed() -> HTTPException: The 412 error of a failed If-Match.
+"""
+
+from typing import List, Optional
+
+from fastapi import HTTPException, Response, status
+
+
+def make_etag(row_id: int, version: int) -> str:
+    return f'"{row_id}-{version}"'
+
+
+def _tags(header: str) -> List[str]:
+    # Entity tags are quoted strings and cannot contain commas, so splitting on commas is safe
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def none_match(header: Optional[str], etag: str) -> bool:
+    """
+    Evaluates an If-None-Match header against the current ETag (weak comparison, RFC 9110 13.1.2).
+
+    Args:
+        header (Optional[str]): The header value, or None when absent.
+        etag (str): The ETag of the current representation.
+
+    Returns:
+        bool: True if the representation must be sent, False if `304 Not Modified` applies.
+    """
+    if header is None:
+        return True
+    tags = _tags(header)
+    if "*" in tags:
+        return False
+    return all(tag.removeprefix("W/") != etag for tag in tags)
+
+
+def matching_versions(header: str, row_id: int) -> Optional[List[int]]:
+    """
+    Returns the versions of one row that an If-Match header accepts (strong comparison).
+
+    Args:
+        header (str): The If-Match header value.
+        row_id (int): The ID of the row about to be written.
+
+    Returns:
+        Optional[List[int]]: None for `*` (any current version), otherwise the versions named by
+        strong tags of this row; an empty list means that no version matches.
+    """
+    tags = _tags(header)
+    if "*" in tags:
+        return None
+    versions = []
+    prefix = f'"{row_id}-'
+    for tag in tags:
+        if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix):-1].isdigit():
+            versions.append(int(tag[len(prefix):-1]))
+    return versions
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="The resource has changed; fetch it again before writing",
+    )
@@ -0,0 +1,120 @@
+"""
+Bounded In-Process LRU Cache with Expiry
+
+This module provides a small thread-safe LRU cache whose entries can expire, used for caching
+verified tokens and resolved users within one worker process.
+
+Classes:
+    - LRUCache: Bounded mapping with least-recently-used eviction, per-entry expiry and hit/miss counters.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded mapping with least-recently-used eviction, per-entry expiry and hit/miss counters.
+
+    Expired entries are dropped lazily when they are looked up or when they reach the LRU end.
+
+    Attributes:
+        maxsize (int): Maximum number of entries kept.
+        ttl (Optional[float]): Default lifetime of an entry in seconds, or None for no expiry.
+        hits (int): Lookups that found a live entry.
+        misses (int): Lookups that found nothing or an expired entry.
+        evictions (int): Live entries dropped to make room for new ones.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the live value stored under `key` and marks it most recently used.
+
+        Args:
+            key (Hashable): The cache key.
+            default (Any): Returned when the key is missing or expired.
+
+        Returns:
+            Any: The cached value or `default`.
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Stores `value` under `key`, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to cache.
+            ttl (Optional[float]): Lifetime in seconds; defaults to the cache's `ttl`.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else self._clock() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                _, (_, oldest_expiry) = self._entries.popitem(last=False)
+                if oldest_expiry is None or oldest_expiry > self._clock():
+                    self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Removes `key` from the cache if present.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Removes every entry; counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the size and counters of the cache.
+
+        Returns:
+            dict: Current size, maximum size, hits, misses, evictions and hit ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
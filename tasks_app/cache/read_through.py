@@ -0,0 +1,186 @@
+"""
+Read-Through Cache with Stampede Protection
+
+`ReadThroughCache` sits in front of a lookup: `get_or_load(key, loader)` answers from the backend
+when it can and otherwise runs `loader` and stores its result. Concurrent misses on the same key
+share one load: the first caller runs the loader and the others wait for its result, so a cold hot
+key costs one query however many requests ask for it at once. Writers call `invalidate` after
+committing; a load that was already running when the key was invalidated still answers its own
+callers but does not store its (possibly older) result.
+
+Backends implement the `CacheBackend` interface. `LRUBackend`, an in-process `LRUCache` with a
+TTL, is the default; a backend for an external cache shared by the workers implements the same
+coroutines.
+
+Classes:
+    - CacheBackend: Interface of a cache backend.
+    - LRUBackend: In-process backend on `tasks_app.cache.lru.LRUCache`.
+    - ReadThroughCache: Read-through front with per-key load coalescing and counters.
+
+Environment Variables:
+    - READ_CACHE_SIZE: Entries kept per in-process cache (default 10000).
+    - READ_CACHE_TTL: Lifetime of an entry in seconds (default 30). It bounds how long another worker
+      may serve an entry invalidated elsewhere when that worker missed the invalidation.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from tasks_app.cache.lru import LRUCache
+
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "10000"))
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", "30"))
+
+# Returned by `CacheBackend.get` for absent keys, so that falsy values can be cached
+MISSING = object()
+
+# Result of a shared load that failed; the waiting callers then load for themselves
+_FAILED = object()
+
+
+class CacheBackend:
+    """
+    Interface of a cache backend. Values are immutable snapshots and may be shared between requests.
+    """
+
+    async def get(self, key: Hashable) -> Any:
+        """Returns the value stored under `key`, or MISSING."""
+        raise NotImplementedError
+
+    async def set(self, key: Hashable, value: Any) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: Hashable) -> None:
+        raise NotImplementedError
+
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        """Returns the backend's size and counters."""
+        raise NotImplementedError
+
+
+class LRUBackend(CacheBackend):
+    """
+    In-process backend: a bounded LRU cache whose entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int = READ_CACHE_SIZE, ttl: Optional[float] = READ_CACHE_TTL):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: Hashable) -> Any:
+        return self.cache.get(key, MISSING)
+
+    async def set(self, key: Hashable, value: Any) -> None:
+        self.cache.set(key, value)
+
+    async def delete(self, key: Hashable) -> None:
+        self.cache.delete(key)
+
+    async def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> Dict:
+        return self.cache.stats()
+
+
+class ReadThroughCache:
+    """
+    Caches the results of a lookup and coalesces concurrent loads of the same key.
+
+    Attributes:
+        backend (CacheBackend): Where values are stored.
+        loads (int): Loader runs.
+        coalesced (int): Misses that waited for another caller's load instead of loading.
+        invalidations (int): Keys invalidated.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        self.backend = backend if backend is not None else LRUBackend()
+        self.loads = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+
+    async def get(self, key: Hashable) -> Any:
+        """
+        Returns the cached value of `key` without loading it, or None.
+        """
+        value = await self.backend.get(key)
+        return None if value is MISSING else value
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns the cached value of `key`, loading and caching it on a miss.
+
+        Args:
+            key (Hashable): The cache key.
+            loader (Callable[[], Awaitable]): Loads the value; a None result is returned but not cached.
+
+        Returns:
+            Any: The value.
+        """
+        value = await self.backend.get(key)
+        if value is not MISSING:
+            return value
+
+        flight = self._loading.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            # Shielded: a waiter being cancelled must not cancel the load shared with others
+            value = await asyncio.shield(flight)
+            if value is not _FAILED:
+                return value
+            return await loader()
+
+        flight = asyncio.get_running_loop().create_future()
+        self._loading[key] = flight
+        self.loads += 1
+        try:
+            value = await loader()
+        except BaseException:
+            flight.set_result(_FAILED)
+            raise
+        else:
+            flight.set_result(value)
+        finally:
+            # Still ours unless the key was invalidated (or invalidated and loaded again) meanwhile
+            current = self._loading.get(key) is flight
+            if current:
+                del self._loading[key]
+        if current and value is not None:
+            await self.backend.set(key, value)
+        return value
+
+    async def invalidate(self, *keys: Hashable) -> None:
+        """
+        Drops `keys` from the cache. Call it after the write that changed them has committed.
+        """
+        for key in keys:
+            self._loading.pop(key, None)
+            await self.backend.delete(key)
+            self.invalidations += 1
+
+    async def clear(self) -> None:
+        """
+        Drops every entry, for writes that do not say which keys they change.
+        """
+        self._loading.clear()
+        await self.backend.clear()
+
+    def stats(self) -> Dict:
+        """
+        Returns the backend's size and hit/miss counters with the load counters.
+
+        Returns:
+            dict: The backend's statistics plus loads, coalesced misses, loads in progress and invalidations.
+        """
+        return {
+            **self.backend.stats(),
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "loading": len(self._loading),
+            "invalidations": self.invalidations,
+        }
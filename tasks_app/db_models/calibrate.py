@@ -0,0 +1,72 @@
+"""
+Argon2 Cost Calibration
+
+Picks Argon2 parameters whose verify time on the current machine is close to a target latency,
+and prints them as environment settings for `tasks_app.db_models.hashing`.
+
+Memory cost is the main defence against GPU cracking, so it is kept at the requested value and
+the time cost is raised until a verify takes at least the target. If even one iteration is too
+slow, memory is halved (down to 8 MiB) instead.
+
+Usage:
+    python -m tasks_app.db_models.calibrate --target-ms 250
+
+Run it on the hardware that serves logins, then set the printed values in the environment; users
+are rehashed to the new cost as they log in.
+"""
+
+import argparse
+import statistics
+import time
+
+from tasks_app.db_models import hashing
+
+# Memory cost (KiB) below which calibration stops lowering memory
+MIN_MEMORY_COST = 8192
+
+def measure_verify_ms(time_cost: int, memory_cost: int, parallelism: int, samples: int) -> float:
+    """
+    Returns the median time in milliseconds to verify a password with the given parameters.
+    """
+    context = hashing.build_context(time_cost, memory_cost, parallelism)
+    password_hash = context.hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.verify("calibration-password", password_hash)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def calibrate(target_ms: float, memory_cost: int, parallelism: int, max_time_cost: int, samples: int) -> None:
+    """
+    Prints the measured candidates, then Argon2 parameters that hit `target_ms` per verify on this machine.
+    """
+    time_cost = 1
+    elapsed = measure_verify_ms(time_cost, memory_cost, parallelism, samples)
+    print(f"t={time_cost} m={memory_cost} p={parallelism}: {elapsed:.1f} ms")
+
+    while elapsed > target_ms and memory_cost // 2 >= MIN_MEMORY_COST:
+        memory_cost //= 2
+        elapsed = measure_verify_ms(time_cost, memory_cost, parallelism, samples)
+        print(f"t={time_cost} m={memory_cost} p={parallelism}: {elapsed:.1f} ms")
+
+    while elapsed < target_ms and time_cost < max_time_cost:
+        time_cost += 1
+        elapsed = measure_verify_ms(time_cost, memory_cost, parallelism, samples)
+        print(f"t={time_cost} m={memory_cost} p={parallelism}: {elapsed:.1f} ms")
+
+    print()
+    print(f"# Argon2 verify takes about {elapsed:.0f} ms on this machine")
+    print(f"ARGON2_TIME_COST={time_cost}")
+    print(f"ARGON2_MEMORY_COST={memory_cost}")
+    print(f"ARGON2_PARALLELISM={parallelism}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--target-ms", type=float, default=250.0, help="target verify latency in milliseconds")
+    parser.add_argument("--memory-cost", type=int, default=hashing.ARGON2_MEMORY_COST, help="memory in KiB")
+    parser.add_argument("--parallelism", type=int, default=hashing.ARGON2_PARALLELISM, help="Argon2 lanes")
+    parser.add_argument("--max-time-cost", type=int, default=20, help="upper bound for the iteration count")
+    parser.add_argument("--samples", type=int, default=5, help="verifies timed per candidate")
+    args = parser.parse_args()
+    calibrate(args.target_ms, args.memory_cost, args.parallelism, args.max_time_cost, args.samples)
@@ -4,6 +4,20 @@ Password Hashing Utilities
 This module provides utilities for hashing and verifying passwords using the Argon2 algorithm.
 It utilizes the Passlib library to handle password hashing securely.
 
+The Argon2 cost parameters come from the environment so they can be tuned to the hardware (see
+`python -m tasks_app.db_models.calibrate`). Hashes made with other parameters still verify, and
+`verify_and_update` returns a replacement hash for them so stored hashes converge to the configured
+cost as users log in.
+
+Argon2 is deliberately expensive, so request handlers must not run it on the event loop. The async
+variants hand the work to a bounded worker pool (`hashing_pool`) that caps how many hashes run at
+once and rejects new work with `HashingOverloaded` once too many are waiting, so that a burst of
+logins degrades only logins instead of every endpoint on the worker.
+
+Classes:
+    - HashingOverloaded: Raised when the hashing pool's queue is full.
+    - HashingPool: Bounded executor with admission control for password hashing.
+
 Functions:
     - verify_password(plain_password: str, hashed_password: str) -> bool:
         Verifies a plain password against a hashed password.
@@ -11,14 +25,81 @@ Functions:
     - get_password_hash(password: str) -> str:
         Hashes a plain password using the Argon2 algorithm.
 
+    - build_context(time_cost: int, memory_cost: int, parallelism: int) -> CryptContext:
+        Creates an Argon2 CryptContext with the given cost parameters.
+
+    - needs_rehash(hashed_password: str) -> bool:
+        Tells whether a hash was made with other parameters than the configured ones.
+
+    - verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        Verifies a password and returns a replacement hash if the stored one is outdated.
+
+    - verify_and_update_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        Runs `verify_and_update` on the hashing pool.
+
+    - verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        Verifies a password on the hashing pool.
+
+    - get_password_hash_async(password: str) -> str:
+        Hashes a password on the hashing pool.
+
 Dependencies:
     - passlib.context.CryptContext: For managing hashing schemes and contexts.
+    - concurrent.futures: For the thread or process pool the hashes run on.
+
+Environment Variables:
+    - ARGON2_TIME_COST: Argon2 iterations (default 3).
+    - ARGON2_MEMORY_COST: Argon2 memory in KiB (default 65536).
+    - ARGON2_PARALLELISM: Argon2 lanes (default 4).
+    - HASH_WORKERS: Number of hashes computed concurrently (default: number of CPUs).
+    - HASH_MAX_PENDING: Maximum number of running plus queued hashes before new ones are rejected (default 64).
+    - HASH_POOL_KIND: "thread" (default; argon2-cffi releases the GIL) or "process".
 """
 
+import asyncio
+import os
+import re
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 
+# Argon2 cost parameters; the defaults match the hashes issued before they were configurable
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+# Cost parameters as encoded in an Argon2 hash: $argon2id$v=19$m=65536,t=3,p=4$salt$checksum
+_ARGON2_PARAMETERS = re.compile(r"\$m=(\d+),t=(\d+),p=(\d+)\$")
+
+def build_context(time_cost: int, memory_cost: int, parallelism: int) -> CryptContext:
+    """
+    Creates an Argon2 CryptContext with the given cost parameters.
+
+    Args:
+        time_cost (int): Number of iterations.
+        memory_cost (int): Memory in KiB.
+        parallelism (int): Number of lanes.
+
+    Returns:
+        CryptContext: The hashing context.
+    """
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        argon2__time_cost=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
+
 # Create a CryptContext object with the Argon2 algorithm for password hashing
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = build_context(ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM)
+
+# Hashing pool settings
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+HASH_POOL_KIND = os.getenv("HASH_POOL_KIND", "thread")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -44,3 +125,157 @@ def get_password_hash(password: str) -> str:
         str: The hashed password.
     """
     return pwd_context.hash(password)
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    Tells whether a hash was made with another scheme or other cost parameters than configured.
+
+    Passlib only compares the memory cost of Argon2 hashes, so the time cost and parallelism
+    encoded in the hash are compared here as well.
+
+    Args:
+        hashed_password (str): The stored hash.
+
+    Returns:
+        bool: True if the hash should be replaced by one made with the current parameters.
+    """
+    if pwd_context.needs_update(hashed_password):
+        return True
+    parameters = _ARGON2_PARAMETERS.search(hashed_password)
+    if parameters is None:
+        return True
+    return tuple(map(int, parameters.groups())) != (ARGON2_MEMORY_COST, ARGON2_TIME_COST, ARGON2_PARALLELISM)
+
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password and returns a replacement hash if the stored one is outdated.
+
+    Args:
+        plain_password (str): The plain text password to verify.
+        hashed_password (str): The stored hash.
+
+    Returns:
+        Tuple[bool, Optional[str]]: Whether the password matches, and a new hash made with the
+        configured parameters when it matches but the stored hash needs a rehash (None otherwise).
+    """
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if needs_rehash(hashed_password):
+        return True, get_password_hash(plain_password)
+    return True, None
+
+class HashingOverloaded(Exception):
+    """
+    Raised when the hashing pool already has `max_pending` hashes running or queued.
+    """
+
+class HashingPool:
+    """
+    Bounded executor with admission control for password hashing.
+
+    At most `workers` hashes run concurrently; at most `max_pending` are running or waiting for a
+    worker. Beyond that `run` fails fast with `HashingOverloaded` instead of queueing, which bounds
+    the latency of accepted requests and leaves the event loop free for other endpoints.
+
+    Attributes:
+        workers (int): Number of hashes computed concurrently.
+        max_pending (int): Maximum number of running plus queued hashes.
+        kind (str): "thread" or "process".
+        pending (int): Hashes currently running or queued.
+        completed (int): Hashes finished since start-up.
+        rejected (int): Hashes refused with `HashingOverloaded` since start-up.
+    """
+
+    def __init__(self, workers: int, max_pending: int, kind: str = "thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown hashing pool kind: {kind!r}")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.kind = kind
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self) -> Executor:
+        # Created on first use so importing the module never spawns workers
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hashing")
+            return self._executor
+
+    async def run(self, function, *args):
+        """
+        Runs `function(*args)` on the pool and waits for its result without blocking the event loop.
+
+        Raises:
+            HashingOverloaded: If `max_pending` hashes are already running or queued.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HashingOverloaded("Too many password hashes in progress")
+            self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), function, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        """
+        Returns the pool configuration and counters.
+        """
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self) -> None:
+        """
+        Stops the workers; the pool starts new ones if it is used again.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+# The pool shared by all request handlers of this process
+hashing_pool = HashingPool(HASH_WORKERS, HASH_MAX_PENDING, HASH_POOL_KIND)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifies a plain password against a hashed password on the hashing pool.
+
+    Raises:
+        HashingOverloaded: If the hashing pool is saturated.
+    """
+    return await hashing_pool.run(verify_password, plain_password, hashed_password)
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Runs `verify_and_update` on the hashing pool.
+
+    Raises:
+        HashingOverloaded: If the hashing pool is saturated.
+    """
+    return await hashing_pool.run(verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hashes a plain password on the hashing pool.
+
+    Raises:
+        HashingOverloaded: If the hashing pool is saturated.
+    """
+    return await hashing_pool.run(get_password_hash, password)
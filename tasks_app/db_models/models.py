@@ -5,25 +5,48 @@ This module defines the SQLAlchemy ORM models for `User` and `Task` entities in
 These models represent the database schema and include relationships and utility methods for 
 handling user passwords.
 
+Both tables carry a row `version` that starts at 1 and is incremented by a `BEFORE UPDATE` trigger
+on every write, whichever code path makes it (ORM flushes, bulk statements, batch updates). It is
+the basis of the ETags served for tasks and users; statements that need the new value return it
+with RETURNING.
+
+Tasks also carry `search_vector`, a stored generated `tsvector` over the title (weight A) and the
+description (weight B), indexed with GIN for full-text search. The database keeps it current on
+every write; it is deferred so that loading tasks does not fetch it.
+
 Classes:
     - User: Represents a user in the application.
     - Task: Represents a task associated with a user in the application.
 
 Dependencies:
     - datetime: For handling date and time operations.
-    - sqlalchemy: For defining database columns and relationships.
+    - sqlalchemy: For defining database columns and relationships, and the version trigger DDL.
     - config.db_settings.Base: For the declarative base class.
     - tasks_app.db_models.hashing: For password hashing utilities.
 """
 
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column, Computed, DDL, FetchedValue, Integer, String, Boolean, ForeignKey, DateTime, Index, event, text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
 from config.db_settings import Base
 from . import hashing
 
+# Text search configuration of the task search document; queries must be parsed with the same one.
+# 'simple' does not stem: type-ahead prefixes have to match the stored words, and a partially typed
+# word does not stem like the whole word ('runn' vs 'run').
+TASK_SEARCH_CONFIG = "simple"
+
+# The task search document: title matches rank above description matches
+TASK_SEARCH_DOCUMENT = (
+    f"setweight(to_tsvector('{TASK_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{TASK_SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+)
+
 class User(Base):
     """
     Represents a user in the application.
@@ -33,10 +56,12 @@ class User(Base):
         name (str): The name of the user.
         email (str): The unique email of the user.
         password (str): The hashed password of the user.
+        version (int): Row version, incremented on every update.
         tasks (list[Task]): The list of tasks associated with the user.
 
     Methods:
-        __init__(name: str, email: str, password: str): Initializes a new user with hashed password.
+        __init__(name: str, email: str, password: str = None, password_hash: str = None):
+            Initializes a new user, hashing `password` unless an already computed `password_hash` is given.
         check_password(password: str) -> bool: Verifies the given password against the stored hashed password.
     """
     __tablename__ = "users"
@@ -45,12 +70,14 @@ class User(Base):
     name = Column(String(50))
     email = Column(String(255), unique=True)
     password = Column(String(255))
+    version = Column(Integer, nullable=False, server_default=text("1"), server_onupdate=FetchedValue())
     tasks = relationship("Task", back_populates="user_info")
 
-    def __init__(self, name, email, password, *args, **kwargs):
+    def __init__(self, name, email, password=None, *args, password_hash=None, **kwargs):
         self.name = name
         self.email = email
-        self.password = hashing.get_password_hash(password)
+        # Request handlers pass a hash computed on the hashing pool; hashing here blocks the caller
+        self.password = password_hash if password_hash is not None else hashing.get_password_hash(password)
 
     def check_password(self, password):
         """
@@ -76,6 +103,8 @@ class Task(Base):
         creation_date (datetime): The creation date of the task, defaults to current time.
         completed (bool): Whether the task is completed.
         user_id (int): The foreign key referencing the user the task belongs to.
+        version (int): Row version, incremented on every update.
+        search_vector (tsvector): Full-text search document generated from the title and description.
         user_info (User): The user associated with the task.
     """
     __tablename__ = 'tasks'
@@ -87,4 +116,35 @@ class Task(Base):
     creation_date = Column(DateTime, default=datetime.now)
     completed = Column(Boolean, default=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+    version = Column(Integer, nullable=False, server_default=text("1"), server_onupdate=FetchedValue())
+    search_vector = deferred(Column(TSVECTOR, Computed(TASK_SEARCH_DOCUMENT, persisted=True)))
     user_info = relationship("User", back_populates="tasks")
+
+    # Composite indexes for the owner-scoped listing: one per sort column, with and without the
+    # completed filter, each ending in `(sort column, id)` to serve keyset pagination
+    __table_args__ = (
+        Index("ix_tasks_user_id_creation_date_id", "user_id", "creation_date", "id"),
+        Index("ix_tasks_user_id_due_date_id", "user_id", "due_date", "id"),
+        Index("ix_tasks_user_id_completed_creation_date_id", "user_id", "completed", "creation_date", "id"),
+        Index("ix_tasks_user_id_completed_due_date_id", "user_id", "completed", "due_date", "id"),
+        # Full-text search; the owner condition is combined with it through the user_id indexes
+        Index("ix_tasks_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+
+# Row versions are kept by the database so that no write path can forget to bump them. The migration
+# that added the columns carries its own copy of this DDL; these listeners cover `metadata.create_all`.
+BUMP_ROW_VERSION_FUNCTION = DDL(
+    "CREATE OR REPLACE FUNCTION bump_row_version() RETURNS trigger AS $$ "
+    "BEGIN NEW.version := OLD.version + 1; RETURN NEW; END $$ LANGUAGE plpgsql"
+)
+
+def _bump_version_trigger(table_name: str) -> DDL:
+    return DDL(
+        f"CREATE TRIGGER {table_name}_bump_version BEFORE UPDATE ON {table_name} "
+        "FOR EACH ROW EXECUTE FUNCTION bump_row_version()"
+    )
+
+event.listen(Base.metadata, "before_create", BUMP_ROW_VERSION_FUNCTION)
+for _table in (User.__table__, Task.__table__):
+    event.listen(_table, "after_create", _bump_version_trigger(_table.name))
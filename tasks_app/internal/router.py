@@ -0,0 +1,198 @@
+"""
+Internal Operational Endpoints
+
+This module exposes endpoints meant for operators and monitoring rather than API clients.
+They are hidden from the OpenAPI schema and should not be routed through the public ingress.
+Every request must carry the shared secret INTERNAL_API_TOKEN in the X-Internal-Token header (or
+as an `Authorization: Bearer` token, for scrapers that only support that); without the setting
+the endpoints answer 404 as if they did not exist.
+
+Routes:
+    - GET /internal/db-pool: Live connection pool statistics for the sync and async engines.
+    - GET /internal/hashing: Password hashing pool configuration and counters.
+    - GET /internal/token-cache: Verified-token cache size and hit/miss counters.
+    - GET /internal/user-cache: Resolved-user cache size and hit/miss counters.
+    - GET /internal/read-cache: Task and user profile read-through cache sizes, hit ratios and load
+      counters.
+    - GET /internal/websockets: WebSocket connection and user counts, outbound queue depths, drop and
+      eviction counters and the state of the cross-worker event listener.
+    - GET /internal/logging: Log writer queue depth and written, batch and dropped record counters.
+    - GET /metrics (`metrics_router`): Request counts, latency histograms and in-flight requests in
+      the Prometheus text format, summed over all workers when METRICS_DIR is set.
+
+Functions:
+    - require_internal_token(x_internal_token, authorization) -> None: Dependency rejecting requests
+      without the shared secret.
+
+Dependencies:
+    - fastapi.APIRouter: For creating a FastAPI router instance.
+    - fastapi.responses.PlainTextResponse: For the Prometheus exposition.
+    - config.db_settings: The application's engines.
+    - config.db_pool.pool_status: For reading pool state and checkout statistics.
+    - tasks_app.db_models.hashing: For the password hashing pool.
+    - tasks_app.auth.jwt: For the verified-token cache.
+    - tasks_app.user.services: For the resolved-user and user profile caches.
+    - tasks_app.tasks.services: For the task cache.
+    - tasks_app.realtime.hub: For the WebSocket broadcast hub.
+    - tasks_app.realtime.listener: For the task event listener.
+    - tasks_app.middleware.fle_logs: For the log writer.
+    - tasks_app.middleware.metrics: For the request metrics.
+
+Environment Variables:
+    - INTERNAL_API_TOKEN: Shared secret required by every endpoint here; unset disables them.
+"""
+
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from config import db_settings
+from config.db_pool import pool_status
+from tasks_app.auth import jwt
+from tasks_app.db_models import hashing
+from tasks_app.middleware import metrics
+from tasks_app.middleware.fle_logs import logging_stats
+from tasks_app.realtime.hub import hub
+from tasks_app.realtime.listener import task_listener
+from tasks_app.tasks import services as task_services
+from tasks_app.user import services as user_services
+
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN", "")
+
+
+async def require_internal_token(
+    x_internal_token: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Rejects requests that do not carry INTERNAL_API_TOKEN.
+
+    Raises:
+        HTTPException: 404 if the internal endpoints are disabled, 403 if the token is missing or wrong.
+    """
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, bearer = (authorization or "").partition(" ")
+    token = x_internal_token or (bearer if scheme.lower() == "bearer" else "")
+    if not secrets.compare_digest(token.encode(), INTERNAL_API_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid internal token")
+
+
+router = APIRouter(
+    tags=['Internal'],
+    prefix='/internal',
+    include_in_schema=False,
+    dependencies=[Depends(require_internal_token)],
+)
+
+# Scraped at the conventional /metrics path rather than under /internal
+metrics_router = APIRouter(
+    tags=['Internal'],
+    include_in_schema=False,
+    dependencies=[Depends(require_internal_token)],
+)
+
+
+@router.get('/db-pool')
+async def get_db_pool_stats():
+    """
+    Returns live connection pool statistics.
+
+    For each engine the response contains the configured size and timeout, the number of
+    checked-in, checked-out and overflow connections, checkout and checkout-timeout counters,
+    and a cumulative histogram of checkout wait times in seconds.
+
+    Returns:
+        dict: Pool statistics keyed by engine ("sync", "async").
+    """
+    return {
+        "sync": pool_status(db_settings.engine.pool),
+        "async": pool_status(db_settings.async_engine.pool),
+    }
+
+
+@router.get('/hashing')
+async def get_hashing_pool_stats():
+    """
+    Returns the password hashing pool configuration and counters.
+
+    Returns:
+        dict: Worker count, queue limit, hashes in progress, completed and rejected counts.
+    """
+    return hashing.hashing_pool.stats()
+
+
+@router.get('/token-cache')
+async def get_token_cache_stats():
+    """
+    Returns the verified-token cache size and hit/miss counters.
+
+    Returns:
+        dict: Size, maximum size, hits, misses, evictions and hit ratio.
+    """
+    return jwt.token_cache.stats()
+
+
+@router.get('/user-cache')
+async def get_user_cache_stats():
+    """
+    Returns the resolved-user cache size and hit/miss counters.
+
+    Returns:
+        dict: Size, maximum size, hits, misses, evictions and hit ratio.
+    """
+    return user_services.user_cache.stats()
+
+
+@router.get('/read-cache')
+async def get_read_cache_stats():
+    """
+    Returns the read-through caches' sizes and counters.
+
+    Returns:
+        dict: For "tasks" and "users": size, maximum size, hits, misses, evictions, hit ratio, loader
+        runs, misses coalesced into another request's load, loads in progress and invalidations.
+    """
+    return {
+        "tasks": task_services.task_cache.stats(),
+        "users": user_services.profile_cache.stats(),
+    }
+
+
+@router.get('/websockets')
+async def get_websocket_stats():
+    """
+    Returns the WebSocket broadcast hub's connections, queue depths and message counters.
+
+    Returns:
+        dict: Policy, queue size, connection and user counts with their caps, total and maximum queue
+        depth, message counters, idle evictions and rejected connections, plus the listener's state
+        under "listener".
+    """
+    return {**hub.stats(), "listener": task_listener.stats()}
+
+
+@router.get('/logging')
+async def get_logging_stats():
+    """
+    Returns the log writer's queue depth and counters.
+
+    Returns:
+        dict: Records queued, written, batches written and records dropped because the queue was full.
+    """
+    return logging_stats()
+
+
+@metrics_router.get('/metrics', response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Returns request metrics in the Prometheus text exposition format.
+
+    Returns:
+        PlainTextResponse: `http_requests_total`, `http_request_duration_seconds` and
+        `http_requests_in_flight`, labelled by method and route template.
+    """
+    return PlainTextResponse(await metrics.collect(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,17 +1,294 @@
+"""
+Structured, Non-Blocking Logging
+
+Application log records (the `tasks_app` logger hierarchy) and one access record per HTTP request
+are written to LOG_FILE as JSON lines. Nothing on the request path touches the disk: records are
+put on a bounded in-memory queue and a single writer thread drains it, formats whole batches and
+writes each batch with one `write` and one `flush`. The file is rotated by size, keeping
+LOG_BACKUP_COUNT old files. If the writer falls behind and the queue fills up, new records are
+dropped and counted instead of slowing requests down.
+
+Access records carry the method, path, status, duration in milliseconds, the id of the
+authenticated user (when the request had one) and the number of SQL statements the request issued
+with the time they took:
+    {"ts": "2024-05-01T12:00:00.123456+00:00", "level": "INFO", "logger": "tasks_app.access",
+     "message": "request", "method": "GET", "path": "/task/", "status": 200, "duration_ms": 1.84,
+     "user_id": 7, "db_queries": 1, "db_ms": 0.61}
+
+Fast successful requests may be sampled with ACCESS_LOG_SAMPLE_RATE; sampled records include the
+rate so counts can be scaled back up. Errors, non-2xx responses and requests slower than
+ACCESS_LOG_SLOW_MS are always logged.
+
+Classes:
+    - JsonFormatter: Formats records as single-line JSON objects.
+    - DroppingQueueHandler: Queues records without blocking, dropping them when the queue is full.
+    - BatchingRotatingFileHandler: A size-rotated file handler that writes a batch of records at once.
+    - LogWriter: The writer thread moving records from the queue to the file handler.
+    - RequestLoggingMiddleware: ASGI middleware emitting one access record per HTTP request.
+
+Dependencies:
+    - logging, logging.handlers: For the handlers and the rotation logic.
+    - queue, threading: For the record queue and the writer thread.
+    - config.db_queries: For the query statistics of the current request.
+
+Environment Variables:
+    - LOG_FILE: Path of the log file (default info.log).
+    - LOG_MAX_BYTES: Size at which the file is rotated (default 10 MiB).
+    - LOG_BACKUP_COUNT: Rotated files kept (default 5).
+    - LOG_QUEUE_SIZE: Records buffered for the writer before new ones are dropped (default 10000).
+    - LOG_BATCH_SIZE: Most records written per batch (default 500).
+    - ACCESS_LOG_SAMPLE_RATE: Fraction of fast 2xx requests logged (default 1.0).
+    - ACCESS_LOG_SLOW_MS: Requests at least this slow are always logged (default 500).
+"""
+
+import atexit
+import json
 import logging
-from fastapi import Request
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, RotatingFileHandler
+from typing import Dict, List, Optional
+
+from config import db_queries
+
+LOG_FILE = os.getenv("LOG_FILE", "info.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", "500"))
+
+# Marks the end of the queue for the writer thread
+_STOP = object()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line.
+
+    Structured fields passed as `extra={"fields": {...}}` are merged into the object.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without ever blocking the caller.
+
+    Attributes:
+        dropped (int): Records discarded because the queue was full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the writer thread; only merge the arguments into the message now so
+        # that mutable arguments are captured as they are at the time of the call
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingRotatingFileHandler(RotatingFileHandler):
+    """
+    A size-rotated log file that writes and flushes a whole batch of records at once.
+    """
+
+    def emit_batch(self, records: List[logging.LogRecord]) -> None:
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record) + self.terminator)
+            except Exception:
+                self.handleError(record)
+        if not lines:
+            return
+        data = "".join(lines)
+        with self.lock:
+            try:
+                if self.stream is None:
+                    self.stream = self._open()
+                if self.maxBytes > 0 and 0 < self.stream.tell() and self.stream.tell() + len(data) >= self.maxBytes:
+                    self.doRollover()
+                    if self.stream is None:
+                        self.stream = self._open()
+                self.stream.write(data)
+                self.stream.flush()
+            except Exception:
+                # Keep the writer thread alive; the batch is reported and lost
+                self.handleError(records[-1])
+
+
+class LogWriter(threading.Thread):
+    """
+    Drains the record queue into the file handler in batches.
+
+    Attributes:
+        written (int): Records written to the handler.
+        batches (int): Batches written.
+    """
+
+    def __init__(self, log_queue: queue.Queue, handler: BatchingRotatingFileHandler, batch_size: int = LOG_BATCH_SIZE):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = log_queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.written = 0
+        self.batches = 0
+
+    def run(self) -> None:
+        while True:
+            record = self.queue.get()
+            stopping = record is _STOP
+            batch = [] if stopping else [record]
+            # Take whatever else is already waiting, so a burst costs one write
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    continue
+                batch.append(record)
+            if batch:
+                self.handler.emit_batch(batch)
+                self.written += len(batch)
+                self.batches += 1
+            for _ in range(len(batch) + stopping):
+                self.queue.task_done()
+            if stopping and self.queue.empty():
+                return
+
+    def flush(self) -> None:
+        """
+        Blocks until every record queued so far is written.
+        """
+        self.queue.join()
+
+    def stop(self) -> None:
+        """
+        Writes the remaining records and stops the thread.
+        """
+        if self.is_alive():
+            self.queue.put(_STOP)
+            self.join()
+        self.handler.close()
+
+
+def _configure() -> DroppingQueueHandler:
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    file_handler = BatchingRotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, delay=True
+    )
+    file_handler.setFormatter(JsonFormatter())
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.writer = LogWriter(log_queue, file_handler)
+    queue_handler.writer.start()
+    atexit.register(queue_handler.writer.stop)
+
+    app_logger = logging.getLogger("tasks_app")
+    app_logger.setLevel(logging.INFO)
+    app_logger.addHandler(queue_handler)
+    return queue_handler
+
+
+queue_handler = _configure()
+log_writer: LogWriter = queue_handler.writer
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-handler = logging.FileHandler('info.log')
-handler.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-
-
-async def logging_middleware(request: Request, call_next):
-    logger.info(f"Incoming request: {request.method} {request.url.path}")
-    response = await call_next(request)
-    logger.info(f"Outgoing response code: {response.status_code}")
-    return response
\ No newline at end of file
+access_logger = logging.getLogger("tasks_app.access")
+
+
+def logging_stats() -> Dict:
+    """
+    Returns the writer's counters and the current queue depth.
+    """
+    return {
+        "queued": log_writer.queue.qsize(),
+        "written": log_writer.written,
+        "batches": log_writer.batches,
+        "dropped": queue_handler.dropped,
+    }
+
+
+class RequestLoggingMiddleware:
+    """
+    ASGI middleware that emits one structured access record per HTTP request.
+
+    The authenticated user's id is read from the request state, where `get_current_user` leaves it.
+    """
+
+    def __init__(self, app, sample_rate: float = ACCESS_LOG_SAMPLE_RATE, slow_ms: float = ACCESS_LOG_SLOW_MS):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code: Optional[int] = None
+        # Shared with `request.state` of the endpoint and its dependencies
+        state = scope.setdefault("state", {})
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status_code = 500
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            fields = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "duration_ms": round(duration_ms, 3),
+                "user_id": state.get("user_id"),
+            }
+            query_stats = db_queries.current_stats()
+            if query_stats is not None:
+                fields["db_queries"] = query_stats.count
+                fields["db_ms"] = round(query_stats.seconds * 1000, 3)
+            # No `return` in here: it would swallow the exception in flight, e.g. a cancellation
+            should_log = True
+            if status_code is not None and 200 <= status_code < 300 and duration_ms < self.slow_ms \
+                    and self.sample_rate < 1.0:
+                should_log = random.random() < self.sample_rate
+                fields["sample_rate"] = self.sample_rate
+            if should_log:
+                access_logger.info("request", extra={"fields": fields})
@@ -0,0 +1,290 @@
+"""
+Request Metrics
+
+Records, for every HTTP request, a counter per route and status class and a latency histogram per
+route, plus the number of requests in flight, and renders them in the Prometheus text exposition
+format for GET /metrics.
+
+Routes are labelled with their path template (`/task/{id}`), never the raw URL, so the number of
+series is bounded by the number of routes; requests that match no route share the `<unmatched>`
+label. Recording runs on the event loop thread only, so it needs no lock: a request costs two clock
+reads, a bisection into the bucket bounds and a few dictionary updates.
+
+Every worker process keeps its own metrics. When METRICS_DIR is set, each worker writes a snapshot
+to `<METRICS_DIR>/worker-<pid>.json` every METRICS_FLUSH_INTERVAL seconds and at shutdown, and
+/metrics merges the snapshots of all workers, whichever worker serves the scrape: counters and
+histograms are summed, including those of workers that have exited, while the in-flight gauge only
+counts workers whose snapshot is recent.
+
+Classes:
+    - RequestMetrics: Per-process counters, histograms and the in-flight gauge.
+    - MetricsMiddleware: ASGI middleware recording each HTTP request into a `RequestMetrics`.
+
+Functions:
+    - merge_snapshots(snapshots: Iterable[dict]) -> dict: Sums snapshots of several workers.
+    - render(snapshot: dict) -> str: Renders a snapshot in the Prometheus text format.
+    - collect() -> str (async): The exposition of this process, or of all workers when METRICS_DIR is set.
+    - write_snapshot() -> None: Writes this process' snapshot to METRICS_DIR.
+    - run_flusher() -> None: Writes the snapshot periodically until cancelled.
+
+Environment Variables:
+    - METRICS_DIR: Directory shared by the workers for multi-worker aggregation (default unset, so
+      /metrics reports the serving process only). Empty it before starting the server.
+    - METRICS_FLUSH_INTERVAL: Seconds between snapshot writes (default 5).
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv("METRICS_DIR") or None
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Snapshots older than this many flush intervals belong to workers that are gone
+_STALE_INTERVALS = 3
+
+
+class RequestMetrics:
+    """
+    Request counters, latency histograms and the in-flight gauge of one process.
+
+    Attributes:
+        requests (Dict[Tuple[str, str, str], int]): Request count per (method, route, status class).
+        latency (Dict[Tuple[str, str], List]): Per (method, route): non-cumulative bucket counts
+            (one per `LATENCY_BUCKETS` bound plus +Inf), then the sum of durations in seconds.
+        in_flight (int): Requests currently being handled.
+    """
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.latency: Dict[Tuple[str, str], List] = {}
+        self.in_flight = 0
+
+    def observe(self, method: str, route: str, status_code: int, seconds: float) -> None:
+        """
+        Records one finished request.
+
+        Args:
+            method (str): The HTTP method.
+            route (str): The path template of the matched route.
+            status_code (int): The response status.
+            seconds (float): Time from receiving the request to finishing the response.
+        """
+        key = (method, route, f"{status_code // 100}xx")
+        self.requests[key] = self.requests.get(key, 0) + 1
+        series = self.latency.get(key[:2])
+        if series is None:
+            series = self.latency[key[:2]] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        series[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        series[-1] += seconds
+
+    def snapshot(self) -> Dict:
+        """
+        Returns a JSON-serialisable copy of the metrics.
+        """
+        return {
+            "requests": [[*key, count] for key, count in self.requests.items()],
+            "latency": [[*key, list(series)] for key, series in self.latency.items()],
+            "in_flight": self.in_flight,
+        }
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording every HTTP request into a `RequestMetrics`.
+    """
+
+    def __init__(self, app, metrics: Optional[RequestMetrics] = None):
+        self.app = app
+        self.metrics = metrics if metrics is not None else request_metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        status_code = 500
+        started = time.perf_counter()
+        metrics.in_flight += 1
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight -= 1
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            metrics.observe(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status_code,
+                time.perf_counter() - started,
+            )
+
+
+def merge_snapshots(snapshots: Iterable[Dict]) -> Dict:
+    """
+    Sums the snapshots of several workers into one.
+
+    Args:
+        snapshots (Iterable[dict]): Snapshots from `RequestMetrics.snapshot()`.
+
+    Returns:
+        dict: A snapshot with the same layout holding the totals.
+    """
+    merged = RequestMetrics()
+    for snapshot in snapshots:
+        for method, route, status_class, count in snapshot["requests"]:
+            key = (method, route, status_class)
+            merged.requests[key] = merged.requests.get(key, 0) + count
+        for method, route, series in snapshot["latency"]:
+            total = merged.latency.setdefault((method, route), [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+            for index, value in enumerate(series):
+                total[index] += value
+        merged.in_flight += snapshot["in_flight"]
+    return merged.snapshot()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def render(snapshot: Dict) -> str:
+    """
+    Renders a snapshot in the Prometheus text exposition format (version 0.0.4).
+
+    Args:
+        snapshot (dict): A snapshot from `RequestMetrics.snapshot()` or `merge_snapshots`.
+
+    Returns:
+        str: The exposition, ending with a newline.
+    """
+    lines = [
+        "# HELP http_requests_total HTTP requests by method, route template and status class.",
+        "# TYPE http_requests_total counter",
+    ]
+    for method, route, status_class, count in sorted(snapshot["requests"]):
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=status_class)} {count}")
+
+    lines += [
+        "# HELP http_request_duration_seconds HTTP request latency by method and route template.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for method, route, series in sorted(snapshot["latency"], key=lambda item: item[:2]):
+        running = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), series):
+            running += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(
+                f"http_request_duration_seconds_bucket{_labels(method=method, route=route, le=le)} {running}"
+            )
+        labels = _labels(method=method, route=route)
+        lines.append(f"http_request_duration_seconds_sum{labels} {series[-1]}")
+        lines.append(f"http_request_duration_seconds_count{labels} {running}")
+
+    lines += [
+        "# HELP http_requests_in_flight HTTP requests currently being handled.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {snapshot['in_flight']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"worker-{pid}.json")
+
+
+def write_snapshot(directory: Optional[str] = None) -> None:
+    """
+    Atomically writes this process' snapshot to the metrics directory.
+
+    Args:
+        directory (Optional[str]): The directory; defaults to METRICS_DIR.
+    """
+    directory = directory or METRICS_DIR
+    path = _snapshot_path(directory, os.getpid())
+    partial = f"{path}.tmp"
+    with open(partial, "w") as snapshot_file:
+        json.dump(request_metrics.snapshot(), snapshot_file)
+    os.replace(partial, path)
+
+
+def _read_snapshots(directory: str) -> List[Dict]:
+    own = _snapshot_path(directory, os.getpid())
+    stale_before = time.time() - _STALE_INTERVALS * METRICS_FLUSH_INTERVAL
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, "worker-*.json")):
+        if path == own:
+            continue
+        try:
+            with open(path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            if os.path.getmtime(path) < stale_before:
+                # A worker that exited: keep its counts, it has nothing in flight
+                snapshot["in_flight"] = 0
+        except (OSError, ValueError):
+            continue
+        snapshots.append(snapshot)
+    return snapshots
+
+
+async def collect(directory: Optional[str] = None) -> str:
+    """
+    Returns the exposition served at /metrics.
+
+    This process' own metrics are read live; the other workers' snapshots are read off the event loop.
+
+    Args:
+        directory (Optional[str]): The shared metrics directory; defaults to METRICS_DIR.
+
+    Returns:
+        str: This process' metrics, or the sum over all workers when a directory is configured.
+    """
+    directory = directory or METRICS_DIR
+    own = request_metrics.snapshot()
+    if directory is None:
+        return render(own)
+    others = await asyncio.to_thread(_read_snapshots, directory)
+    return render(merge_snapshots([own, *others]))
+
+
+async def run_flusher() -> None:
+    """
+    Writes this process' snapshot every METRICS_FLUSH_INTERVAL seconds, and once more when cancelled.
+    """
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    try:
+        while True:
+            try:
+                await asyncio.to_thread(write_snapshot)
+            except OSError as error:
+                logger.warning("Could not write metrics snapshot: %r", error)
+            await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+    finally:
+        write_snapshot()
+
+
+# The metrics of this process, recorded by `MetricsMiddleware`
+request_metrics = RequestMetrics()
@@ -0,0 +1,60 @@
+"""
+Per-Request Query Statistics
+
+ASGI middleware that collects the statements each HTTP request issues (see `config.db_queries`),
+reports them to the client in a `Server-Timing` header:
+    Server-Timing: db;dur=3.42;desc="4 queries"
+and logs a warning when one statement ran SQL_REPEAT_THRESHOLD times or more in the request, the
+signature of an N+1 access pattern.
+
+Classes:
+    - QueryStatsMiddleware: Collects query statistics per request and emits the header.
+
+Dependencies:
+    - config.db_queries: For the statistics collected by the engine hooks.
+"""
+
+from config import db_queries
+
+
+class QueryStatsMiddleware:
+    """
+    Collects the query statistics of every HTTP request.
+
+    The `Server-Timing` header covers the statements issued before the response started, which
+    includes everything the endpoint and its dependencies ran.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = db_queries.start_request()
+        stats = db_queries.current_stats()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            db_queries.end_request(token)
+            for statement, count in stats.repeated():
+                route = scope.get("route")
+                db_queries.logger.warning(
+                    "Statement repeated in one request (possible N+1)",
+                    extra={"fields": {
+                        "method": scope["method"],
+                        "route": getattr(route, "path", scope["path"]),
+                        "repeats": count,
+                        "statement": statement,
+                    }},
+                )
@@ -0,0 +1,211 @@
+"""
+Task Change Events
+
+Task services describe every committed change as a small event naming the task and its owner;
+WebSocket clients use it to refresh the affected task. Events are handed to the broadcast hub as
+`TaskEvent`s, which are serialised once per wire format and queued on the connections subscribed to
+the owner's topic or to the task's topic. Batching connections merge the events of one task that
+fall into the same batch.
+
+Events reach the other worker processes through Postgres: `notify_task_events` issues
+`pg_notify` inside the writing transaction, so the notification is delivered if and only if the
+transaction commits, and the `TaskEventListener` of every worker fans it out to its own clients.
+The worker that made the change publishes its events locally right after the commit instead, and
+its listener skips notifications carrying its own `ORIGIN`.
+
+Event format (JSON):
+    {"event": "task.created" | "task.updated" | "task.deleted", "task_id": 42, "user_id": 7}
+
+Notification payload:
+    The origin of the change on the first line, then one encoded event per line. Events are split
+    over several notifications so that each payload stays below Postgres' 8000-byte limit. Writes of
+    a single task build their one-event payload in SQL with `notify_in_returning` instead, so the
+    notification rides on the write statement itself.
+
+Classes:
+    - TaskEvent: A task change event as a hub `Event`, keyed by task ID.
+
+Functions:
+    - task_event(kind: str, task_id: int, user_id: int) -> dict: Builds one event.
+    - encode_event(event: dict) -> str: Serialises an event into a WebSocket frame.
+    - user_topic(user_id: int) -> str, task_topic(task_id: int) -> str: Hub topic names.
+    - event_topics(event: dict) -> Tuple[str, str]: The topics an event is published to.
+    - notification_payloads(events: Iterable[dict]) -> List[str]: Packs events into NOTIFY payloads.
+    - notify_task_events(database: AsyncSession, events: List[dict]) -> None: Queues the
+      notifications in the current transaction.
+    - payload_in_sql(kind: str, task_id, user_id) -> ColumnElement: The one-event payload, built in SQL.
+    - notify_in_returning(kind: str, task_id, user_id) -> ColumnElement: A `pg_notify` call for the
+      RETURNING clause of the statement that changes the task.
+    - publish_task_events(events: Iterable[dict]) -> None: Sends events to this worker's WebSocket clients.
+"""
+
+import json
+import os
+import uuid
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import ColumnElement, bindparam, func, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import String
+
+from tasks_app.realtime.hub import Event, hub
+
+TASK_CREATED = "task.created"
+TASK_UPDATED = "task.updated"
+TASK_DELETED = "task.deleted"
+
+# Postgres channel carrying task events between workers
+CHANNEL = os.getenv("TASK_EVENTS_CHANNEL", "task_events")
+
+
+def _new_origin() -> str:
+    return f"{uuid.uuid4().hex}-{os.getpid()}"
+
+
+# Identifies this process in notification payloads. Workers forked from a process that already
+# imported this module (e.g. a preloaded app) would inherit its value, so every child draws its own
+# after the fork; read it as `events.ORIGIN` rather than importing the name.
+ORIGIN = _new_origin()
+
+
+def _reset_origin_in_child() -> None:
+    global ORIGIN
+    ORIGIN = _new_origin()
+
+
+os.register_at_fork(after_in_child=_reset_origin_in_child)
+
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+
+_NOTIFY = text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload").bindparams(
+    bindparam("payloads", type_=ARRAY(String))
+)
+
+
+class TaskEvent(Event):
+    """
+    A task change event, coalesced with later events of the same task.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, event: dict, encoded_json: Optional[str] = None):
+        super().__init__(event, key=event["task_id"], encoded={"json": encoded_json} if encoded_json else None)
+
+    def merge(self, later: Event) -> Event:
+        # Clients reload the task on any event: a creation followed by updates is still a creation,
+        # while a deletion supersedes everything before it
+        if self.data["event"] == TASK_CREATED and later.data["event"] == TASK_UPDATED:
+            return self
+        return later
+
+
+def task_event(kind: str, task_id: int, user_id: int) -> dict:
+    """
+    Builds a task change event.
+
+    Args:
+        kind (str): One of TASK_CREATED, TASK_UPDATED or TASK_DELETED.
+        task_id (int): The changed task.
+        user_id (int): The task's owner.
+
+    Returns:
+        dict: The event.
+    """
+    return {"event": kind, "task_id": task_id, "user_id": user_id}
+
+
+def encode_event(event: dict) -> str:
+    return json.dumps(event, separators=(",", ":"))
+
+
+def user_topic(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def task_topic(task_id: int) -> str:
+    return f"task:{task_id}"
+
+
+def event_topics(event: dict) -> Tuple[str, str]:
+    # The owner sees all of their task events; other subscribers follow single tasks
+    return user_topic(event["user_id"]), task_topic(event["task_id"])
+
+
+def notification_payloads(events: Iterable[dict]) -> List[str]:
+    """
+    Packs encoded events into as few NOTIFY payloads as fit under MAX_PAYLOAD_BYTES.
+
+    Args:
+        events (Iterable[dict]): Events built with `task_event`.
+
+    Returns:
+        List[str]: Payloads, each starting with this process' ORIGIN line.
+    """
+    payloads = []
+    lines, size = [ORIGIN], len(ORIGIN)
+    for event in events:
+        line = encode_event(event)
+        if size + 1 + len(line) > MAX_PAYLOAD_BYTES and len(lines) > 1:
+            payloads.append("\n".join(lines))
+            lines, size = [ORIGIN], len(ORIGIN)
+        lines.append(line)
+        size += 1 + len(line)
+    if len(lines) > 1:
+        payloads.append("\n".join(lines))
+    return payloads
+
+
+async def notify_task_events(database: AsyncSession, events: List[dict]) -> None:
+    """
+    Queues notifications for the events in the session's current transaction.
+
+    Postgres holds the notifications until the transaction commits and drops them on rollback, so
+    other workers never hear about changes that did not happen. All payloads are sent in one
+    statement.
+
+    Args:
+        database (AsyncSession): The session about to commit the changes.
+        events (List[dict]): Events built with `task_event`.
+    """
+    payloads = notification_payloads(events)
+    if payloads:
+        await database.execute(_NOTIFY, {"channel": CHANNEL, "payloads": payloads})
+
+
+def payload_in_sql(kind: str, task_id: ColumnElement, user_id: ColumnElement) -> ColumnElement:
+    # Formats the one-event payload in Postgres, byte for byte as `notification_payloads` encodes it
+    template = f'{ORIGIN}\n{{"event":"{kind}","task_id":%s,"user_id":%s}}'
+    return func.format(template, task_id, user_id)
+
+
+def notify_in_returning(kind: str, task_id: ColumnElement, user_id: ColumnElement) -> ColumnElement:
+    """
+    Builds a `pg_notify` call to put in the RETURNING clause of the statement changing one task.
+
+    The payload is built by Postgres from the returned row, so the write and its notification are
+    one statement.
+
+    Args:
+        kind (str): One of TASK_CREATED, TASK_UPDATED or TASK_DELETED.
+        task_id (ColumnElement): The task ID column of the changed row (e.g. `Task.id`).
+        user_id (ColumnElement): The owner column of the changed row.
+
+    Returns:
+        ColumnElement: The expression; its value is NULL.
+    """
+    return func.pg_notify(CHANNEL, payload_in_sql(kind, task_id, user_id))
+
+
+def publish_task_events(events: Iterable[dict]) -> None:
+    """
+    Sends committed task events to the subscribed WebSocket clients of this worker.
+
+    Args:
+        events (Iterable[dict]): Events built with `task_event`.
+    """
+    for event in events:
+        hub.publish(TaskEvent(event), event_topics(event))
@@ -0,0 +1,550 @@
+"""
+WebSocket Broadcast Hub
+
+This module fans messages out to the WebSocket connections of one worker process without letting a
+slow client hold up the others. Every connection gets a bounded outbound queue drained by its own
+sender task; `BroadcastHub.publish` only appends to those queues and never awaits a socket.
+
+Connections subscribe to topics (e.g. "user:7", "task:42"). The hub keeps a topic -> connections
+index, so publishing to a topic touches only its subscribers instead of every connection of the
+process. A connection subscribed to several of a message's topics receives it once.
+
+Messages are either ready frames (str or bytes) or structured `Event`s. An event is encoded at
+most once per wire format, however many connections it goes to, so connections can pick their own
+encoding at connect time:
+    - "json": text frames.
+    - "msgpack": binary MessagePack frames.
+
+Connections in batch mode coalesce events: once an event is queued the sender waits up to
+WS_BATCH_WINDOW_MS or until WS_BATCH_MAX_EVENTS events are queued, merges events with the same
+key (`Event.merge`, e.g. repeated updates of one task) and sends them as a single array frame.
+Plain frames are never merged and keep their position in the stream.
+
+When a connection's queue is full the hub applies the slow-consumer policy:
+    - "drop_oldest": the oldest queued message is discarded to make room for the new one.
+    - "disconnect": the connection is closed with code 1013 (try again later); the client is
+      expected to reconnect and resynchronise.
+
+Dead connections are evicted by a heartbeat: every WS_HEARTBEAT_INTERVAL seconds the hub queues a
+`{"event":"ping"}` text frame on each connection, and closes (code 1001) the ones that have not
+sent anything for WS_IDLE_TIMEOUT seconds. Clients answer pings with `{"event":"pong"}`; any other
+message they send counts as well. Half-open TCP connections never answer, so they are dropped
+instead of being kept forever.
+
+The hub admits at most WS_MAX_CONNECTIONS connections and WS_MAX_CONNECTIONS_PER_USER per owner;
+`connect` raises `ConnectionLimitExceeded` beyond that.
+
+Classes:
+    - ConnectionLimitExceeded: Raised when a connection would exceed a connection cap.
+    - Event: A structured message with cached encodings and a coalescing key.
+    - Connection: One WebSocket with its outbound queue and sender task.
+    - BroadcastHub: The live connections of this process and their topic index, with publish and metrics.
+
+Dependencies:
+    - asyncio: For the sender tasks.
+    - collections.deque: For the bounded outbound queues.
+    - msgpack: For binary frames.
+    - fastapi.WebSocket: The connections being served.
+
+Environment Variables:
+    - WS_QUEUE_SIZE: Maximum number of messages queued per connection (default 256).
+    - WS_SLOW_CONSUMER_POLICY: "drop_oldest" (default) or "disconnect".
+    - WS_SEND_TIMEOUT: Seconds a single send may take before the connection is dropped (default 10).
+    - WS_BATCH_WINDOW_MS: How long a batching connection waits to collect events (default 20).
+    - WS_BATCH_MAX_EVENTS: Events that fill a batch before the window ends (default 100).
+    - WS_HEARTBEAT_INTERVAL: Seconds between pings, 0 to disable heartbeats (default 20).
+    - WS_IDLE_TIMEOUT: Seconds without a message from the client before it is evicted (default 60).
+    - WS_MAX_CONNECTIONS: Connections admitted per worker process (default 10000).
+    - WS_MAX_CONNECTIONS_PER_USER: Connections admitted per user and worker process (default 20).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Union
+
+import msgpack
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+WS_BATCH_WINDOW_MS = float(os.getenv("WS_BATCH_WINDOW_MS", "20"))
+WS_BATCH_MAX_EVENTS = int(os.getenv("WS_BATCH_MAX_EVENTS", "100"))
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60"))
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "10000"))
+WS_MAX_CONNECTIONS_PER_USER = int(os.getenv("WS_MAX_CONNECTIONS_PER_USER", "20"))
+
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "disconnect")
+
+# Close codes: evicted by the heartbeat or shutting down, disconnected by the "disconnect" policy
+# or the per-worker cap, and over the per-user cap
+CLOSE_GOING_AWAY = 1001
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_POLICY_VIOLATION = 1008
+
+PING_FRAME = '{"event":"ping"}'
+
+Message = Union[str, bytes]
+
+ENCODERS: Dict[str, Callable[[Any], Message]] = {
+    "json": lambda data: json.dumps(data, separators=(",", ":")),
+    "msgpack": msgpack.packb,
+}
+
+
+class ConnectionLimitExceeded(Exception):
+    """
+    Raised by `BroadcastHub.connect` when a connection cap is reached.
+
+    Attributes:
+        code (int): The WebSocket close code to reject the connection with.
+    """
+
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+
+
+def _encode_array(encoding: str, items: List[Message]) -> Message:
+    # Joins already encoded items into one array frame without encoding them again
+    if encoding == "json":
+        return "[" + ",".join(items) + "]"
+    if len(items) < 16:
+        header = bytes((0x90 | len(items),))
+    elif len(items) < 0x10000:
+        header = struct.pack(">BH", 0xdc, len(items))
+    else:
+        header = struct.pack(">BI", 0xdd, len(items))
+    return header + b"".join(items)
+
+
+class Event:
+    """
+    A structured message, encoded lazily and at most once per wire format.
+
+    Attributes:
+        data (Any): The JSON/MessagePack-serialisable payload.
+        key (Optional[Hashable]): Events with the same key are merged by batching connections;
+            None never merges.
+    """
+
+    __slots__ = ("data", "key", "_encoded")
+
+    def __init__(self, data: Any, key: Optional[Hashable] = None, encoded: Optional[Dict[str, Message]] = None):
+        self.data = data
+        self.key = key
+        self._encoded = dict(encoded or {})
+
+    def encode(self, encoding: str) -> Message:
+        encoded = self._encoded.get(encoding)
+        if encoded is None:
+            encoded = self._encoded[encoding] = ENCODERS[encoding](self.data)
+        return encoded
+
+    def merge(self, later: "Event") -> "Event":
+        """
+        Returns the event that stands for this one followed by `later` (same key) in a batch.
+        """
+        return later
+
+
+class Connection:
+    """
+    One WebSocket with its bounded outbound queue and the task that drains it.
+
+    Attributes:
+        websocket (WebSocket): The accepted socket.
+        sent (int): Messages written to the socket.
+        dropped (int): Messages discarded by the "drop_oldest" policy.
+        closed (bool): Whether the connection stopped accepting messages.
+        topics (Set[str]): Topics the connection is subscribed to.
+        encoding (str): Wire format of its events, a key of `ENCODERS`.
+        batch (bool): Whether events are coalesced into array frames.
+        owner (Optional[Hashable]): The user the connection belongs to, for the per-user cap.
+        last_seen (float): `time.monotonic()` of the last message received from the client.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        hub: "BroadcastHub",
+        encoding: str = "json",
+        batch: bool = False,
+        owner: Optional[Hashable] = None,
+    ):
+        if encoding not in ENCODERS:
+            raise ValueError(f"Unknown encoding: {encoding!r}")
+        self.websocket = websocket
+        self.owner = owner
+        self.last_seen = time.monotonic()
+        self.topics: Set[str] = set()
+        self.encoding = encoding
+        self.batch = batch
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._hub = hub
+        self._queue: deque = deque()
+        self._ready = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._sender: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> None:
+        self._sender = asyncio.create_task(self._send_loop())
+
+    def touch(self) -> None:
+        # Called for every message received from the client
+        self.last_seen = time.monotonic()
+
+    def enqueue(self, message: Union[Message, Event]) -> bool:
+        """
+        Queues a message for this connection without waiting for the socket.
+
+        Args:
+            message (Union[Message, Event]): Text or binary frame, or an event to encode.
+
+        Returns:
+            bool: False if the connection is closed or was closed by the slow-consumer policy.
+        """
+        if self.closed:
+            return False
+        if len(self._queue) >= self._hub.queue_size:
+            if self._hub.policy == "disconnect":
+                self._hub.slow_consumer_disconnects += 1
+                self.close(CLOSE_TRY_AGAIN_LATER)
+                return False
+            self._queue.popleft()
+            self.dropped += 1
+            self._hub.dropped += 1
+        self._queue.append(message)
+        self._ready.set()
+        if self.batch and len(self._queue) >= min(self._hub.batch_max_events, self._hub.queue_size):
+            self._batch_full.set()
+        return True
+
+    def _next_frame(self) -> Message:
+        # Pops the next frame: a plain message, a single event, or the coalesced leading run of events
+        head = self._queue.popleft()
+        if not isinstance(head, Event):
+            return head
+        if not self.batch:
+            return head.encode(self.encoding)
+        merged: Dict[Hashable, Event] = {head.key if head.key is not None else id(head): head}
+        taken = 1
+        while self._queue and isinstance(self._queue[0], Event) and taken < self._hub.batch_max_events:
+            event = self._queue.popleft()
+            taken += 1
+            key = event.key if event.key is not None else id(event)
+            earlier = merged.get(key)
+            merged[key] = event if earlier is None else earlier.merge(event)
+        self._hub.coalesced += taken - len(merged)
+        return _encode_array(self.encoding, [event.encode(self.encoding) for event in merged.values()])
+
+    async def _collect_batch(self) -> None:
+        # Gives a batch time to fill before it is sent
+        if len(self._queue) >= self._hub.batch_max_events:
+            return
+        self._batch_full.clear()
+        try:
+            await asyncio.wait_for(self._batch_full.wait(), self._hub.batch_window)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _send(self, message: Message) -> None:
+        if isinstance(message, bytes):
+            await self.websocket.send_bytes(message)
+        else:
+            await self.websocket.send_text(message)
+
+    async def _send_loop(self) -> None:
+        try:
+            # Checked as well as cancelling the task: wait_for() can swallow a cancellation that
+            # arrives just as a send completes
+            while not self.closed:
+                if not self._queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                if self.batch and isinstance(self._queue[0], Event):
+                    await self._collect_batch()
+                    if not self._queue:
+                        # Emptied by close() or the drop policy while waiting
+                        continue
+                await asyncio.wait_for(self._send(self._next_frame()), WS_SEND_TIMEOUT)
+                self.sent += 1
+                self._hub.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            # The peer went away or stopped reading; stop queueing for it and close the socket so
+            # that the endpoint waiting on it returns as well
+            logger.info("Dropping WebSocket connection after failed send: %r", error)
+            self._sender = None
+            self.close(CLOSE_GOING_AWAY)
+
+    def close(self, code: int = 1000) -> None:
+        """
+        Stops the sender, forgets queued messages and closes the socket in the background.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        self._hub.discard(self)
+        if self._sender is not None:
+            self._sender.cancel()
+        self._hub.run_in_background(self._close_socket(code))
+
+    async def _close_socket(self, code: int) -> None:
+        try:
+            await asyncio.wait_for(self.websocket.close(code), WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    async def wait_closed(self) -> None:
+        """
+        Cancels the sender task and waits until it has finished.
+        """
+        self.closed = True
+        self._queue.clear()
+        if self._sender is not None:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+
+
+class BroadcastHub:
+    """
+    The live WebSocket connections of this process.
+
+    Attributes:
+        topics (Dict[str, Set[Connection]]): Subscribers of each topic with at least one subscriber.
+        queue_size (int): Maximum number of messages queued per connection.
+        policy (str): Slow-consumer policy, one of `SLOW_CONSUMER_POLICIES`.
+        batch_window (float): Seconds a batching connection waits to collect events.
+        batch_max_events (int): Events that fill a batch before the window ends.
+        published (int): Messages passed to `publish`.
+        sent (int): Frames written to sockets.
+        coalesced (int): Events merged into another event of the same batch.
+        dropped (int): Messages discarded by the "drop_oldest" policy.
+        slow_consumer_disconnects (int): Connections closed by the "disconnect" policy.
+        heartbeat_interval (float): Seconds between pings; 0 disables the heartbeat.
+        idle_timeout (float): Seconds of client silence after which a connection is evicted.
+        max_connections (int): Connections admitted by this hub.
+        max_connections_per_user (int): Connections admitted per owner.
+        idle_evictions (int): Connections closed by the heartbeat.
+        rejected (int): Connections refused by a connection cap.
+    """
+
+    def __init__(
+        self,
+        queue_size: int,
+        policy: str = "drop_oldest",
+        batch_window_ms: float = WS_BATCH_WINDOW_MS,
+        batch_max_events: int = WS_BATCH_MAX_EVENTS,
+        heartbeat_interval: float = WS_HEARTBEAT_INTERVAL,
+        idle_timeout: float = WS_IDLE_TIMEOUT,
+        max_connections: int = WS_MAX_CONNECTIONS,
+        max_connections_per_user: int = WS_MAX_CONNECTIONS_PER_USER,
+    ):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy!r}")
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self.queue_size = queue_size
+        self.policy = policy
+        self.batch_window = batch_window_ms / 1000
+        self.batch_max_events = max(batch_max_events, 1)
+        self.connections: Set[Connection] = set()
+        self.topics: Dict[str, Set[Connection]] = {}
+        self.published = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.slow_consumer_disconnects = 0
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.max_connections_per_user = max_connections_per_user
+        self.idle_evictions = 0
+        self.rejected = 0
+        self._per_owner: Dict[Hashable, int] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+
+    def connect(
+        self,
+        websocket: WebSocket,
+        topics: Iterable[str] = (),
+        encoding: str = "json",
+        batch: bool = False,
+        owner: Optional[Hashable] = None,
+    ) -> Connection:
+        """
+        Registers an accepted socket and starts its sender task.
+
+        Args:
+            websocket (WebSocket): A socket on which `accept()` has completed.
+            topics (Iterable[str]): Topics to subscribe the connection to.
+            encoding (str): Wire format of the connection's events, a key of `ENCODERS`.
+            batch (bool): Whether to coalesce the connection's events into array frames.
+            owner (Optional[Hashable]): The user the connection belongs to, for the per-user cap.
+
+        Returns:
+            Connection: The registered connection.
+
+        Raises:
+            ConnectionLimitExceeded: If the hub or the owner has no connection left.
+        """
+        if len(self.connections) >= self.max_connections:
+            self.rejected += 1
+            raise ConnectionLimitExceeded("Too many connections", CLOSE_TRY_AGAIN_LATER)
+        if owner is not None and self._per_owner.get(owner, 0) >= self.max_connections_per_user:
+            self.rejected += 1
+            raise ConnectionLimitExceeded("Too many connections for this user", CLOSE_POLICY_VIOLATION)
+
+        connection = Connection(websocket, self, encoding, batch, owner)
+        self.connections.add(connection)
+        if owner is not None:
+            self._per_owner[owner] = self._per_owner.get(owner, 0) + 1
+        for topic in topics:
+            self.subscribe(connection, topic)
+        connection.start()
+        if self._heartbeat is None and self.heartbeat_interval > 0:
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        return connection
+
+    def subscribe(self, connection: Connection, topic: str) -> None:
+        if connection.closed:
+            return
+        connection.topics.add(topic)
+        self.topics.setdefault(topic, set()).add(connection)
+
+    def unsubscribe(self, connection: Connection, topic: str) -> None:
+        connection.topics.discard(topic)
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.topics[topic]
+
+    def discard(self, connection: Connection) -> None:
+        if connection not in self.connections:
+            return
+        self.connections.remove(connection)
+        for topic in tuple(connection.topics):
+            self.unsubscribe(connection, topic)
+        if connection.owner is not None:
+            remaining = self._per_owner.pop(connection.owner) - 1
+            if remaining:
+                self._per_owner[connection.owner] = remaining
+
+    def run_in_background(self, coroutine) -> None:
+        # Keeps a reference to fire-and-forget tasks until they finish, so they are not collected early
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def check_liveness(self) -> None:
+        """
+        Evicts connections whose client has been silent for `idle_timeout` and pings the others.
+        """
+        deadline = time.monotonic() - self.idle_timeout
+        for connection in tuple(self.connections):
+            if connection.last_seen < deadline:
+                self.idle_evictions += 1
+                connection.close(CLOSE_GOING_AWAY)
+            else:
+                connection.enqueue(PING_FRAME)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.check_liveness()
+
+    async def disconnect(self, connection: Connection) -> None:
+        """
+        Unregisters a connection and stops its sender task.
+        """
+        self.discard(connection)
+        await connection.wait_closed()
+
+    def publish(self, message: Union[Message, Event], topics: Optional[Iterable[str]] = None) -> int:
+        """
+        Queues a message on the subscribers of the given topics, or on every live connection.
+
+        Args:
+            message (Union[Message, Event]): Text or binary frame, or an event encoded for each
+                connection's wire format.
+            topics (Optional[Iterable[str]]): Topics the message belongs to; None broadcasts it to
+                every connection of this process.
+
+        Returns:
+            int: Number of connections the message was queued on.
+        """
+        self.published += 1
+        if topics is None:
+            targets = tuple(self.connections)
+        else:
+            # A snapshot, since the disconnect policy removes connections while publishing
+            targets = set()
+            for topic in topics:
+                targets.update(self.topics.get(topic, ()))
+        delivered = 0
+        for connection in targets:
+            if connection.enqueue(message):
+                delivered += 1
+        return delivered
+
+    def stats(self) -> Dict:
+        """
+        Returns the hub configuration, connection count, queue depths and message counters.
+        """
+        depths = [connection.queue_depth for connection in self.connections]
+        return {
+            "policy": self.policy,
+            "queue_size": self.queue_size,
+            "connections": len(depths),
+            "max_connections": self.max_connections,
+            "users": len(self._per_owner),
+            "max_connections_per_user": self.max_connections_per_user,
+            "topics": len(self.topics),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "published": self.published,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "slow_consumer_disconnects": self.slow_consumer_disconnects,
+            "idle_evictions": self.idle_evictions,
+            "rejected": self.rejected,
+        }
+
+    async def close(self) -> None:
+        """
+        Closes every connection and stops the heartbeat; used on shutdown.
+        """
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        for connection in tuple(self.connections):
+            connection.close(CLOSE_GOING_AWAY)
+            await connection.wait_closed()
+
+
+# The hub shared by all WebSocket endpoints of this process
+hub = BroadcastHub(WS_QUEUE_SIZE, WS_SLOW_CONSUMER_POLICY)
@@ -0,0 +1,163 @@
+"""
+Task Event Listener
+
+Each worker process holds one dedicated Postgres connection that `LISTEN`s on the task event
+channel and forwards the events other workers commit to its own subscribed WebSocket clients
+through the broadcast hub, and drops the tasks they changed from this worker's read-through task
+cache. The connection lives outside the engine pools so it never takes a slot needed by
+requests.
+
+If the connection drops, the listener reconnects with exponential backoff (up to
+LISTEN_RECONNECT_MAX seconds between attempts). Events committed while it is disconnected are not
+replayed; clients reload the tasks they show when their socket reconnects, and cached tasks expire
+after READ_CACHE_TTL.
+
+Classes:
+    - TaskEventListener: Listens on a channel and publishes foreign events to the hub.
+
+Dependencies:
+    - asyncpg: For the listening connection.
+    - config.db_settings: For the database URL.
+    - tasks_app.realtime.events: For the channel name, payload format and this process' origin.
+    - tasks_app.realtime.hub: For local fan-out.
+    - tasks_app.tasks.services: For the task cache to invalidate.
+
+Environment Variables:
+    - TASK_EVENTS_LISTEN: Whether this worker listens for other workers' events (default true).
+    - LISTEN_RECONNECT_MAX: Longest wait in seconds between reconnection attempts (default 30).
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Optional, Set
+
+import asyncpg
+
+from config import db_settings
+from tasks_app.realtime import events
+from tasks_app.realtime.hub import BroadcastHub, hub
+from tasks_app.tasks.services import task_cache
+
+logger = logging.getLogger(__name__)
+
+TASK_EVENTS_LISTEN = os.getenv("TASK_EVENTS_LISTEN", "true").lower() in ("1", "true", "yes")
+LISTEN_RECONNECT_MAX = float(os.getenv("LISTEN_RECONNECT_MAX", "30"))
+
+
+class TaskEventListener:
+    """
+    Forwards task events committed by other processes to this process' WebSocket clients.
+
+    Attributes:
+        dsn (str): Postgres URL of the database the workers write to.
+        connected (bool): Whether the listening connection is currently up.
+        received (int): Notifications received, including this process' own.
+        forwarded (int): Events published to the hub.
+        reconnects (int): Connections re-established after a failure.
+    """
+
+    def __init__(self, dsn: str, channel: str = events.CHANNEL, target: BroadcastHub = hub):
+        self.dsn = dsn
+        self.channel = channel
+        self.connected = False
+        self.received = 0
+        self.forwarded = 0
+        self.reconnects = 0
+        self._hub = target
+        self._task: Optional[asyncio.Task] = None
+        self._ever_connected = False
+        # Cache invalidations in progress; the loop only keeps weak references to tasks
+        self._invalidations: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """
+        Starts listening in a background task; does not wait for the connection.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops listening and closes the connection.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        self.received += 1
+        origin, _, body = payload.partition("\n")
+        if origin == events.ORIGIN or not body:
+            # Published and invalidated locally right after the commit
+            return
+        changed = []
+        for line in body.split("\n"):
+            event = json.loads(line)
+            # The line is the event's JSON encoding already; keep it so it is not encoded again
+            self._hub.publish(events.TaskEvent(event, encoded_json=line), events.event_topics(event))
+            self.forwarded += 1
+            if event["event"] != events.TASK_CREATED:
+                changed.append(event["task_id"])
+        if changed:
+            invalidation = asyncio.get_running_loop().create_task(task_cache.invalidate(*changed))
+            self._invalidations.add(invalidation)
+            invalidation.add_done_callback(self._invalidation_done)
+
+    def _invalidation_done(self, invalidation: asyncio.Task) -> None:
+        self._invalidations.discard(invalidation)
+        if not invalidation.cancelled() and invalidation.exception() is not None:
+            logger.error("Could not invalidate cached tasks", exc_info=invalidation.exception())
+
+    async def _listen_once(self, lost: asyncio.Event) -> None:
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            connection.add_termination_listener(lambda _: lost.set())
+            await connection.add_listener(self.channel, self._on_notification)
+            if self._ever_connected:
+                self.reconnects += 1
+            self.connected = self._ever_connected = True
+            logger.info("Listening for task events on channel %r", self.channel)
+            await lost.wait()
+        finally:
+            self.connected = False
+            if not connection.is_closed():
+                await connection.close(timeout=5)
+
+    async def _run(self) -> None:
+        delay = 0.5
+        while True:
+            lost = asyncio.Event()
+            try:
+                await self._listen_once(lost)
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as error:
+                logger.warning("Task event listener connection failed: %r", error)
+            if lost.is_set():
+                # The connection was up and dropped; start the backoff over
+                delay = 0.5
+                logger.warning("Task event listener lost its connection; reconnecting")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LISTEN_RECONNECT_MAX)
+
+    def stats(self) -> Dict:
+        """
+        Returns the listener's state and counters.
+        """
+        return {
+            "enabled": self._task is not None,
+            "channel": self.channel,
+            "connected": self.connected,
+            "received": self.received,
+            "forwarded": self.forwarded,
+            "reconnects": self.reconnects,
+        }
+
+
+# The listener of this process, started by the application lifespan
+task_listener = TaskEventListener(db_settings.SQLALCHEMY_DATABASE_URL)
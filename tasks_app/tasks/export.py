@@ -0,0 +1,96 @@
+"""
+Streaming Task Export
+
+Encodes rows of task columns as NDJSON or CSV one batch at a time, optionally gzip-compressed, so
+an export of any size holds only one batch of rows and its encoded bytes in memory. The rows come
+from a server-side cursor (see `services.stream_task_rows`); nothing here touches the database.
+
+Functions:
+    - encode_ndjson(batches) -> AsyncIterator[bytes]: One JSON object per line.
+    - encode_csv(batches) -> AsyncIterator[bytes]: A header line, then one CSV record per row.
+    - gzip_chunks(chunks, level) -> AsyncIterator[bytes]: Compresses a byte stream into one gzip member.
+    - accepts_gzip(accept_encoding) -> bool: Whether an Accept-Encoding header allows gzip.
+
+Environment Variables:
+    - EXPORT_BATCH_SIZE: Rows fetched from the cursor and encoded per chunk (default 1000).
+    - EXPORT_GZIP_LEVEL: zlib compression level of gzip-encoded exports (default 6).
+"""
+
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Optional, Sequence
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+# Exported task columns, in output order
+EXPORT_COLUMNS = ("id", "title", "description", "completed", "due_date", "creation_date")
+
+# Media type and file extension of each export format
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+Batches = AsyncIterator[Sequence[Sequence]]
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def encode_ndjson(batches: Batches) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(_value, row))), separators=(",", ":")) + "\n" for row in rows
+        ).encode()
+
+
+async def encode_csv(batches: Batches) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in batches:
+        writer.writerows([[_value(value) for value in row] for row in rows])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Only the header: the user has no tasks
+        yield buffer.getvalue().encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = EXPORT_GZIP_LEVEL) -> AsyncIterator[bytes]:
+    """
+    Compresses a byte stream into one gzip member, yielding compressed data as it becomes available.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    Returns whether an Accept-Encoding header allows a gzip-encoded response. An explicit gzip
+    entry takes precedence over `*`, and `q=0` refuses the coding.
+    """
+    qualities = {}
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        quality = 1.0
+        params = params.strip().lower()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+    quality = qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0)))
+    return quality > 0
@@ -0,0 +1,252 @@
+"""
+Bulk Task Import with COPY
+
+Loads an NDJSON or CSV stream of tasks for one user at COPY speed instead of one INSERT per task.
+The upload is parsed and validated row by row as it arrives: each row must be a valid
+`TaskCreate` and fit the `tasks` columns. Valid rows are streamed straight into a binary `COPY`
+to a temporary staging table, and once the upload ends a single `INSERT ... SELECT` moves them into
+`tasks` and the transaction commits. Rows with problems are skipped and reported by line number,
+so one bad row does not fail an import of a hundred thousand. Neither the upload nor the rows are
+held in memory.
+
+Imported tasks are not announced on the WebSocket streams one by one; clients reload their task
+lists after an import.
+
+Usage:
+    python -m tasks_app.tasks.importer --email john@example.com --format csv tasks.csv
+
+reads the file (or `-` for standard input) and imports it for the given user against the database
+configured through the usual POSTGRES_* environment variables.
+
+Classes:
+    - ImportReport: Counts imported and rejected rows and keeps the first IMPORT_MAX_ERRORS problems.
+
+Functions:
+    - ndjson_rows(chunks) -> AsyncIterator: The (line, text) pairs of an NDJSON byte stream, per chunk.
+    - csv_rows(chunks) -> AsyncIterator: The (line, record) pairs of a CSV byte stream with a header line, per chunk.
+    - valid_records(rows, report) -> AsyncIterator[tuple]: The staging records of the rows that validate.
+    - import_tasks(chunks, format, owner_id, database) -> TaskImportResult: Imports a stream for one user.
+
+Environment Variables:
+    - IMPORT_MAX_ERRORS: Rejected rows reported in detail; the rest are only counted (default 1000).
+"""
+
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import db_settings
+from tasks_app.db_models.models import Task, User
+from tasks_app.tasks.schema import TaskCreate, TaskImportError, TaskImportResult
+
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+# Columns of the staging table, in COPY order
+STAGING_COLUMNS = ("line", "title", "description", "due_date", "creation_date")
+
+CREATE_STAGING = text(
+    "CREATE TEMPORARY TABLE task_import "
+    "(line integer, title text, description text, due_date timestamp, creation_date timestamp) ON COMMIT DROP"
+)
+
+MERGE_STAGING = text(
+    "INSERT INTO tasks (title, description, due_date, creation_date, completed, user_id) "
+    "SELECT title, description, due_date, creation_date, false, :owner_id FROM task_import ORDER BY line"
+)
+
+# Longest values the `tasks` columns accept, checked per row so the merge cannot fail
+MAX_LENGTHS = {"title": Task.title.type.length, "description": Task.description.type.length}
+
+# A row's line number and its NDJSON text, CSV record, or the ValueError of why it could not be parsed
+Row = Tuple[int, object]
+
+
+class ImportReport:
+    """
+    Counts imported and rejected rows and keeps the first `max_errors` problems.
+
+    Attributes:
+        imported (int): Rows moved into `tasks`.
+        rejected (int): Rows skipped because of problems.
+        errors (List[TaskImportError]): The first rejected rows' problems.
+    """
+
+    def __init__(self, max_errors: int = IMPORT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.imported = 0
+        self.rejected = 0
+        self.errors: List[TaskImportError] = []
+
+    def reject(self, line: int, errors: List[str]) -> None:
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(TaskImportError(line=line, errors=errors))
+
+    def result(self) -> TaskImportResult:
+        return TaskImportResult(imported=self.imported, rejected=self.rejected, errors=self.errors)
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+    # Yields the complete lines of each chunk at once; per-line iteration stays synchronous. UTF-8
+    # is decoded incrementally, so a character split between two chunks is not an error.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        if complete:
+            yield complete
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield [pending]
+
+
+async def ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[Row]]:
+    """
+    Yields, a chunk at a time, the line number and text of each non-blank line of an NDJSON
+    stream; the text is parsed and validated in one step by `valid_records`.
+    """
+    number = 0
+    async for lines in _lines(chunks):
+        rows = []
+        for line in lines:
+            number += 1
+            if line.strip():
+                rows.append((number, line))
+        yield rows
+
+
+async def csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[Row]]:
+    """
+    Yields, a chunk at a time, the starting line number and a column-to-value mapping of each
+    record of a CSV stream whose first line names the columns, or a ValueError for records with the
+    wrong number of fields. Quoted fields may span lines.
+    """
+    header: Optional[List[str]] = None
+    record, start, number = "", 0, 0
+    async for lines in _lines(chunks):
+        rows = []
+        for line in lines:
+            number += 1
+            if not record:
+                start = number
+            record += line + "\n"
+            if record.count('"') % 2:
+                # Inside a quoted field: the record continues on the next line
+                continue
+            fields = next(csv.reader([record.rstrip("\r\n")]), [])
+            record = ""
+            if not any(fields):
+                continue
+            if header is None:
+                header = [name.strip() for name in fields]
+            elif len(fields) != len(header):
+                rows.append((start, ValueError(f"expected {len(header)} fields, found {len(fields)}")))
+            else:
+                rows.append((start, dict(zip(header, fields))))
+        yield rows
+    if record:
+        yield [(start, ValueError("unterminated quoted field"))]
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # `tasks` stores timestamps without time zone; offsets are converted to UTC
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _problems(row: object) -> Tuple[Optional[TaskCreate], List[str]]:
+    if isinstance(row, ValueError):
+        return None, [str(row)]
+    try:
+        # NDJSON lines are parsed by pydantic itself, which is faster than json.loads and validating
+        task = TaskCreate.model_validate_json(row) if isinstance(row, str) else TaskCreate.model_validate(row)
+    except ValidationError as error:
+        return None, [f"{'.'.join(map(str, problem['loc'])) or 'row'}: {problem['msg']}" for problem in error.errors()]
+    problems = [
+        f"{name}: at most {length} characters" for name, length in MAX_LENGTHS.items()
+        if len(getattr(task, name)) > length
+    ]
+    return (None if problems else task), problems
+
+
+async def valid_records(rows: AsyncIterator[List[Row]], report: ImportReport) -> AsyncIterator[tuple]:
+    """
+    Validates parsed rows against `TaskCreate` and the column lengths, reporting the invalid ones,
+    and yields the staging records (in STAGING_COLUMNS order) of the valid ones.
+    """
+    async for batch in rows:
+        for line, row in batch:
+            task, problems = _problems(row)
+            if task is None:
+                report.reject(line, problems)
+                continue
+            yield line, task.title, task.description, _naive_utc(task.due_date), _naive_utc(task.creation_date)
+
+
+async def import_tasks(
+    chunks: AsyncIterator[bytes], format: str, owner_id: int, database: AsyncSession
+) -> TaskImportResult:
+    """
+    Imports an NDJSON or CSV stream as tasks of one user in one transaction.
+
+    The valid rows are copied into a staging table while the stream is read and moved into `tasks`
+    by one `INSERT ... SELECT` at the end, in upload order; invalid rows are skipped and reported.
+
+    Returns:
+        TaskImportResult: The number of imported and rejected rows and the first rejected rows' problems.
+    """
+    report = ImportReport()
+    rows = csv_rows(chunks) if format == "csv" else ndjson_rows(chunks)
+    await database.execute(CREATE_STAGING)
+    connection = await database.connection()
+    driver = (await connection.get_raw_connection()).driver_connection
+    # Runs on the session's connection, inside the transaction the staging table belongs to
+    await driver.copy_records_to_table("task_import", records=valid_records(rows, report), columns=STAGING_COLUMNS)
+    report.imported = (await database.execute(MERGE_STAGING, {"owner_id": owner_id})).rowcount
+    await database.commit()
+    return report.result()
+
+
+async def _file_chunks(stream, size: int = 1 << 16) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await asyncio.to_thread(stream.read, size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def _import_file(path: str, format: str, email: str) -> Dict:
+    async with db_settings.AsyncSessionLocal() as database:
+        owner_id = await database.scalar(select(User.id).where(User.email == email))
+        if owner_id is None:
+            raise SystemExit(f"No user with email {email}")
+        if path == "-":
+            result = await import_tasks(_file_chunks(sys.stdin.buffer), format, owner_id, database)
+        else:
+            with open(path, "rb") as stream:
+                result = await import_tasks(_file_chunks(stream), format, owner_id, database)
+    await db_settings.async_engine.dispose()
+    return result.model_dump()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the tasks in PATH (NDJSON or CSV) for one user.")
+    parser.add_argument("path", help="file to import, - for standard input")
+    parser.add_argument("--email", required=True, help="email of the user who will own the tasks")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None,
+                        help="input format; by default taken from the file extension, NDJSON otherwise")
+    args = parser.parse_args()
+    format_ = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    print(json.dumps(asyncio.run(_import_file(args.path, format_, args.email)), indent=2))
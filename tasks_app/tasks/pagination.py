@@ -0,0 +1,68 @@
+"""
+Opaque Cursors for Keyset Pagination
+
+A cursor records the sort key of the last row on a page so the next page can start with an index
+range scan (`WHERE (sort_column, id) > (:value, :id)`) instead of skipping rows with OFFSET.
+Clients treat cursors as opaque strings; internally they are URL-safe base64 encoded JSON.
+
+Functions:
+    - encode_cursor(payload: dict) -> str: Encodes a cursor payload.
+    - decode_cursor(cursor: str) -> dict: Decodes a cursor produced by `encode_cursor`.
+
+Exceptions:
+    - InvalidCursor: Raised when a cursor cannot be decoded.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a cursor is malformed or was not produced by `encode_cursor`.
+    """
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def encode_cursor(payload: dict) -> str:
+    """
+    Encodes a cursor payload.
+
+    Args:
+        payload (dict): JSON-serialisable values; datetimes are stored in ISO 8601 format.
+
+    Returns:
+        str: URL-safe cursor string without padding.
+    """
+    raw = json.dumps(payload, separators=(",", ":"), default=_default).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Decodes a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor string received from the client.
+
+    Returns:
+        dict: The cursor payload. Datetimes are returned as ISO 8601 strings.
+
+    Raises:
+        InvalidCursor: If the cursor is not valid base64-encoded JSON object.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError) as error:
+        raise InvalidCursor("Malformed cursor") from error
+    if not isinstance(payload, dict):
+        raise InvalidCursor("Malformed cursor")
+    return payload
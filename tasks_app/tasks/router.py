@@ -7,107 +7,257 @@ Imports:
     - List, Set: Type hinting for lists and sets.
     - APIRouter, Depends, status, Response, HTTPException: FastAPI components for building API routes.
     - WebSocket, WebSocketDisconnect: FastAPI components for handling WebSocket connections.
-    - Session: SQLAlchemy session for database interactions.
+    - StreamingResponse: For task exports, sent while they are read.
+    - AsyncSession: SQLAlchemy asyncio session for database interactions.
     - get_current_user: Dependency for retrieving the current authenticated user.
     - db_settings: Configuration settings for the database.
     - schema: Module containing Pydantic models for request and response bodies.
     - services: Module containing business logic for task management.
+    - export: Export formats and Accept-Encoding negotiation.
     - User: SQLAlchemy model representing a user in the database.
+    - get_websocket_user: Dependency authenticating WebSocket connections.
 
 Router:
-    - APIRouter: Prefixes all routes with '/task' and tags them as 'Tasks'.
-
-Variables:
-    - active_connections: A set to keep track of active WebSocket connections.
+    - router: Prefixes all routes with '/task' and tags them as 'Tasks'.
+    - ws_router: The WebSocket route under the same prefix. It is mounted separately because the
+      HTTP bearer-token dependency of `router` cannot run on WebSocket connections.
 
 Endpoints:
     - websocket_endpoint: WebSocket endpoint at '/ws/tasks/{client_id}'. 
-      Manages real-time communication with clients.
+      Authenticates the connection and streams the change events of the user's tasks through the
+      broadcast hub. Clients send TaskSubscription messages to follow individual tasks or to stop
+      receiving all task events; each is answered with the resulting subscriptions as a JSON text frame.
+      The hub pings the client periodically; clients answer with {"event": "pong"} and are evicted
+      when silent for too long. Connections over the per-worker or per-user cap are closed right
+      after the handshake with code 1013 or 1008.
+      The `encoding` query parameter selects JSON text or MessagePack binary event frames, and
+      `batch=true` coalesces events into one array frame per batch window.
+      `client_id` is kept in the path for existing clients and is not used.
     - create_task: POST endpoint at '/tasks/'. 
       Creates a new task with the provided data and returns the created task.
     - get_user_by_id: GET endpoint at '/{task_id}'. 
-      Retrieves a task by its ID and returns the task data.
+      Retrieves a task by its ID through the read-through cache and returns the task data with its
+      ETag. With If-None-Match naming the current version the answer is 304 Not Modified.
     - get_all_tasks: GET endpoint at '/'. 
-      Retrieves a paginated list of all tasks with optional skip and limit query parameters.
+      Retrieves one keyset-paginated page of the current user's tasks, optionally filtered by completion
+      and due date and sorted by creation or due date; follow `next_cursor` to fetch the next page.
+    - export_tasks: GET endpoint at '/export'. 
+      Streams all of the current user's tasks as NDJSON (default) or CSV (`format=csv`) from a
+      server-side cursor, in constant memory; gzip-compressed when the client's Accept-Encoding allows it.
+    - import_tasks: POST endpoint at '/import'. 
+      Imports an NDJSON (default) or CSV (`format=csv`) request body as tasks of the current user.
+      The body is validated row by row while it streams in and loaded with COPY; rows with problems
+      are skipped and reported by line number.
+    - search_tasks: GET endpoint at '/search'. 
+      Full-text search over the current user's task titles and descriptions. Every word of `q`
+      matches as a prefix; results are ranked (title matches first) and keyset-paginated like listings.
     - update_task_by_id: PUT endpoint at '/tasks/{task_id}'. 
       Updates a task by its ID with the provided update data and returns the updated task.
+    - patch_task_by_id: PATCH endpoint at '/{task_id}'. 
+      Changes only the fields present in the body (e.g. {"completed": true}) and returns the task.
     - delete_task: DELETE endpoint at '/{task_id}'. 
       Deletes a task by its ID and returns the deleted task data.
+    The three writes accept If-Match with the task's ETag and answer 412 Precondition Failed when the
+    task has been changed since; PUT and PATCH return the new ETag.
+    - apply_task_batch: POST endpoint at '/tasks/batch'. 
+      Creates, updates and deletes many of the current user's tasks in one transaction and returns
+      a result per item.
 
 Dependencies:
     - get_current_user: Dependency to get the current authenticated user from JWT.
-    - db_settings.get_db: Dependency to get the database session.
+    - db_settings.get_async_db: Dependency to get the asynchronous database session.
 
 Schemas:
     - schema.TaskDisplay: Pydantic model for displaying task data in responses.
     - schema.TaskCreate: Pydantic model for creating a new task.
     - schema.TaskUpdate: Pydantic model for updating an existing task.
+    - schema.TaskPatch: Pydantic model for partially updating an existing task.
+    - schema.TaskPage: Pydantic model for one page of tasks and the next page's cursor.
+    - schema.TaskImportResult: Pydantic model for the outcome of an import.
+    - schema.TaskBatch, schema.TaskBatchResult: Pydantic models for batch requests and their per-item results.
+    - schema.TaskSubscription: Pydantic model for WebSocket subscription messages.
 """
-from typing import List, Set
+import json
+from datetime import datetime
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, status, Response, HTTPException
-from sqlalchemy.orm import Session
-from fastapi import WebSocket, WebSocketDisconnect, APIRouter
+from fastapi import APIRouter, Depends, Header, status, Request, Response, HTTPException, Query
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import WebSocket, WebSocketDisconnect, WebSocketException, APIRouter
+from fastapi.responses import StreamingResponse
 
-from tasks_app.auth.jwt import get_current_user
+from tasks_app.auth.jwt import get_current_user, get_websocket_user
+from tasks_app.auth.schema import TokenData
+from tasks_app.cache import etag
 from config import db_settings
 from . import schema
+from . import export
 from . import services
 from tasks_app.db_models.models import User
+from tasks_app.realtime.hub import ConnectionLimitExceeded, hub
 
 router = APIRouter(
     tags=['Tasks'],
     prefix='/task'
 )
 
-active_connections: Set[WebSocket] = set()
+ws_router = APIRouter(
+    tags=['Tasks'],
+    prefix='/task'
+)
 
-@router.websocket("/ws/tasks/{client_id}")
-async def websocket_endpoint(client_id: int, websocket: WebSocket):
-    await websocket.accept()
-    active_connections.add(websocket)
+@ws_router.websocket("/ws/tasks/{client_id}")
+async def websocket_endpoint(
+    client_id: int,
+    websocket: WebSocket,
+    encoding: Literal["json", "msgpack"] = "json",
+    batch: bool = False,
+    current_user: TokenData = Depends(get_websocket_user),
+    database: AsyncSession = Depends(db_settings.get_async_db)
+):
+    try:
+        connection, owner_id = await services.open_task_stream(websocket, current_user, database, encoding, batch)
+    except HTTPException:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="User not found")
+    except ConnectionLimitExceeded as error:
+        raise WebSocketException(code=error.code, reason=str(error))
     try:
         while True:
             message = await websocket.receive_text()
-            for connection in active_connections:
-                await connection.send_text(f"Client with {client_id} wrote {message}!")
+            connection.touch()
+            try:
+                payload = json.loads(message)
+                if isinstance(payload, dict) and payload.get("event") == "pong":
+                    continue
+                subscription = schema.TaskSubscription.model_validate(payload)
+            except (ValueError, ValidationError):
+                connection.enqueue(json.dumps({"error": "Invalid subscription message"}))
+                continue
+            reply = await services.update_task_subscriptions(subscription, connection, owner_id, database)
+            connection.enqueue(json.dumps(reply))
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        pass
+    finally:
+        await hub.disconnect(connection)
 
 @router.post("/tasks/", status_code=status.HTTP_201_CREATED, response_model=schema.TaskDisplay)
 async def create_task(
     task: schema.TaskCreate,
     current_user: User = Depends(get_current_user),
-    database: Session = Depends(db_settings.get_db)
+    database: AsyncSession = Depends(db_settings.get_async_db)
 ):
     return await services.create_new_task(task, current_user, database)
 
+@router.post("/tasks/batch", response_model=schema.TaskBatchResult)
+async def apply_task_batch(
+    batch: schema.TaskBatch,
+    current_user: TokenData = Depends(get_current_user),
+    database: AsyncSession = Depends(db_settings.get_async_db)
+):
+    return await services.apply_task_batch(batch, current_user, database)
+
+@router.get('/export', response_class=StreamingResponse)
+async def export_tasks(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    accept_encoding: Optional[str] = Header(None),
+    current_user: TokenData = Depends(get_current_user),
+    database: AsyncSession = Depends(db_settings.get_async_db),
+):
+    gzip = export.accepts_gzip(accept_encoding)
+    media_type, extension = export.EXPORT_FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="tasks.{extension}"', "Vary": "Accept-Encoding"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    chunks = await services.export_tasks(current_user, database, format, gzip)
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+@router.post('/import', response_model=schema.TaskImportResult)
+async def import_tasks(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: TokenData = Depends(get_current_user),
+    database: AsyncSession = Depends(db_settings.get_async_db),
+):
+    # The body is read as it arrives rather than parsed up front
+    return await services.import_tasks(request.stream(), format, current_user, database)
+
+@router.get('/search', response_model=schema.TaskPage)
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find; each matches as a prefix"),
+    current_user: TokenData = Depends(get_current_user),
+    database: AsyncSession = Depends(db_settings.get_async_db),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    tasks, next_cursor = await services.search_tasks(database, current_user, q, limit, cursor)
+    return {"items": tasks, "next_cursor": next_cursor}
+
 @router.get('/{task_id}', response_model=schema.TaskDisplay)
 async def get_user_by_id(
     task_id: int,
-    database: Session = Depends(db_settings.get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    database: AsyncSession = Depends(db_settings.get_async_db),
 ):
-    return await services.get_task_by_id(task_id, database)
+    # Served from the read-through cache, so a client whose copy is current usually costs no query
+    task = await services.get_task_by_id(task_id, database)
+    tag = etag.make_etag(task.id, task.version)
+    if not etag.none_match(if_none_match, tag):
+        return etag.not_modified(tag)
+    response.headers["ETag"] = tag
+    return task
 
-@router.get('/', response_model=List[schema.TaskDisplay])
+@router.get('/', response_model=schema.TaskPage)
 async def get_all_tasks(
-    database: Session = Depends(db_settings.get_db),
-    skip: int = 0,
-    limit: int = 10,
+    current_user: TokenData = Depends(get_current_user),
+    database: AsyncSession = Depends(db_settings.get_async_db),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    order_by: schema.TaskOrder = "creation_date",
+    direction: schema.SortDirection = "asc",
+    completed: Optional[bool] = None,
+    due_before: Optional[datetime] = Query(None, description="Only tasks due strictly before this time"),
+    due_after: Optional[datetime] = Query(None, description="Only tasks due at or after this time"),
+    overdue: bool = Query(False, description="Only incomplete tasks whose due date has passed"),
+    skip: int = Query(0, ge=0, deprecated=True),
 ):
-    return await services.get_all_tasks(database, skip, limit)
+    if cursor is not None and skip:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use either cursor or skip, not both")
+    tasks, next_cursor = await services.get_all_tasks(
+        database, current_user, limit, cursor, order_by, direction, skip,
+        completed=completed, due_before=due_before, due_after=due_after, overdue=overdue,
+    )
+    return {"items": tasks, "next_cursor": next_cursor}
 
 @router.put("/tasks/{task_id}", response_model=schema.TaskUpdate)
 async def update_task_by_id(
     task_id: int, 
     task_update: schema.TaskUpdate, 
-    database: Session = Depends(db_settings.get_db)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    database: AsyncSession = Depends(db_settings.get_async_db)
+):
+    task = await services.update_task_by_id(task_id, task_update, database, if_match)
+    response.headers["ETag"] = etag.make_etag(task.id, task.version)
+    return task
+
+@router.patch("/{task_id}", response_model=schema.TaskDisplay)
+async def patch_task_by_id(
+    task_id: int,
+    task_patch: schema.TaskPatch,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    database: AsyncSession = Depends(db_settings.get_async_db)
 ):
-    return await services.update_task_by_id(task_id, task_update, database)
+    task = await services.patch_task_by_id(task_id, task_patch, database, if_match)
+    response.headers["ETag"] = etag.make_etag(task.id, task.version)
+    return task
 
 @router.delete("/{task_id}", response_model=schema.TaskDisplay)
 async def delete_task(
     task_id: int,
-    database: Session = Depends(db_settings.get_db)
+    if_match: Optional[str] = Header(None),
+    database: AsyncSession = Depends(db_settings.get_async_db)
 ):
-    return await services.delete_task_by_id(task_id, database)
+    return await services.delete_task_by_id(task_id, database, if_match)
@@ -10,11 +10,37 @@ Classes:
       due date, and creation date.
     - TaskUpdate: Pydantic model for updating an existing task. Includes fields for title, description, 
       due date, and creation date.
+    - TaskPatch: Pydantic model for a partial update. Only the fields present in the request are
+      changed, including the completion status.
     - TaskDisplay: Pydantic model for displaying task data. Includes fields for task ID, title, 
       description, completion status, due date, and creation date.
+    - TaskRecord: Pydantic model for a task as kept by the read-through cache. A TaskDisplay plus the
+      owner's ID and the row version.
+    - TaskPage: Pydantic model for one page of a task listing. Includes the tasks and the opaque
+      cursor of the next page, if any.
+    - TaskBatchUpdate: Pydantic model for one update in a batch. A TaskUpdate plus the task ID.
+    - TaskBatch: Pydantic model for a batch of task creates, updates and deletes applied in one transaction.
+    - TaskBatchItemResult: Pydantic model for the outcome of one item of a batch.
+    - TaskBatchResult: Pydantic model for the per-item outcomes of a batch.
+    - TaskImportError: Pydantic model for the problems of one rejected row of an import.
+    - TaskImportResult: Pydantic model for the outcome of an import: rows imported and rejected, with the
+      first rejected rows' problems.
+    - TaskSubscription: Pydantic model for a WebSocket client's request to follow or stop following tasks.
 """
 from datetime import datetime
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+
+# Columns a task listing can be ordered by (ties are broken by task ID)
+TaskOrder = Literal["creation_date", "due_date"]
+SortDirection = Literal["asc", "desc"]
+
+# Upper bound on the items of each kind in one batch request
+MAX_BATCH_SIZE = 1000
+
+# Upper bound on the tasks one WebSocket connection may follow
+MAX_TASK_SUBSCRIPTIONS = 1000
 
 class TaskCreate(BaseModel):
     title: str
@@ -28,10 +54,86 @@ class TaskUpdate(BaseModel):
     due_date: datetime
     creation_date: datetime
 
+class TaskPatch(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    due_date: Optional[datetime] = None
+    creation_date: Optional[datetime] = None
+    completed: Optional[bool] = None
+
+    @field_validator("title", "description", "creation_date", "completed")
+    @classmethod
+    def not_null(cls, value):
+        # These columns cannot be cleared; omit them to leave them unchanged
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
+    @model_validator(mode="after")
+    def not_empty(self) -> "TaskPatch":
+        if not self.model_fields_set:
+            raise ValueError("at least one field must be given")
+        return self
+
 class TaskDisplay(BaseModel):
     id: int
     title: str
     description: str
     completed: bool
-    due_date: datetime
+    due_date: Optional[datetime] = None
     creation_date: datetime
+
+class TaskRecord(TaskDisplay):
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    user_id: int
+    version: int
+
+class TaskPage(BaseModel):
+    items: List[TaskDisplay]
+    next_cursor: Optional[str] = None
+
+class TaskBatchUpdate(TaskUpdate):
+    id: int
+
+class TaskBatch(BaseModel):
+    create: List[TaskCreate] = Field(default_factory=list, max_length=MAX_BATCH_SIZE)
+    update: List[TaskBatchUpdate] = Field(default_factory=list, max_length=MAX_BATCH_SIZE)
+    delete: List[int] = Field(default_factory=list, max_length=MAX_BATCH_SIZE)
+
+    @field_validator("update")
+    @classmethod
+    def unique_update_ids(cls, value: List[TaskBatchUpdate]) -> List[TaskBatchUpdate]:
+        if len({item.id for item in value}) != len(value):
+            raise ValueError("each task may be updated at most once per batch")
+        return value
+
+    @field_validator("delete")
+    @classmethod
+    def unique_delete_ids(cls, value: List[int]) -> List[int]:
+        if len(set(value)) != len(value):
+            raise ValueError("each task may be deleted at most once per batch")
+        return value
+
+class TaskBatchItemResult(BaseModel):
+    op: Literal["create", "update", "delete"]
+    index: int
+    id: Optional[int] = None
+    status: Literal["created", "updated", "deleted", "not_found"]
+
+class TaskBatchResult(BaseModel):
+    results: List[TaskBatchItemResult]
+
+class TaskImportError(BaseModel):
+    line: int
+    errors: List[str]
+
+class TaskImportResult(BaseModel):
+    imported: int
+    rejected: int
+    errors: List[TaskImportError]
+
+class TaskSubscription(BaseModel):
+    all: Optional[bool] = None
+    subscribe: List[int] = Field(default_factory=list, max_length=MAX_TASK_SUBSCRIPTIONS)
+    unsubscribe: List[int] = Field(default_factory=list, max_length=MAX_TASK_SUBSCRIPTIONS)
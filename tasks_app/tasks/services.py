@@ -1,87 +1,632 @@
-# """
-# Provides functions for CRUD (Create, Read, Update, Delete) operations on tasks in a task management system.
-
-# Imports:
-#     - List, Optional, Set: Type hinting for lists, optionals, and sets.
-#     - WebSocket, WebSocketDisconnect, APIRouter: FastAPI components for handling WebSocket connections and building API routes.
-#     - HTTPException, status: FastAPI components for handling HTTP exceptions and status codes.
-#     - Session: SQLAlchemy session for database interactions.
-#     - User, Task: SQLAlchemy models representing users and tasks in the database.
-#     - TaskCreate, TaskUpdate: Pydantic models for creating and updating tasks.
-
-# Variables:
-#     - active_connections: A set to keep track of active WebSocket connections.
-
-# Functions:
-#     - create_new_task: Creates a new task with the provided data and associates it with the current user.
-#     - get_task_by_id: Retrieves a task by its ID from the database.
-#     - get_all_tasks: Retrieves a paginated list of all tasks from the database.
-#     - update_task_by_id: Updates an existing task by its ID with the provided update data.
-#     - delete_task_by_id: Deletes a task by its ID from the database.
-
-# Dependencies:
-#     - None
-
-# Returns:
-#     - Depending on the function, returns a task instance, list of tasks, or raises an HTTPException if the operation fails.
-# """
-# from typing import List, Optional, Set
-
-# from fastapi import WebSocket, WebSocketDisconnect, APIRouter
-# from fastapi import HTTPException, status
-# from sqlalchemy.orm import Session
-
-# from tasks_app.db_models.models import User, Task
-# from tasks_app.tasks.schema import TaskCreate, TaskUpdate
-
-# active_connections: Set[WebSocket] = set()
-
-# async def create_new_task(task: TaskCreate, current_user: User, database: Session) -> Task:
-#     # Fetch the user info from the database
-#     user_info = database.query(User).filter(User.email == current_user.email).first()
-    
-#     if not user_info:
-#         raise HTTPException(
-#             status_code=status.HTTP_404_NOT_FOUND,
-#             detail="User not found"
-#         )
-    
-#     new_task = Task(**task.dict(), user_id=user_info.id)
-#     database.add(new_task)
-#     database.commit()
-#     database.refresh(new_task)
-#     for connection in active_connections:
-#         connection.send_text(f"New task created: {new_task.title}")
-#     return new_task
-
-# async def get_task_by_id(task_id:int, database:Session) -> Optional[Task]:
-#     task = database.query(Task).get(task_id)
-#     if not task:
-#         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Data Not Found !")
-#     return task
-
-# async def get_all_tasks(database:Session, skip: int = 0, limit : int = 10,) -> List[Task]:
-#     tasks = database.query(Task).offset(skip).limit(limit).all()
-#     return tasks
-
-# async def update_task_by_id(task_id: int, task_update: TaskUpdate, database: Session):
-#     database_task = database.query(Task).filter(Task.id == task_id).first()
-#     if database_task is None:
-#         raise HTTPException(status_code=404, detail="Task not found")
-#     for key, value in task_update.dict().items():
-#         setattr(database_task, key, value)
-#     database.commit()
-#     database.refresh(database_task)
-#     for connection in active_connections:
-#         connection.send_text(f"Task {database_task.id} updated")
-#     return database_task
-
-# async def delete_task_by_id(task_id: int, database: Session):
-#     task = database.query(Task).filter(Task.id == task_id).first()
-#     if task is None:
-#         raise HTTPException(status_code=404, detail="Task not found")
-#     database.delete(task)
-#     database.commit()
-#     for connection in active_connections:
-#         connection.send_text(f"Task {task.id} deleted")
-#     return task
+"""
+Provides functions for CRUD (Create, Read, Update, Delete) operations on tasks in a task management system.
+
+Every function takes an `AsyncSession` and awaits its queries, so a slow statement only suspends
+the calling request instead of blocking the event loop for every request on the worker.
+
+Single-task writes are one `INSERT`/`UPDATE`/`DELETE ... RETURNING` statement followed by the
+commit: the statement returns the written row, so nothing is read before or after it, and its
+RETURNING clause also issues the NOTIFY for other workers.
+
+Single-task reads go through `task_cache`, a read-through cache of immutable `TaskRecord`
+snapshots. Every write drops the tasks it changed from it once committed, and other workers drop
+them when the write's notification reaches their listener.
+
+Imports:
+    - List, Optional: Type hinting for lists and optionals.
+    - HTTPException, status: FastAPI components for handling HTTP exceptions and status codes.
+    - select, tuple_, insert, update, delete, values: SQLAlchemy 2.0 style statement construction.
+    - pagination: Opaque cursor encoding for keyset pagination.
+    - export: NDJSON/CSV encoding and gzip compression of task exports.
+    - importer: Streamed validation and COPY loading of task imports.
+    - AsyncSession: SQLAlchemy asyncio session for database interactions.
+    - Task: SQLAlchemy model representing tasks in the database.
+    - TokenData: The authenticated principal extracted from the access token.
+    - etag: Row-version ETags; If-Match turns single-task writes into conditional writes.
+    - ReadThroughCache: The cache in front of single-task reads.
+    - user_services: Cached resolution of the principal to its user row.
+    - events: Task change events, notified to other workers in the transaction and delivered to
+      this worker's WebSocket clients after each commit.
+    - TaskCreate, TaskUpdate, TaskPatch, TaskBatch: Pydantic models for creating and updating tasks.
+    - TaskRecord: Pydantic model of a cached task.
+    - TaskSubscription: Pydantic model for a WebSocket client's follow/unfollow request.
+    - hub, Connection: The broadcast hub whose topic index WebSocket connections subscribe to.
+
+Functions:
+    - create_new_task: Creates a new task with the provided data and associates it with the current user.
+    - get_task_version: Retrieves only the row version of a task.
+    - get_task_by_id: Retrieves a task by its ID through the read-through cache.
+    - build_task_listing_query: Builds the filtered, ordered listing query for one owner.
+    - get_all_tasks: Retrieves one keyset-paginated page of the current user's tasks.
+    - prefix_tsquery: Turns free text into a prefix-matching text search query.
+    - stream_task_rows: Yields batches of one user's task columns from a server-side cursor.
+    - export_tasks: Resolves the owner and returns the encoded byte stream of their tasks.
+    - import_tasks: Imports an NDJSON or CSV upload as tasks of the current user with COPY.
+    - search_tasks: Retrieves one keyset-paginated page of the current user's tasks matching a search,
+      title matches first.
+    - update_task_by_id: Updates an existing task by its ID with the provided update data.
+    - patch_task_by_id: Updates only the given columns of an existing task.
+    - delete_task_by_id: Deletes a task by its ID from the database.
+    - apply_task_batch: Applies many creates, updates and deletes with set-based statements in one transaction.
+    - open_task_stream: Accepts a WebSocket and registers it under its user's topic.
+    - update_task_subscriptions: Changes which task events a WebSocket connection receives.
+
+Returns:
+    - Depending on the function, returns a task instance, list of tasks, or raises an HTTPException if the operation fails.
+"""
+import operator
+import re
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import (
+    Boolean, DateTime, Integer, Select, String, any_, bindparam, column, delete, func, insert, literal, select, tuple_,
+    update, values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tasks_app.auth.schema import TokenData
+from tasks_app.cache import etag
+from tasks_app.cache.read_through import ReadThroughCache
+from tasks_app.db_models.models import TASK_SEARCH_CONFIG, Task
+from tasks_app.tasks import export, importer, pagination
+from tasks_app.tasks.schema import (
+    MAX_TASK_SUBSCRIPTIONS, SortDirection, TaskBatch, TaskBatchItemResult, TaskBatchResult, TaskCreate, TaskOrder,
+    TaskImportResult, TaskPatch, TaskRecord, TaskSubscription, TaskUpdate,
+)
+from tasks_app.realtime import events
+from tasks_app.realtime.hub import Connection, hub
+from tasks_app.user import services as user_services
+
+# Sort columns for listings; each is backed by composite (user_id, [completed,] column, id) indexes
+SORT_COLUMNS = {
+    "creation_date": Task.creation_date,
+    "due_date": Task.due_date,
+}
+
+# Change event published for each successful batch item, keyed by its result status
+BATCH_EVENTS = {
+    "created": events.TASK_CREATED,
+    "updated": events.TASK_UPDATED,
+    "deleted": events.TASK_DELETED,
+}
+
+# Words of a search query; anything else (punctuation, tsquery operators) only separates them
+SEARCH_WORD = re.compile(r"\w+")
+
+# Upper bound on the words of one search query
+MAX_SEARCH_WORDS = 16
+
+# Tasks by ID, as TaskRecord snapshots (see tasks_app.cache.read_through for size and TTL)
+task_cache = ReadThroughCache()
+
+
+async def _get_owner_id(current_user: TokenData, database: AsyncSession) -> int:
+    # Resolve the authenticated principal to the id of its user row; cached, so usually no query
+    user = await user_services.get_user_for_principal(current_user, database)
+    return user.id
+
+async def _commit_with_events(database: AsyncSession, task_events: List[dict]) -> None:
+    # NOTIFY other workers as part of the transaction, then push to this worker's clients once committed
+    await events.notify_task_events(database, task_events)
+    await _commit_and_publish(database, task_events)
+
+async def _commit_and_publish(database: AsyncSession, task_events: List[dict]) -> None:
+    # For writes whose statement already notified other workers (see `events.notify_in_returning`)
+    await database.commit()
+    events.publish_task_events(task_events)
+
+async def _write_one(statement, kind: str, task_id: int, if_match: Optional[str], database: AsyncSession) -> Task:
+    """
+    Runs an UPDATE or DELETE of one task that returns the task and notifies other workers, then
+    commits it: one statement plus the commit.
+
+    With an If-Match header the statement only matches the task versions the header names, so the
+    check and the write are atomic.
+
+    Raises:
+        HTTPException: 404 if the task does not exist, 412 if it exists but If-Match named another version.
+    """
+    if if_match is not None:
+        versions = etag.matching_versions(if_match, task_id)
+        if versions is not None:
+            statement = statement.where(Task.version.in_(versions))
+    task = (await database.scalars(
+        statement.returning(Task, events.notify_in_returning(kind, Task.id, Task.user_id))
+    )).one_or_none()
+    if task is None:
+        if if_match is not None and await get_task_version(task_id, database) is not None:
+            raise etag.precondition_failed()
+        raise HTTPException(status_code=404, detail="Task not found")
+    await _commit_and_publish(database, [events.task_event(kind, task.id, task.user_id)])
+    await task_cache.invalidate(task.id)
+    return task
+
+async def create_new_task(task: TaskCreate, current_user: TokenData, database: AsyncSession) -> Task:
+    """
+    Inserts the task and returns it in one `INSERT ... RETURNING` statement that also notifies
+    other workers, followed by the commit.
+    """
+    owner_id = await _get_owner_id(current_user, database)
+    new_task = (await database.scalars(
+        insert(Task)
+        .values(**task.model_dump(), user_id=owner_id)
+        .returning(Task, events.notify_in_returning(events.TASK_CREATED, Task.id, Task.user_id))
+    )).one()
+    await _commit_and_publish(database, [events.task_event(events.TASK_CREATED, new_task.id, owner_id)])
+    return new_task
+
+async def get_task_version(task_id: int, database: AsyncSession) -> Optional[int]:
+    """
+    Returns the current row version of a task, or None if it does not exist.
+
+    A primary key lookup of one integer: tells a failed If-Match apart from a missing task.
+    """
+    return await database.scalar(select(Task.version).where(Task.id == task_id))
+
+async def _load_task(task_id: int, database: AsyncSession) -> Optional[TaskRecord]:
+    task = await database.get(Task, task_id)
+    return TaskRecord.model_validate(task) if task is not None else None
+
+async def get_task_by_id(task_id: int, database: AsyncSession) -> TaskRecord:
+    """
+    Returns a task from the read-through cache, loading it on a miss. Concurrent misses on the same
+    task share one query.
+
+    Raises:
+        HTTPException: 404 if the task does not exist (which is not cached).
+    """
+    task = await task_cache.get_or_load(task_id, lambda: _load_task(task_id, database))
+    if task is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Data Not Found !")
+    return task
+
+def _decode_position(cursor: str, order_by: TaskOrder, direction: SortDirection) -> Tuple[Optional[datetime], int]:
+    """
+    Returns the (sort value, task id) position stored in a listing cursor.
+
+    Raises:
+        HTTPException: If the cursor is malformed or was issued for a different sort order.
+    """
+    try:
+        payload = pagination.decode_cursor(cursor)
+        if payload.get("order_by") != order_by or payload.get("direction") != direction:
+            raise pagination.InvalidCursor("Cursor was issued for a different sort order")
+        value = payload["value"]
+        return (datetime.fromisoformat(value) if value is not None else None), int(payload["id"])
+    except (pagination.InvalidCursor, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def build_task_listing_query(
+    owner_id: int,
+    order_by: TaskOrder = "creation_date",
+    direction: SortDirection = "asc",
+    completed: Optional[bool] = None,
+    due_before: Optional[datetime] = None,
+    due_after: Optional[datetime] = None,
+    overdue: bool = False,
+) -> Select:
+    """
+    Builds the filtered and ordered (but unpaginated) task listing query for one owner.
+
+    Every filter combination is a range on one of the `(user_id, [completed,] sort column, id)`
+    indexes: `completed` and `overdue` select the completed-prefixed indexes, the due date bounds
+    are ranges on `due_date`.
+
+    Returns:
+        Select: The listing query, ordered by `(order_by, id)` in the given direction.
+    """
+    column = SORT_COLUMNS[order_by]
+    query = select(Task).where(Task.user_id == owner_id)
+    if overdue:
+        query = query.where(Task.completed == False, Task.due_date < datetime.now())
+    elif completed is not None:
+        query = query.where(Task.completed == completed)
+    if due_before is not None:
+        query = query.where(Task.due_date < due_before)
+    if due_after is not None:
+        query = query.where(Task.due_date >= due_after)
+    if direction == "desc":
+        return query.order_by(column.desc(), Task.id.desc())
+    return query.order_by(column.asc(), Task.id.asc())
+
+def _keyset_segments(
+    query: Select, column, direction: SortDirection, after_value: Optional[datetime], after_id: int
+) -> List[Select]:
+    """
+    Splits the rows after a cursor position into index range scans, in listing order.
+
+    Postgres sorts NULLs last in ascending and first in descending order, and a row comparison
+    never matches NULL, so the rows after the cursor are the rest of the cursor's own region
+    (NULL or non-NULL sort values) followed by the whole region that comes after it.
+    """
+    after = operator.gt if direction == "asc" else operator.lt
+    if after_value is None:
+        segments = [query.where(column.is_(None), after(Task.id, after_id))]
+        if direction == "desc":
+            segments.append(query.where(column.is_not(None)))
+    else:
+        segments = [query.where(after(tuple_(column, Task.id), tuple_(after_value, after_id)))]
+        if direction == "asc":
+            segments.append(query.where(column.is_(None)))
+    return segments
+
+async def get_all_tasks(
+    database: AsyncSession,
+    current_user: TokenData,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    order_by: TaskOrder = "creation_date",
+    direction: SortDirection = "asc",
+    skip: int = 0,
+    **filters,
+) -> Tuple[List[Task], Optional[str]]:
+    """
+    Retrieves one page of the current user's tasks ordered by `(order_by, id)`.
+
+    Pages after the first are addressed by the opaque `cursor` returned with the previous page and
+    start with an index range scan, so every page costs the same regardless of its depth. `skip` is
+    only honoured on the first page and is kept for older clients. Remaining keyword arguments are
+    the filters accepted by `build_task_listing_query`.
+
+    Returns:
+        Tuple[List[Task], Optional[str]]: The tasks on the page and the cursor of the next page
+        (None on the last page).
+    """
+    owner_id = await _get_owner_id(current_user, database)
+    query = build_task_listing_query(owner_id, order_by, direction, **filters)
+
+    if cursor is None:
+        tasks = list((await database.scalars(query.offset(skip).limit(limit + 1))).all())
+    else:
+        after_value, after_id = _decode_position(cursor, order_by, direction)
+        tasks = []
+        for segment in _keyset_segments(query, SORT_COLUMNS[order_by], direction, after_value, after_id):
+            tasks += (await database.scalars(segment.limit(limit + 1 - len(tasks)))).all()
+            if len(tasks) > limit:
+                break
+
+    next_cursor = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        last = tasks[-1]
+        next_cursor = pagination.encode_cursor(
+            {"order_by": order_by, "direction": direction, "value": getattr(last, order_by), "id": last.id}
+        )
+    return tasks, next_cursor
+
+async def stream_task_rows(
+    owner_id: int, database: AsyncSession, batch_size: Optional[int] = None
+) -> AsyncIterator[Sequence[Sequence]]:
+    """
+    Yields one user's tasks in ID order as batches of `export.EXPORT_COLUMNS` tuples.
+
+    The rows are read from a server-side cursor `batch_size` at a time and are plain tuples rather
+    than ORM objects (`batch_size` defaults to EXPORT_BATCH_SIZE), so nothing accumulates in the session's identity map and memory stays
+    constant however many tasks the user has. The session is closed when the stream ends or is
+    abandoned, which returns its connection to the pool.
+    """
+    try:
+        result = await database.stream(
+            select(*(getattr(Task, name) for name in export.EXPORT_COLUMNS))
+            .where(Task.user_id == owner_id)
+            .order_by(Task.id)
+            .execution_options(yield_per=batch_size or export.EXPORT_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            yield rows
+    finally:
+        await database.close()
+
+async def export_tasks(
+    current_user: TokenData, database: AsyncSession, format: str = "ndjson", gzip: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Resolves the current user and returns the stream of their tasks encoded as NDJSON or CSV.
+
+    The owner is resolved before returning, so an unknown user is still answered with a 404 rather
+    than a failed stream. The request's session is closed by its dependency before a streamed body
+    is sent; the stream then reuses it on a fresh connection and closes it again when done.
+
+    Returns:
+        AsyncIterator[bytes]: The encoded (and, with `gzip`, compressed) export.
+    """
+    owner_id = await _get_owner_id(current_user, database)
+    batches = stream_task_rows(owner_id, database)
+    chunks = export.encode_csv(batches) if format == "csv" else export.encode_ndjson(batches)
+    return export.gzip_chunks(chunks) if gzip else chunks
+
+async def import_tasks(
+    chunks: AsyncIterator[bytes], format: str, current_user: TokenData, database: AsyncSession
+) -> TaskImportResult:
+    """
+    Imports an uploaded NDJSON or CSV stream as tasks of the current user (see `tasks_app.tasks.importer`).
+
+    Returns:
+        TaskImportResult: The number of imported and rejected rows and the first rejected rows' problems.
+    """
+    owner_id = await _get_owner_id(current_user, database)
+    return await importer.import_tasks(chunks, format, owner_id, database)
+
+def prefix_tsquery(text: str, weights: str = "") -> Optional[str]:
+    """
+    Turns free text into a `to_tsquery` expression matching tasks that contain every word as a
+    prefix, so that "buy mil" finds "Buy milk" while the user is still typing.
+
+    Args:
+        text (str): The search text.
+        weights (str): Restricts the words to lexemes of these weights, e.g. "A" for the title.
+
+    Returns:
+        Optional[str]: The query, or None if the text contains no words.
+    """
+    words = SEARCH_WORD.findall(text.lower())[:MAX_SEARCH_WORDS]
+    if not words:
+        return None
+    return " & ".join(f"{word}:*{weights}" for word in words)
+
+def _tsquery(tsquery_text: str):
+    return func.to_tsquery(literal(TASK_SEARCH_CONFIG, REGCONFIG), tsquery_text)
+
+async def search_tasks(
+    database: AsyncSession,
+    current_user: TokenData,
+    text: str,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Task], Optional[str]]:
+    """
+    Retrieves one page of the current user's tasks matching a full-text search, best match first.
+
+    Tasks whose title contains every word rank first, then the tasks that only match with their
+    description; within each rank the newest come first, ordered by `(creation_date, id)`. Each
+    rank is a range of the owner's `(user_id, creation_date, id)` index filtered by the search, or
+    a GIN index scan intersected with the owner's rows when the words are rare, so a page costs
+    the same however many tasks match. Later pages are addressed by the opaque `cursor` returned
+    with the previous page, exactly like listings.
+
+    Raises:
+        HTTPException: 400 if the text contains no words or the cursor belongs to another search.
+
+    Returns:
+        Tuple[List[Task], Optional[str]]: The tasks on the page and the cursor of the next page
+        (None on the last page).
+    """
+    tsquery_text = prefix_tsquery(text)
+    if tsquery_text is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Search text contains no words")
+    owner_id = await _get_owner_id(current_user, database)
+
+    in_title = Task.search_vector.bool_op("@@")(_tsquery(prefix_tsquery(text, "A")))
+    query = select(Task).where(Task.user_id == owner_id).order_by(Task.creation_date.desc(), Task.id.desc())
+    ranks = [
+        query.where(in_title),
+        query.where(Task.search_vector.bool_op("@@")(_tsquery(tsquery_text)), ~in_title),
+    ]
+
+    if cursor is None:
+        segments = list(enumerate(ranks))
+    else:
+        try:
+            payload = pagination.decode_cursor(cursor)
+            if payload.get("search") != tsquery_text:
+                raise pagination.InvalidCursor("Cursor was issued for a different search")
+            after_rank, value, after_id = int(payload["rank"]), payload["value"], int(payload["id"])
+            if not 0 <= after_rank < len(ranks):
+                raise pagination.InvalidCursor("Unknown rank")
+            after_value = datetime.fromisoformat(value) if value is not None else None
+            segments = [
+                (after_rank, segment)
+                for segment in _keyset_segments(ranks[after_rank], Task.creation_date, "desc", after_value, after_id)
+            ] + [(rank, segment) for rank, segment in enumerate(ranks) if rank > after_rank]
+        except (pagination.InvalidCursor, KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    tasks, task_ranks = [], []
+    for rank, segment in segments:
+        found = (await database.scalars(segment.limit(limit + 1 - len(tasks)))).all()
+        tasks += found
+        task_ranks += [rank] * len(found)
+        if len(tasks) > limit:
+            break
+
+    next_cursor = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        last = tasks[-1]
+        next_cursor = pagination.encode_cursor(
+            {"search": tsquery_text, "rank": task_ranks[limit - 1], "value": last.creation_date, "id": last.id}
+        )
+    return tasks, next_cursor
+
+async def update_task_by_id(
+    task_id: int, task_update: TaskUpdate, database: AsyncSession, if_match: Optional[str] = None
+) -> Task:
+    return await _write_one(
+        update(Task).where(Task.id == task_id).values(**task_update.model_dump()),
+        events.TASK_UPDATED, task_id, if_match, database,
+    )
+
+async def patch_task_by_id(
+    task_id: int, task_patch: TaskPatch, database: AsyncSession, if_match: Optional[str] = None
+) -> Task:
+    """
+    Updates only the columns present in the request body, in one `UPDATE ... RETURNING`.
+    """
+    return await _write_one(
+        update(Task).where(Task.id == task_id).values(**task_patch.model_dump(exclude_unset=True)),
+        events.TASK_UPDATED, task_id, if_match, database,
+    )
+
+async def delete_task_by_id(task_id: int, database: AsyncSession, if_match: Optional[str] = None) -> Task:
+    return await _write_one(delete(Task).where(Task.id == task_id), events.TASK_DELETED, task_id, if_match, database)
+
+async def apply_task_batch(batch: TaskBatch, current_user: TokenData, database: AsyncSession) -> TaskBatchResult:
+    """
+    Applies a batch of creates, updates and deletes to the current user's tasks in one transaction.
+
+    Each kind of operation is a single set-based statement regardless of the batch size: an
+    `INSERT ... SELECT FROM (VALUES ...) RETURNING` that reports each new ID with its position in
+    the batch, an `UPDATE ... FROM (VALUES ...) RETURNING` and a
+    `DELETE ... WHERE id = ANY(:ids) RETURNING`. Updates and deletes only touch tasks owned by the
+    caller; any other ID is reported as `not_found`.
+
+    Returns:
+        TaskBatchResult: One result per requested item, in request order (creates, updates, deletes).
+    """
+    owner_id = await _get_owner_id(current_user, database)
+    results: List[TaskBatchItemResult] = []
+
+    if batch.create:
+        # RETURNING rows come in no guaranteed order, so each row's id is drawn next to its position in
+        # the batch (a CTE with a volatile function is evaluated once) and read back joined to it
+        rows = values(
+            column("ordinal", Integer),
+            column("title", String),
+            column("description", String),
+            column("due_date", DateTime),
+            column("creation_date", DateTime),
+            name="batch",
+        ).data([
+            (index, task.title, task.description, task.due_date, task.creation_date)
+            for index, task in enumerate(batch.create)
+        ])
+        numbered = select(
+            rows, func.nextval(func.pg_get_serial_sequence(Task.__tablename__, Task.id.name)).label("id")
+        ).cte("numbered")
+        inserted = insert(Task).from_select(
+            ["id", "title", "description", "due_date", "creation_date", "user_id"],
+            select(
+                numbered.c.id, numbered.c.title, numbered.c.description, numbered.c.due_date,
+                numbered.c.creation_date, literal(owner_id, Integer),
+            ),
+        ).returning(Task.id).cte("inserted")
+        created = (await database.execute(
+            select(numbered.c.ordinal, inserted.c.id)
+            .join_from(numbered, inserted, numbered.c.id == inserted.c.id)
+            .order_by(numbered.c.ordinal)
+        )).all()
+        results += [
+            TaskBatchItemResult(op="create", index=index, id=task_id, status="created")
+            for index, task_id in created
+        ]
+
+    if batch.update:
+        rows = values(
+            column("id", Integer),
+            column("title", String),
+            column("description", String),
+            column("due_date", DateTime),
+            column("creation_date", DateTime),
+            name="batch",
+        ).data([
+            (item.id, item.title, item.description, item.due_date, item.creation_date) for item in batch.update
+        ])
+        updated_ids = set((await database.scalars(
+            update(Task)
+            .where(Task.id == rows.c.id, Task.user_id == owner_id)
+            .values(
+                title=rows.c.title,
+                description=rows.c.description,
+                due_date=rows.c.due_date,
+                creation_date=rows.c.creation_date,
+            )
+            .returning(Task.id)
+            .execution_options(synchronize_session=False)
+        )).all())
+        results += [
+            TaskBatchItemResult(
+                op="update", index=index, id=item.id, status="updated" if item.id in updated_ids else "not_found"
+            )
+            for index, item in enumerate(batch.update)
+        ]
+
+    if batch.delete:
+        deleted_ids = set((await database.scalars(
+            delete(Task)
+            .where(Task.id == any_(bindparam("ids", batch.delete, type_=ARRAY(Integer))), Task.user_id == owner_id)
+            .returning(Task.id)
+            .execution_options(synchronize_session=False)
+        )).all())
+        results += [
+            TaskBatchItemResult(
+                op="delete", index=index, id=task_id, status="deleted" if task_id in deleted_ids else "not_found"
+            )
+            for index, task_id in enumerate(batch.delete)
+        ]
+
+    await _commit_with_events(database, [
+        events.task_event(BATCH_EVENTS[result.status], result.id, owner_id)
+        for result in results if result.status in BATCH_EVENTS
+    ])
+    await task_cache.invalidate(*(result.id for result in results if result.status in ("updated", "deleted")))
+    return TaskBatchResult(results=results)
+
+async def open_task_stream(
+    websocket, current_user: TokenData, database: AsyncSession, encoding: str = "json", batch: bool = False
+) -> Tuple[Connection, int]:
+    """
+    Accepts a WebSocket and registers it with the hub, subscribed to every event of the user's tasks.
+
+    The session is closed before returning so that the long-lived connection does not keep a
+    database connection checked out. `encoding` and `batch` select the connection's wire format
+    and whether its events are coalesced into array frames.
+
+    Raises:
+        ConnectionLimitExceeded: If the worker or the user has no WebSocket connection left.
+
+    Returns:
+        Tuple[Connection, int]: The hub connection and the id of its user.
+    """
+    owner_id = await _get_owner_id(current_user, database)
+    await database.close()
+    await websocket.accept()
+    connection = hub.connect(
+        websocket, [events.user_topic(owner_id)], encoding=encoding, batch=batch, owner=owner_id
+    )
+    return connection, owner_id
+
+async def update_task_subscriptions(
+    subscription: TaskSubscription, connection: Connection, owner_id: int, database: AsyncSession
+) -> dict:
+    """
+    Changes which task events a WebSocket connection receives.
+
+    `all` switches the stream of all of the user's task events on or off; with it off, only the
+    individually followed tasks are delivered, e.g. to a client showing a single task. Only the
+    owner's tasks can be followed: IDs of missing tasks and of other users' tasks are both reported
+    as not found, so the stream does not reveal which IDs exist. A connection follows at most
+    MAX_TASK_SUBSCRIPTIONS tasks.
+
+    Returns:
+        dict: Whether the connection receives all task events, the task IDs it follows and the
+        requested IDs that were not found.
+    """
+    if subscription.all is True:
+        hub.subscribe(connection, events.user_topic(owner_id))
+    elif subscription.all is False:
+        hub.unsubscribe(connection, events.user_topic(owner_id))
+    for task_id in subscription.unsubscribe:
+        hub.unsubscribe(connection, events.task_topic(task_id))
+
+    requested = set(subscription.subscribe)
+    owned = set()
+    if requested:
+        owned = set((await database.scalars(
+            select(Task.id).where(Task.id == any_(bindparam("ids", list(requested), type_=ARRAY(Integer))),
+                                  Task.user_id == owner_id)
+        )).all())
+        await database.close()
+
+    following = {int(topic[len("task:"):]) for topic in connection.topics if topic.startswith("task:")}
+    for task_id in sorted(owned - following)[:max(MAX_TASK_SUBSCRIPTIONS - len(following), 0)]:
+        hub.subscribe(connection, events.task_topic(task_id))
+        following.add(task_id)
+
+    return {
+        "all": events.user_topic(owner_id) in connection.topics,
+        "following": sorted(following),
+        "not_found": sorted(requested - owned),
+    }
@@ -1,9 +1,10 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, status, Response, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, status, Response, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from tasks_app.auth.jwt import get_current_user
+from tasks_app.cache import etag
 from config import db_settings
 from . import schema
 from . import validator
@@ -18,7 +19,7 @@ router = APIRouter(
 @router.post('/', status_code=status.HTTP_201_CREATED)
 async def create_user_registration(
     request: schema.User,
-    database: Session = Depends(db_settings.get_db)
+    database: AsyncSession = Depends(db_settings.get_async_db)
 ):
     user = await validator.verify_email_exist(request.email, database)
     if user:
@@ -34,7 +35,14 @@ async def create_user_registration(
 @router.get('/{user_id}', response_model=schema.DisplayUser)
 async def get_user_by_id(
     user_id: int,
-    database: Session = Depends(db_settings.get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    database: AsyncSession = Depends(db_settings.get_async_db),
 ):
-    return await services.get_user_by_id(user_id, database)
+    user = await services.get_user_by_id(user_id, database)
+    tag = etag.make_etag(user.id, user.version)
+    if not etag.none_match(if_none_match, tag):
+        return etag.not_modified(tag)
+    response.headers["ETag"] = tag
+    return user
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, constr, validator, EmailStr
+from pydantic import BaseModel, ConfigDict, constr, validator, EmailStr
 
 
 class User(BaseModel):
@@ -15,4 +15,10 @@ class DisplayUser(BaseModel):
     class Config:
         orm_mode = True
         
-    
\ No newline at end of file
+    
+
+class UserRecord(DisplayUser):
+    # A user profile as kept by the read-through cache, with the row version for its ETag
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    version: int
@@ -1,19 +1,133 @@
-from typing import List, Optional
+import asyncio
+import os
+from typing import Dict, Optional, Set
 
 from fastapi import HTTPException, status
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session, object_session
 
-from tasks_app.db_models import models
+from tasks_app.auth.schema import TokenData
+from tasks_app.cache.lru import LRUCache
+from tasks_app.cache.read_through import ReadThroughCache
+from tasks_app.db_models import hashing, models
+from tasks_app.user import schema
 
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
 
-async def new_user_register(request, database) -> models.User:
-    new_user = models.User(name=request.name, email=request.email, password=request.password)
+# Resolved principals keyed by ("id", user_id) or ("email", email). Entries are dropped when this
+# process changes the user and expire after USER_CACHE_TTL, which bounds how long other workers
+# can serve a stale entry.
+user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# User profiles by ID, as UserRecord snapshots (see tasks_app.cache.read_through for size and TTL),
+# dropped along with `user_cache` entries when this process changes the user
+profile_cache = ReadThroughCache()
+
+# Keys of `Session.info` under which a transaction records the users it changed, so that they are
+# dropped from the caches once it commits: user id -> emails, and whether a bulk statement ran
+CHANGED_USERS = "changed_users"
+ALL_USERS_CHANGED = "all_users_changed"
+
+# Execution option of bulk statements on users whose caller invalidates the rows it changed itself
+# (see `invalidate_cached_user`), so they do not drop every cached user
+INVALIDATES_CACHED_USERS = "invalidates_cached_users"
+
+# Profile invalidations in progress, referenced until they finish so the loop does not collect them early
+_pending_invalidations: Set[asyncio.Task] = set()
+
+
+async def new_user_register(request, database: AsyncSession) -> models.User:
+    # End any open read transaction so no pooled connection is held while the password is hashed
+    await database.rollback()
+    password_hash = await hashing.get_password_hash_async(request.password)
+    new_user = models.User(name=request.name, email=request.email, password_hash=password_hash)
     database.add(new_user)
-    database.commit()
-    database.refresh(new_user)
+    await database.commit()
+    await database.refresh(new_user)
     return new_user
 
-async def get_user_by_id(user_id, database) -> Optional[models.User]:
-    user_info = database.query(models.User).get(user_id)
-    if not user_info:
+async def _load_user(user_id: int, database: AsyncSession) -> Optional[schema.UserRecord]:
+    user = await database.get(models.User, user_id)
+    return schema.UserRecord.model_validate(user) if user is not None else None
+
+async def get_user_by_id(user_id: int, database: AsyncSession) -> schema.UserRecord:
+    # Read-through: concurrent misses on the same user share one query; unknown IDs are not cached
+    user_info = await profile_cache.get_or_load(user_id, lambda: _load_user(user_id, database))
+    if user_info is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Data Not Found !")
     return user_info
+
+async def get_user_for_principal(principal: TokenData, database: AsyncSession) -> schema.DisplayUser:
+    # Resolve an authenticated principal to its user row, by the token's user id when it has one
+    # and by email for tokens issued before the id was added
+    if principal.id is not None:
+        key, condition = ("id", principal.id), models.User.id == principal.id
+    else:
+        key, condition = ("email", principal.email), models.User.email == principal.email
+
+    user = user_cache.get(key)
+    if user is not None:
+        return user
+
+    row = (await database.execute(
+        select(models.User.id, models.User.name, models.User.email).where(condition)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    user = schema.DisplayUser(id=row.id, name=row.name, email=row.email)
+    user_cache.set(key, user)
+    return user
+
+def _schedule(invalidation) -> None:
+    # The ORM hooks below are synchronous; under the event loop the invalidation runs as a task,
+    # without one (sync sessions in scripts) the profile entry is left to expire
+    try:
+        task = asyncio.get_running_loop().create_task(invalidation)
+    except RuntimeError:
+        invalidation.close()
+        return
+    _pending_invalidations.add(task)
+    task.add_done_callback(_pending_invalidations.discard)
+
+def invalidate_cached_user(user_id: int, *emails: str) -> None:
+    # Drop every cache entry that may resolve to the user
+    user_cache.delete(("id", user_id))
+    for email in emails:
+        user_cache.delete(("email", email))
+    _schedule(profile_cache.invalidate(user_id))
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _record_changed_user(mapper, connection, target: models.User) -> None:
+    # Users changed through the ORM are recorded on flush, including under their previous email.
+    # Dropping them here would let a concurrent read cache the old row again before the commit.
+    changed: Dict[int, Set[str]] = object_session(target).info.setdefault(CHANGED_USERS, {})
+    changed.setdefault(target.id, set()).update([target.email, *inspect(target).attrs.email.history.deleted])
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_changed_users(orm_execute_state: ORMExecuteState) -> None:
+    # Bulk UPDATE/DELETE statements on users do not say which rows they touch, so everything is dropped
+    # unless the statement's caller takes care of it
+    if orm_execute_state.execution_options.get(INVALIDATES_CACHED_USERS):
+        return
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        if orm_execute_state.bind_mapper is not None and orm_execute_state.bind_mapper.class_ is models.User:
+            orm_execute_state.session.info[ALL_USERS_CHANGED] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    changed: Dict[int, Set[str]] = session.info.pop(CHANGED_USERS, {})
+    if session.info.pop(ALL_USERS_CHANGED, False):
+        user_cache.clear()
+        _schedule(profile_cache.clear())
+        return
+    for user_id, emails in changed.items():
+        invalidate_cached_user(user_id, *emails)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session: Session) -> None:
+    # Nothing was written, so nothing is stale
+    session.info.pop(CHANGED_USERS, None)
+    session.info.pop(ALL_USERS_CHANGED, None)
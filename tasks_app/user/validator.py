@@ -1,9 +1,11 @@
 from typing import Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from tasks_app.db_models.models import User
 
 
-async def verify_email_exist(email: str, db_session: Session) -> Optional[User]:
-    return db_session.query(User).filter(User.email == email).first()
\ No newline at end of file
+async def verify_email_exist(email: str, db_session: AsyncSession) -> Optional[User]:
+    result = await db_session.execute(select(User).where(User.email == email))
+    return result.scalars().first()
@@ -0,0 +1,42 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from tasks_app.db_models import hashing
+from tasks_app.db_models.models import User
+from tasks_app.user import services as user_services
+from conf_test_db import app
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password_hash(database):
+    legacy_hash = hashing.build_context(time_cost=1, memory_cost=8192, parallelism=1).hash("legacy123")
+    database.add(User(name="Legacy", email="legacy@gmail.com", password_hash=legacy_hash))
+    await database.commit()
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/login", data={"username": "legacy@gmail.com", "password": "legacy123"})
+    assert response.status_code == 200
+
+    stored = await database.scalar(select(User.password).where(User.email == "legacy@gmail.com"))
+    assert stored != legacy_hash
+    assert not hashing.needs_rehash(stored)
+    assert hashing.verify_password("legacy123", stored)
+
+
+@pytest.mark.asyncio
+async def test_login_rehash_drops_only_that_user_from_the_cache(database):
+    legacy_hash = hashing.build_context(time_cost=1, memory_cost=8192, parallelism=1).hash("legacy123")
+    legacy = User(name="Legacy", email="legacy@gmail.com", password_hash=legacy_hash)
+    database.add(legacy)
+    await database.commit()
+    john, other = object(), object()
+    user_services.user_cache.set(("email", "john@gmail.com"), john)
+    user_services.user_cache.set(("id", legacy.id), other)
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/login", data={"username": "legacy@gmail.com", "password": "legacy123"})
+    assert response.status_code == 200
+
+    assert user_services.user_cache.get(("email", "john@gmail.com")) is john
+    assert user_services.user_cache.get(("id", legacy.id)) is None
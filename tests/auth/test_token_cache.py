@@ -0,0 +1,39 @@
+import pytest
+from httpx import AsyncClient
+
+from tasks_app.auth import jwt
+from tasks_app.cache.lru import LRUCache
+from conf_test_db import app
+
+
+def test_lru_cache_evicts_least_recently_used_and_expires_entries():
+    now = [0.0]
+    cache = LRUCache(maxsize=2, clock=lambda: now[0])
+    cache.set("a", 1, ttl=10)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_token_is_decoded_once_across_requests(mocker):
+    jwt.token_cache.clear()
+    decode = mocker.spy(jwt.jwt, "decode")
+    token = jwt.create_access_token({"sub": "john@gmail.com"})
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        for _ in range(3):
+            response = await ac.get("/task/", headers={'Authorization': f'Bearer {token}'})
+            assert response.status_code == 200
+    assert decode.call_count == 1
+
+
+def test_invalid_token_is_not_cached():
+    jwt.token_cache.clear()
+    with pytest.raises(ValueError):
+        jwt.verify_token("not-a-token", ValueError())
+    assert len(jwt.token_cache) == 0
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, select, update
+
+from tasks_app.auth import jwt
+from tasks_app.cache.read_through import MISSING
+from tasks_app.db_models.models import Task, User
+from tasks_app.user import services as user_services
+from conf_test_db import app, async_engine
+
+
+@pytest.fixture
+def statements():
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    yield captured
+    event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+
+@pytest.mark.asyncio
+async def test_login_token_carries_user_id(database):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/login", data={"username": "john@gmail.com", "password": "john123"})
+    assert response.status_code == 200
+
+    token_data = jwt.verify_token(response.json()["access_token"], ValueError())
+    john = (await database.scalars(select(User).where(User.email == "john@gmail.com"))).one()
+    assert token_data.id == john.id
+    assert token_data.email == "john@gmail.com"
+
+
+@pytest.mark.asyncio
+async def test_create_with_warm_user_cache_skips_user_lookup(statements, database):
+    user_services.user_cache.clear()
+    john = (await database.scalars(select(User).where(User.email == "john@gmail.com"))).one()
+    token = jwt.create_access_token({"sub": john.email, "uid": john.id})
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = {'title': 'Cached owner', 'description': 'No lookup', 'due_date': '2024-06-01T12:00:00', 'creation_date': '2024-05-01T12:00:00'}
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/task/tasks/", json=payload, headers=headers)
+        assert response.status_code == 201
+        statements.clear()
+        response = await ac.post("/task/tasks/", json=payload, headers=headers)
+        assert response.status_code == 201
+
+    assert not any("FROM users" in statement for statement in statements)
+    assert (await database.get(Task, response.json()["id"])).user_id == john.id
+
+
+@pytest.mark.asyncio
+async def test_token_without_user_id_is_resolved_by_email():
+    user_services.user_cache.clear()
+    token = jwt.create_access_token({"sub": "john@gmail.com"})
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get("/task/", headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert user_services.user_cache.get(("email", "john@gmail.com")) is not None
+
+
+@pytest.mark.asyncio
+async def test_changed_user_is_dropped_from_cache(database):
+    john = (await database.scalars(select(User).where(User.email == "john@gmail.com"))).one()
+    user_services.user_cache.set(("id", john.id), object())
+    user_services.user_cache.set(("email", john.email), object())
+    john_id = john.id
+    john.name = "Johnny"
+    await database.commit()
+    assert user_services.user_cache.get(("id", john_id)) is None
+    assert user_services.user_cache.get(("email", "john@gmail.com")) is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_user_update_clears_cache(database):
+    user_services.user_cache.set(("email", "john@gmail.com"), object())
+    await database.execute(update(User).where(User.email == "john@gmail.com").values(name="Jack"))
+    await database.commit()
+    assert user_services.user_cache.get(("email", "john@gmail.com")) is None
+
+
+@pytest.mark.asyncio
+async def test_changed_user_stays_cached_until_commit(database):
+    john = (await database.scalars(select(User).where(User.email == "john@gmail.com"))).one()
+    john_id, cached = john.id, object()
+    user_services.user_cache.set(("id", john_id), cached)
+    john.name = "Johnny"
+    await database.flush()
+    # Until the commit other requests still read the old row, which they must not cache again
+    assert user_services.user_cache.get(("id", john_id)) is cached
+    await database.rollback()
+    assert user_services.user_cache.get(("id", john_id)) is cached
+
+
+@pytest.mark.asyncio
+async def test_committed_user_change_drops_the_profile(database):
+    john = (await database.scalars(select(User).where(User.email == "john@gmail.com"))).one()
+    await user_services.get_user_by_id(john.id, database)
+    assert await user_services.profile_cache.backend.get(john.id) is not MISSING
+    john.name = "Johnny"
+    await database.commit()
+    await asyncio.gather(*user_services._pending_invalidations)
+    assert await user_services.profile_cache.backend.get(john.id) is MISSING
@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import NullPool, StaticPool
+
+from config.db_pool import InstrumentedQueuePool, pool_status
+
+
+def test_pool_status_counts_connections_waits_and_timeouts():
+    engine = create_engine(
+        "sqlite://", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.01
+    )
+    try:
+        held = engine.connect()
+        status = pool_status(engine.pool)
+        assert status["pool_class"] == "InstrumentedQueuePool"
+        assert (status["size"], status["checked_out"], status["checked_in"]) == (1, 1, 0)
+        assert (status["overflow"], status["timeout"]) == (0, 0.01)
+        assert status["checkouts"] == 1
+
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        held.close()
+        status = pool_status(engine.pool)
+    finally:
+        engine.dispose()
+
+    assert (status["checked_out"], status["checked_in"]) == (0, 1)
+    assert status["checkouts"] == 1
+    assert status["checkout_timeouts"] == 1
+    histogram = status["wait_seconds_histogram"]
+    # Cumulative buckets: the one successful checkout, and not the timed-out one
+    assert histogram["+Inf"] == 1
+    assert list(histogram.values()) == sorted(histogram.values())
+    assert status["wait_seconds_sum"] <= min(float(bound) for bound, count in histogram.items() if count == 1)
+
+
+@pytest.mark.parametrize("poolclass", [NullPool, StaticPool])
+def test_pool_status_of_pools_without_a_queue(poolclass):
+    engine = create_engine("sqlite://", poolclass=poolclass)
+    try:
+        status = pool_status(engine.pool)
+    finally:
+        engine.dispose()
+    assert status["pool_class"] == poolclass.__name__
+    assert status["checked_out"] is None
+    assert "checkouts" not in status
@@ -1,20 +1,68 @@
-import pytest
+import os
+import tempfile
+
+# Under pytest-xdist each worker writes its own log file, so tests reading the log see only their
+# own records. Set before the app is imported, since the log settings are read at import time.
+if os.getenv("PYTEST_XDIST_WORKER"):
+    os.environ["LOG_FILE"] = os.path.join(tempfile.gettempdir(), f"tasks_app_test_{os.environ['PYTEST_XDIST_WORKER']}.log")
 
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete
 
+from tasks_app.auth.jwt import token_cache
+from tasks_app.db_models import hashing
 from tasks_app.db_models.models import User
+from tasks_app.tasks.services import task_cache
+from tasks_app.user.services import profile_cache, user_cache
+from conf_test_db import AsyncTestingSessionLocal, create_schema, rollback_transaction
+
+# Hashed once for the whole session instead of once per test
+JOHN_PASSWORD_HASH = hashing.get_password_hash("john123")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "committed: run against committed rows instead of a rolled-back transaction, for tests whose "
+        "rows must be visible to other connections or processes",
+    )
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database_schema():
+    """Creates the tables once per test session (and per pytest-xdist worker)"""
+    create_schema()
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def database(request, database_schema):
+    """
+    A session on the test's database transaction, which already holds the user John.
+
+    Everything the test and the app write is rolled back afterwards. Tests marked `committed` get
+    a plain session instead and John is committed and deleted again, along with his tasks.
+    """
+    john = User(name='John', email='john@gmail.com', password_hash=JOHN_PASSWORD_HASH)
+    if request.node.get_closest_marker("committed"):
+        async with AsyncTestingSessionLocal() as session:
+            session.add(john)
+            await session.commit()
+            try:
+                yield session
+            finally:
+                # A Core DELETE, so the database's ON DELETE CASCADE removes his tasks; the ORM would
+                # load them and set their user_id to NULL instead
+                await session.execute(delete(User).where(User.id == john.id))
+                await session.commit()
+    else:
+        async with rollback_transaction() as session:
+            session.add(john)
+            await session.commit()
+            yield session
 
-@pytest.fixture(autouse=True)
-def create_dummy_user(tmpdir):
-    """Fixture to execute asserts before and after a test is run"""
-    # Setup: fill with any logic you want
-    from conf_test_db import override_get_db
-    database = next(override_get_db())
-    new_user = User(name='John', email='john@gmail.com', password='john123')
-    database.add(new_user)
-    database.commit()
-
-    yield  # this is where the testing happens
-
-    # Teardown : fill with any logic you want
-    database.query(User).filter(User.email == 'john@gmail.com').delete()
-    database.commit()
\ No newline at end of file
+    # Rolled-back rows may still be cached, under IDs that no longer exist
+    user_cache.clear()
+    token_cache.clear()
+    await profile_cache.clear()
+    await task_cache.clear()
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import pytest
+
+from tasks_app.db_models import hashing
+
+
+@pytest.mark.asyncio
+async def test_async_hash_round_trip():
+    password_hash = await hashing.get_password_hash_async("s3cret")
+    assert await hashing.verify_password_async("s3cret", password_hash)
+    assert not await hashing.verify_password_async("wrong", password_hash)
+
+
+@pytest.mark.asyncio
+async def test_pool_rejects_work_beyond_max_pending():
+    pool = hashing.HashingPool(workers=1, max_pending=2)
+    release = threading.Event()
+    try:
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(hashing.HashingOverloaded):
+            await pool.run(release.wait)
+
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+        assert pool.stats()["rejected"] == 1
+        assert pool.stats()["pending"] == 0
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_hash_with_other_cost_needs_rehash():
+    cheap = hashing.build_context(time_cost=1, memory_cost=8192, parallelism=1).hash("s3cret")
+    assert hashing.needs_rehash(cheap)
+    assert not hashing.needs_rehash(hashing.get_password_hash("s3cret"))
+
+
+def test_verify_and_update_returns_hash_with_configured_cost():
+    cheap = hashing.build_context(time_cost=1, memory_cost=8192, parallelism=1).hash("s3cret")
+    verified, new_hash = hashing.verify_and_update("s3cret", cheap)
+    assert verified
+    assert not hashing.needs_rehash(new_hash)
+    assert hashing.verify_and_update("wrong", cheap) == (False, None)
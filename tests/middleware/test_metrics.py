@@ -0,0 +1,75 @@
+import json
+import os
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from tasks_app.auth.jwt import create_access_token
+from tasks_app.middleware import metrics
+from conf_test_db import INTERNAL_HEADERS, app
+
+
+def sample(exposition, name, **labels):
+    wanted = name + metrics._labels(**labels) if labels else name
+    for line in exposition.splitlines():
+        if line.startswith(wanted + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+@pytest.mark.asyncio
+async def test_requests_are_counted_by_route_template():
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        before = (await ac.get("/metrics", headers=INTERNAL_HEADERS)).text
+        for task_id in (123456, 123457):
+            await ac.get(f"/task/{task_id}", headers=headers)
+        await ac.get("/no/such/path")
+        response = await ac.get("/metrics", headers=INTERNAL_HEADERS)
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = response.text
+    route = {"method": "GET", "route": "/task/{task_id}"}
+    assert sample(after, "http_requests_total", **route, status="4xx") \
+        - sample(before, "http_requests_total", **route, status="4xx") == 2
+    assert sample(after, "http_request_duration_seconds_count", **route) \
+        - sample(before, "http_request_duration_seconds_count", **route) == 2
+    assert sample(after, "http_request_duration_seconds_bucket", **route, le="+Inf") \
+        == sample(after, "http_request_duration_seconds_count", **route)
+    assert sample(after, "http_requests_total", method="GET", route=metrics.UNMATCHED_ROUTE, status="4xx") >= 1
+    assert "123456" not in after
+    # The scrape itself is in flight while it renders
+    assert sample(after, "http_requests_in_flight") == 1
+
+
+@pytest.mark.asyncio
+async def test_workers_are_summed_and_exited_workers_have_nothing_in_flight(tmp_path):
+    worker = metrics.RequestMetrics()
+    worker.observe("GET", "/task/", 200, 0.003)
+    worker.observe("GET", "/task/", 200, 0.2)
+    worker.in_flight = 4
+    for pid, age in ((1, 0), (2, 3600)):
+        path = tmp_path / f"worker-{pid}.json"
+        path.write_text(json.dumps(worker.snapshot()))
+        os.utime(path, (time.time() - age, time.time() - age))
+
+    exposition = await metrics.collect(str(tmp_path))
+
+    route = {"method": "GET", "route": "/task/"}
+    own = metrics.request_metrics.requests.get(("GET", "/task/", "2xx"), 0)
+    assert sample(exposition, "http_requests_total", **route, status="2xx") == own + 4
+    assert sample(exposition, "http_request_duration_seconds_bucket", **route, le="0.005") >= 2
+    assert sample(exposition, "http_requests_in_flight") == metrics.request_metrics.in_flight + 4
+
+
+@pytest.mark.asyncio
+async def test_internal_endpoints_require_the_token(monkeypatch):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        assert (await ac.get("/metrics")).status_code == 403
+        assert (await ac.get("/internal/db-pool", headers={"X-Internal-Token": "wrong"})).status_code == 403
+        bearer = {"Authorization": f"Bearer {INTERNAL_HEADERS['X-Internal-Token']}"}
+        assert (await ac.get("/internal/db-pool", headers=bearer)).status_code == 200
+
+        monkeypatch.setattr("tasks_app.internal.router.INTERNAL_API_TOKEN", "")
+        assert (await ac.get("/metrics", headers=INTERNAL_HEADERS)).status_code == 404
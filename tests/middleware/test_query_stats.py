@@ -0,0 +1,71 @@
+import re
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+
+from config import db_queries
+from tasks_app.auth.jwt import create_access_token
+from conf_test_db import app, engine
+
+
+def test_parameters_are_redacted_to_their_types():
+    assert db_queries.redact({"email": "john@gmail.com", "id": 7}) == {"email": "<str>", "id": "<int>"}
+    assert db_queries.redact(("secret", None)) == ["<str>", "<NoneType>"]
+    assert db_queries.redact([{"title": "a"}, {"title": "b"}]) == {"rows": 2, "first": {"title": "<str>"}}
+
+
+def test_statements_are_attributed_to_the_current_request_and_repeats_flagged():
+    token = db_queries.start_request()
+    try:
+        with engine.connect() as connection:
+            for number in range(db_queries.SQL_REPEAT_THRESHOLD):
+                connection.execute(text("SELECT :number"), {"number": number})
+            connection.execute(text("SELECT 1"))
+        stats = db_queries.current_stats()
+    finally:
+        db_queries.end_request(token)
+
+    assert stats.count == db_queries.SQL_REPEAT_THRESHOLD + 1
+    assert stats.repeated() == [("SELECT %(number)s", db_queries.SQL_REPEAT_THRESHOLD)]
+    assert db_queries.current_stats() is None
+
+
+def test_savepoints_are_not_counted_as_statements():
+    token = db_queries.start_request()
+    try:
+        with engine.connect() as connection, connection.begin():
+            with connection.begin_nested():
+                connection.execute(text("SELECT 1"))
+            connection.begin_nested().rollback()
+        stats = db_queries.current_stats()
+    finally:
+        db_queries.end_request(token)
+
+    assert stats.count == 1 and list(stats.statements) == ["SELECT 1"]
+
+
+def test_slow_statements_are_logged_without_their_values(monkeypatch, caplog):
+    monkeypatch.setattr(db_queries, "SQL_SLOW_QUERY_MS", 1)
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_sleep(0.01), :secret"), {"secret": "hunter2"})
+
+    slow = [record for record in caplog.records if record.getMessage() == "Slow query"]
+    assert len(slow) == 1
+    assert slow[0].fields["parameters"] == {"secret": "<str>"}
+    assert "hunter2" not in str(slow[0].fields)
+
+
+@pytest.mark.asyncio
+async def test_responses_report_database_time_in_server_timing():
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/task/tasks/", headers=headers, json={
+            "title": "timed", "description": "server timing",
+            "due_date": "2030-01-01T00:00:00", "creation_date": "2024-01-01T00:00:00",
+        })
+
+    timing = re.fullmatch(r'db;dur=([0-9.]+);desc="(\d+) queries"', response.headers["server-timing"])
+    assert timing is not None
+    assert float(timing.group(1)) > 0 and int(timing.group(2)) >= 2
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import logging
+import queue
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from tasks_app.auth.jwt import create_access_token
+from tasks_app.db_models.models import User
+from tasks_app.middleware import fle_logs
+from conf_test_db import app
+
+
+def make_record(message):
+    return logging.LogRecord("tasks_app.test", logging.INFO, __file__, 1, message, None, None)
+
+
+def read_records(path):
+    with open(path) as log_file:
+        return [json.loads(line) for line in log_file]
+
+
+def test_writer_batches_records_and_rotates_by_size(tmp_path):
+    handler = fle_logs.BatchingRotatingFileHandler(tmp_path / "app.log", maxBytes=2000, backupCount=2, delay=True)
+    handler.setFormatter(fle_logs.JsonFormatter())
+    log_queue = queue.Queue()
+    for number in range(40):
+        log_queue.put(make_record(f"record {number}"))
+    writer = fle_logs.LogWriter(log_queue, handler, batch_size=10)
+
+    writer.start()
+    writer.stop()
+
+    assert writer.written == 40 and writer.batches == 4
+    assert (tmp_path / "app.log.1").exists()
+    kept = read_records(tmp_path / "app.log.1") + read_records(tmp_path / "app.log")
+    assert kept[-1]["message"] == "record 39"
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = fle_logs.DroppingQueueHandler(queue.Queue(maxsize=1))
+
+    handler.handle(make_record("kept"))
+    handler.handle(make_record("dropped"))
+
+    assert handler.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_access_record_has_status_duration_and_user(database):
+    user_id = await database.scalar(select(User.id).where(User.email == "john@gmail.com"))
+    token = create_access_token({"sub": "john@gmail.com", "uid": user_id})
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        await ac.get("/task/", params={"limit": 1}, headers={'Authorization': f'Bearer {token}'})
+        await ac.get("/task/", params={"limit": 2})
+    fle_logs.log_writer.flush()
+
+    access = [record for record in read_records(fle_logs.LOG_FILE) if record["logger"] == "tasks_app.access"]
+    authenticated, anonymous = access[-2:]
+    assert authenticated["method"] == "GET" and authenticated["path"] == "/task/"
+    assert authenticated["status"] == 200 and authenticated["user_id"] == user_id
+    assert authenticated["duration_ms"] > 0 and authenticated["db_queries"] >= 1
+    assert anonymous["status"] == 401 and anonymous["user_id"] is None
+
+
+@pytest.mark.asyncio
+async def test_fast_successes_are_sampled_but_errors_are_not(monkeypatch):
+    logged = []
+    monkeypatch.setattr(fle_logs.access_logger, "info", lambda message, extra: logged.append(extra["fields"]))
+
+    async def ok(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def not_found(scope, receive, send):
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/task/"}
+    for _ in range(200):
+        await fle_logs.RequestLoggingMiddleware(ok, sample_rate=0.1)(dict(scope), None, send)
+    await fle_logs.RequestLoggingMiddleware(not_found, sample_rate=0.1)(dict(scope), None, send)
+
+    assert 0 < len(logged) - 1 < 60
+    assert all(fields["sample_rate"] == 0.1 for fields in logged[:-1])
+    assert logged[-1]["status"] == 404 and "sample_rate" not in logged[-1]
+
+
+@pytest.mark.asyncio
+async def test_sampled_out_requests_still_raise():
+    async def cancelled_after_start(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        raise asyncio.CancelledError
+
+    async def send(message):
+        pass
+
+    middleware = fle_logs.RequestLoggingMiddleware(cancelled_after_start, sample_rate=0.0)
+    with pytest.raises(asyncio.CancelledError):
+        await middleware({"type": "http", "method": "GET", "path": "/task/"}, None, send)
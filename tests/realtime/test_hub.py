@@ -0,0 +1,223 @@
+import asyncio
+import json
+
+import msgpack
+import pytest
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from tasks_app.auth.jwt import create_access_token
+from tasks_app.realtime import events
+from tasks_app.realtime.hub import (
+    BroadcastHub, CLOSE_GOING_AWAY, CLOSE_POLICY_VIOLATION, CLOSE_TRY_AGAIN_LATER, ConnectionLimitExceeded, PING_FRAME,
+    hub as app_hub,
+)
+from conf_test_db import app
+
+
+class FakeSocket:
+    def __init__(self, gate: asyncio.Event = None):
+        self.received = []
+        self.close_code = None
+        self.gate = gate
+
+    async def send_text(self, message):
+        if self.gate is not None:
+            await self.gate.wait()
+        self.received.append(message)
+
+    async def send_bytes(self, message):
+        await self.send_text(message)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+@pytest.mark.asyncio
+async def test_stalled_client_does_not_delay_others():
+    hub = BroadcastHub(queue_size=10)
+    stalled, fast = FakeSocket(gate=asyncio.Event()), FakeSocket()
+    hub.connect(stalled)
+    hub.connect(fast)
+
+    for number in range(3):
+        hub.publish(f"message {number}")
+    await asyncio.sleep(0.01)
+
+    assert fast.received == ["message 0", "message 1", "message 2"]
+    assert stalled.received == []
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_latest_messages():
+    hub = BroadcastHub(queue_size=2, policy="drop_oldest")
+    gate = asyncio.Event()
+    slow = FakeSocket(gate=gate)
+    hub.connect(slow)
+
+    for number in range(5):
+        hub.publish(f"message {number}")
+    assert hub.stats()["dropped"] == 3
+    assert hub.stats()["queue_depth_max"] == 2
+
+    gate.set()
+    await asyncio.sleep(0.01)
+    assert slow.received == ["message 3", "message 4"]
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_closes_slow_client():
+    hub = BroadcastHub(queue_size=1, policy="disconnect")
+    slow = FakeSocket(gate=asyncio.Event())
+    hub.connect(slow)
+
+    hub.publish("first")
+    assert hub.publish("second") == 0
+    await asyncio.sleep(0.01)
+
+    assert slow.close_code == CLOSE_TRY_AGAIN_LATER
+    assert hub.stats()["connections"] == 0
+    assert hub.stats()["slow_consumer_disconnects"] == 1
+
+
+@pytest.mark.asyncio
+async def test_publish_reaches_only_subscribers_of_the_topics():
+    hub = BroadcastHub(queue_size=10)
+    owner, follower, other = FakeSocket(), FakeSocket(), FakeSocket()
+    hub.connect(owner, ["user:7"])
+    follower_connection = hub.connect(follower, ["task:42"])
+    hub.connect(other, ["user:8"])
+    hub.subscribe(follower_connection, "user:7")
+
+    assert hub.publish("changed", ["user:7", "task:42"]) == 2
+    await asyncio.sleep(0.01)
+
+    assert owner.received == ["changed"] and follower.received == ["changed"] and other.received == []
+    await hub.disconnect(follower_connection)
+    assert hub.topics.keys() == {"user:7", "user:8"}
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_batching_connection_coalesces_events_of_one_task_into_one_frame():
+    hub = BroadcastHub(queue_size=100, batch_window_ms=20)
+    batched, unbatched = FakeSocket(), FakeSocket()
+    hub.connect(batched, batch=True)
+    hub.connect(unbatched, encoding="msgpack")
+
+    for kind, task_id in [
+        (events.TASK_CREATED, 1), (events.TASK_UPDATED, 1), (events.TASK_UPDATED, 2), (events.TASK_UPDATED, 2),
+    ]:
+        hub.publish(events.TaskEvent(events.task_event(kind, task_id, 7)))
+    await asyncio.sleep(0.05)
+
+    assert [[event["event"] for event in json.loads(frame)] for frame in batched.received] == [
+        ["task.created", "task.updated"]
+    ]
+    assert [msgpack.unpackb(frame)["task_id"] for frame in unbatched.received] == [1, 1, 2, 2]
+    assert hub.stats()["coalesced"] == 2
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_evicts_silent_clients_and_pings_the_others():
+    hub = BroadcastHub(queue_size=10, heartbeat_interval=0, idle_timeout=0.05)
+    silent, alive = FakeSocket(), FakeSocket()
+    hub.connect(silent, ["user:7"], owner=7)
+    alive_connection = hub.connect(alive, ["user:7"], owner=7)
+
+    await asyncio.sleep(0.06)
+    alive_connection.touch()
+    hub.check_liveness()
+    await asyncio.sleep(0.01)
+
+    assert silent.close_code == CLOSE_GOING_AWAY and alive.received == [PING_FRAME]
+    assert hub.stats()["connections"] == 1 and hub.stats()["idle_evictions"] == 1
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_connection_caps_per_user_and_per_worker():
+    hub = BroadcastHub(queue_size=10, max_connections=2, max_connections_per_user=1)
+    first = hub.connect(FakeSocket(), owner=7)
+
+    with pytest.raises(ConnectionLimitExceeded) as per_user:
+        hub.connect(FakeSocket(), owner=7)
+    hub.connect(FakeSocket(), owner=8)
+    with pytest.raises(ConnectionLimitExceeded) as per_worker:
+        hub.connect(FakeSocket(), owner=9)
+    await hub.disconnect(first)
+    hub.connect(FakeSocket(), owner=7)
+
+    assert per_user.value.code == CLOSE_POLICY_VIOLATION and per_worker.value.code == CLOSE_TRY_AGAIN_LATER
+    assert hub.stats()["users"] == 2 and hub.stats()["rejected"] == 2
+    await hub.close()
+
+
+def auth_headers():
+    return {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+
+
+def task_body(title):
+    return {
+        "title": title, "description": "over the socket",
+        "due_date": "2030-01-01T00:00:00", "creation_date": "2024-01-01T00:00:00",
+    }
+
+
+def test_websocket_requires_a_valid_token():
+    with TestClient(app) as client:
+        with pytest.raises(WebSocketDisconnect) as disconnected:
+            with client.websocket_connect("/task/ws/tasks/1?token=invalid"):
+                pass
+    assert disconnected.value.code == 1008
+
+
+@pytest.mark.committed
+def test_task_changes_are_pushed_to_websocket_clients():
+    token = create_access_token({"sub": "john@gmail.com"})
+    with TestClient(app) as client, client.websocket_connect(f"/task/ws/tasks/1?token={token}") as websocket:
+        task = client.post("/task/tasks/", json=task_body("pushed"), headers=auth_headers()).json()
+        client.delete(f"/task/{task['id']}", headers=auth_headers())
+
+        created, deleted = json.loads(websocket.receive_text()), json.loads(websocket.receive_text())
+    assert created["event"] == "task.created" and created["task_id"] == task["id"]
+    assert deleted["event"] == "task.deleted" and deleted["task_id"] == task["id"]
+
+
+@pytest.mark.committed
+def test_client_can_follow_single_tasks_only():
+    with TestClient(app) as client, client.websocket_connect("/task/ws/tasks/1", headers=auth_headers()) as websocket:
+        followed = client.post("/task/tasks/", json=task_body("followed"), headers=auth_headers()).json()
+        assert json.loads(websocket.receive_text())["task_id"] == followed["id"]
+
+        websocket.send_text(json.dumps({"all": False, "subscribe": [followed["id"], 0]}))
+        assert json.loads(websocket.receive_text()) == {"all": False, "following": [followed["id"]], "not_found": [0]}
+
+        client.post("/task/tasks/", json=task_body("not followed"), headers=auth_headers())
+        client.delete(f"/task/{followed['id']}", headers=auth_headers())
+        event = json.loads(websocket.receive_text())
+    assert event["event"] == "task.deleted" and event["task_id"] == followed["id"]
+
+
+@pytest.mark.committed
+def test_msgpack_batches_over_the_socket():
+    url = "/task/ws/tasks/1?encoding=msgpack&batch=true"
+    with TestClient(app) as client, client.websocket_connect(url, headers=auth_headers()) as websocket:
+        response = client.post("/task/tasks/batch", json={"create": [task_body(f"bulk {number}") for number in range(3)]},
+                               headers=auth_headers())
+        frame = msgpack.unpackb(websocket.receive_bytes())
+    created = [item["id"] for item in response.json()["results"]]
+    assert [(event["event"], event["task_id"]) for event in frame] == [("task.created", task_id) for task_id in created]
+
+
+@pytest.mark.committed
+def test_connections_over_the_per_user_cap_are_closed(monkeypatch):
+    monkeypatch.setattr(app_hub, "max_connections_per_user", 1)
+    with TestClient(app) as client, client.websocket_connect("/task/ws/tasks/1", headers=auth_headers()):
+        with client.websocket_connect("/task/ws/tasks/2", headers=auth_headers()) as second:
+            with pytest.raises(WebSocketDisconnect) as disconnected:
+                second.receive_text()
+    assert disconnected.value.code == CLOSE_POLICY_VIOLATION
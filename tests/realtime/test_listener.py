@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+from websockets.sync.client import connect
+
+from tasks_app.auth.jwt import create_access_token
+from tasks_app.cache.read_through import MISSING
+from tasks_app.realtime import events
+from tasks_app.realtime.listener import TaskEventListener
+from tasks_app.tasks.services import task_cache
+import conf_test_db
+
+
+class RecordingHub:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, message, topics=None):
+        self.published.append((message.encode("json"), tuple(topics)))
+
+
+def test_large_batches_are_split_into_notifications_under_the_limit():
+    task_events = [events.task_event(events.TASK_UPDATED, number, 7) for number in range(1000)]
+
+    payloads = events.notification_payloads(task_events)
+
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) < events.MAX_PAYLOAD_BYTES for payload in payloads)
+    lines = [line for payload in payloads for line in payload.split("\n")[1:]]
+    assert [json.loads(line)["task_id"] for line in lines] == list(range(1000))
+
+
+def test_listener_forwards_other_workers_events_only():
+    hub = RecordingHub()
+    listener = TaskEventListener("postgresql://unused", target=hub)
+    event = events.encode_event(events.task_event(events.TASK_CREATED, 1, 7))
+
+    listener._on_notification(None, 0, events.CHANNEL, f"{events.ORIGIN}\n{event}")
+    listener._on_notification(None, 0, events.CHANNEL, f"other-worker\n{event}\n{event}")
+
+    assert hub.published == [(event, ("user:7", "task:1"))] * 2
+    assert listener.stats()["received"] == 2
+
+
+@pytest.mark.asyncio
+async def test_other_workers_updates_drop_cached_tasks():
+    listener = TaskEventListener("postgresql://unused", target=RecordingHub())
+    await task_cache.backend.set(1, "cached")
+    event = events.encode_event(events.task_event(events.TASK_UPDATED, 1, 7))
+
+    listener._on_notification(None, 0, events.CHANNEL, f"other-worker\n{event}")
+
+    # Held until it finishes, so the loop cannot collect it first
+    assert len(listener._invalidations) == 1
+    await asyncio.gather(*listener._invalidations)
+    assert await task_cache.backend.get(1) is MISSING
+    assert not listener._invalidations
+
+
+def test_forked_workers_get_their_own_origin():
+    read_end, write_end = os.pipe()
+    child = os.fork()
+    if child == 0:
+        # A worker forked from a process that had already imported the events module
+        os.write(write_end, events.ORIGIN.encode())
+        os._exit(0)
+    os.close(write_end)
+    with os.fdopen(read_end) as pipe:
+        child_origin = pipe.read()
+    os.waitpid(child, 0)
+
+    assert child_origin and child_origin != events.ORIGIN
+    assert child_origin.endswith(f"-{child}")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def two_workers():
+    # Two separate app processes sharing the test database, like two uvicorn workers or nodes
+    environment = {
+        **os.environ,
+        "POSTGRES_USER": conf_test_db.DATABASE_USERNAME,
+        "POSTGRES_PASSWORD": conf_test_db.DATABASE_PASSWORD,
+        "POSTGRES_SERVER": conf_test_db.DATABASE_HOST,
+        "POSTGRES_PORT": os.getenv("TEST_POSTGRES_PORT", "5432"),
+        "POSTGRES_DB": conf_test_db.DATABASE_NAME,
+    }
+    ports = [free_port(), free_port()]
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            env=environment,
+        )
+        for port in ports
+    ]
+    try:
+        for port in ports:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    stats = httpx.get(f"http://127.0.0.1:{port}/internal/websockets", headers=conf_test_db.INTERNAL_HEADERS).json()
+                    if stats["listener"]["connected"]:
+                        break
+                except httpx.TransportError:
+                    pass
+                assert time.monotonic() < deadline, f"worker on port {port} did not start listening"
+                time.sleep(0.2)
+        yield [f"127.0.0.1:{port}" for port in ports]
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.wait(10)
+
+
+@pytest.mark.committed
+def test_task_change_on_one_worker_reaches_clients_of_another(two_workers):
+    worker_a, worker_b = two_workers
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    body = {
+        "title": "across workers", "description": "via NOTIFY",
+        "due_date": "2030-01-01T00:00:00", "creation_date": "2024-01-01T00:00:00",
+    }
+
+    with connect(f"ws://{worker_b}/task/ws/tasks/1", additional_headers=headers) as websocket:
+        task = httpx.post(f"http://{worker_a}/task/tasks/", json=body, headers=headers).json()
+        event = json.loads(websocket.recv(timeout=5))
+
+    assert event["event"] == "task.created" and event["task_id"] == task["id"]
+
+
+def test_notification_built_in_sql_matches_the_python_encoding():
+    from sqlalchemy import literal, select
+
+    event = events.task_event(events.TASK_UPDATED, 42, 7)
+    expression = events.payload_in_sql(events.TASK_UPDATED, literal(42), literal(7))
+
+    with conf_test_db.engine.connect() as connection:
+        payload = connection.execute(select(expression)).scalar_one()
+
+    assert [payload] == events.notification_payloads([event])
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from tasks_app.auth.jwt import create_access_token
+from tasks_app.cache.read_through import LRUBackend, ReadThroughCache
+from tasks_app.tasks import services
+from conf_test_db import INTERNAL_HEADERS, app
+
+TASK = {
+    "title": "cached", "description": "read-through",
+    "due_date": "2030-01-01T00:00:00", "creation_date": "2024-01-01T00:00:00",
+}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    cache = ReadThroughCache(LRUBackend(maxsize=10, ttl=None))
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(cache.get_or_load("key", load) for _ in range(20)))
+
+    assert results == ["value"] * 20 and calls == 1
+    assert await cache.get_or_load("key", load) == "value" and calls == 1
+    stats = cache.stats()
+    assert stats["loads"] == 1 and stats["coalesced"] == 19 and stats["loading"] == 0
+
+
+@pytest.mark.asyncio
+async def test_load_overtaken_by_an_invalidation_is_not_stored():
+    cache = ReadThroughCache(LRUBackend(maxsize=10, ttl=None))
+    release = asyncio.Event()
+
+    async def load_old():
+        await release.wait()
+        return "old"
+
+    loading = asyncio.create_task(cache.get_or_load("key", load_old))
+    await asyncio.sleep(0)
+    await cache.invalidate("key")
+    release.set()
+
+    assert await loading == "old"
+    assert await cache.get("key") is None
+
+
+@pytest.mark.asyncio
+async def test_failed_load_is_retried_by_waiters_and_missing_rows_are_not_cached():
+    cache = ReadThroughCache(LRUBackend(maxsize=10, ttl=None))
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("database down")
+
+    async def load():
+        return "value"
+
+    leader = asyncio.create_task(cache.get_or_load("key", fail))
+    await asyncio.sleep(0)
+    follower = await cache.get_or_load("key", load)
+
+    assert follower == "value"
+    with pytest.raises(RuntimeError):
+        await leader
+
+    async def not_found():
+        return None
+
+    assert await cache.get_or_load("gone", not_found) is None
+    assert await cache.get("gone") is None
+
+
+@pytest.mark.asyncio
+async def test_task_reads_are_cached_until_written():
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        task_id = (await ac.post("/task/tasks/", headers=headers, json=TASK)).json()["id"]
+        cold = await ac.get(f"/task/{task_id}", headers=headers)
+        warm = await ac.get(f"/task/{task_id}", headers=headers)
+        await ac.patch(f"/task/{task_id}", headers=headers, json={"title": "renamed"})
+        after_patch = await ac.get(f"/task/{task_id}", headers=headers)
+        await ac.delete(f"/task/{task_id}", headers=headers)
+        after_delete = await ac.get(f"/task/{task_id}", headers=headers)
+        stats = (await ac.get("/internal/read-cache", headers=INTERNAL_HEADERS)).json()
+
+    assert 'desc="1 queries"' in cold.headers["server-timing"]
+    assert 'desc="0 queries"' in warm.headers["server-timing"]
+    assert warm.json() == cold.json()
+    assert after_patch.json()["title"] == "renamed"
+    assert after_patch.headers["etag"] == f'"{task_id}-2"'
+    assert after_delete.status_code == 404
+    assert stats["tasks"]["hits"] >= 1 and stats["tasks"]["invalidations"] >= 2
+    assert await services.task_cache.get(task_id) is None
@@ -0,0 +1,62 @@
+import pytest
+from httpx import AsyncClient
+
+from tasks_app.auth.jwt import create_access_token
+from conf_test_db import app
+
+
+def task_body(title):
+    return {
+        "title": title,
+        "description": "synced offline",
+        "due_date": "2030-01-01T00:00:00",
+        "creation_date": "2024-01-01T00:00:00",
+    }
+
+
+@pytest.mark.asyncio
+async def test_batch_creates_updates_and_deletes_in_one_request():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+
+        response = await ac.post("/task/tasks/batch", headers=headers, json={
+            "create": [task_body(f"task {number}") for number in range(3)],
+        })
+        assert response.status_code == 200
+        created = [item["id"] for item in response.json()["results"]]
+        assert [item["status"] for item in response.json()["results"]] == ["created"] * 3
+
+        response = await ac.post("/task/tasks/batch", headers=headers, json={
+            "update": [{**task_body("renamed"), "id": created[0]}, {**task_body("missing"), "id": 0}],
+            "delete": [created[1], 0],
+        })
+        assert response.status_code == 200
+        assert [(item["op"], item["status"]) for item in response.json()["results"]] == [
+            ("update", "updated"), ("update", "not_found"), ("delete", "deleted"), ("delete", "not_found"),
+        ]
+
+        response = await ac.get("/task/", headers=headers)
+        titles = {task["id"]: task["title"] for task in response.json()["items"]}
+    assert titles == {created[0]: "renamed", created[2]: "task 2"}
+
+
+@pytest.mark.asyncio
+async def test_batch_rejects_duplicate_ids():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+        response = await ac.post("/task/tasks/batch", headers=headers, json={"delete": [1, 1]})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_batch_creates_report_the_id_of_each_item():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+        response = await ac.post("/task/tasks/batch", headers=headers, json={
+            "create": [task_body(f"task {number}") for number in range(20)],
+        })
+        results = response.json()["results"]
+        assert [item["index"] for item in results] == list(range(20))
+        for item in results:
+            task = (await ac.get(f"/task/{item['id']}", headers=headers)).json()
+            assert task["title"] == f"task {item['index']}"
@@ -0,0 +1,72 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from tasks_app.auth.jwt import create_access_token
+from tasks_app.cache import etag
+from tasks_app.db_models.models import User
+from conf_test_db import app
+
+TASK = {
+    "title": "versioned", "description": "etag",
+    "due_date": "2030-01-01T00:00:00", "creation_date": "2024-01-01T00:00:00",
+}
+
+
+def test_if_match_accepts_only_strong_tags_of_the_row():
+    assert etag.matching_versions('"7-2", "8-3", W/"7-4"', 7) == [2]
+    assert etag.matching_versions("*", 7) is None
+    assert not etag.none_match('W/"7-2"', '"7-2"')
+
+
+@pytest.mark.asyncio
+async def test_unchanged_task_is_not_modified_until_written():
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        task_id = (await ac.post("/task/tasks/", headers=headers, json=TASK)).json()["id"]
+        first = await ac.get(f"/task/{task_id}", headers=headers)
+        cached = await ac.get(f"/task/{task_id}", headers={**headers, "If-None-Match": first.headers["etag"]})
+        await ac.patch(f"/task/{task_id}", headers=headers, json={"completed": True})
+        batch = {"update": [{**TASK, "id": task_id, "title": "batched"}]}
+        await ac.post("/task/tasks/batch", headers=headers, json=batch)
+        changed = await ac.get(f"/task/{task_id}", headers={**headers, "If-None-Match": first.headers["etag"]})
+
+    assert first.status_code == 200 and first.headers["etag"] == f'"{task_id}-1"'
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["etag"] == first.headers["etag"]
+    assert 'desc="0 queries"' in cached.headers["server-timing"]
+    assert changed.status_code == 200 and changed.headers["etag"] == f'"{task_id}-3"'
+    assert changed.json()["title"] == "batched"
+
+
+@pytest.mark.asyncio
+async def test_writes_with_a_stale_if_match_are_rejected():
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        task_id = (await ac.post("/task/tasks/", headers=headers, json=TASK)).json()["id"]
+        original = (await ac.get(f"/task/{task_id}", headers=headers)).headers["etag"]
+        updated = await ac.put(f"/task/tasks/{task_id}", headers={**headers, "If-Match": original},
+                               json={**TASK, "title": "first writer"})
+        stale_put = await ac.put(f"/task/tasks/{task_id}", headers={**headers, "If-Match": original},
+                                 json={**TASK, "title": "second writer"})
+        stale_delete = await ac.delete(f"/task/{task_id}", headers={**headers, "If-Match": original})
+        deleted = await ac.delete(f"/task/{task_id}", headers={**headers, "If-Match": updated.headers["etag"]})
+        gone = await ac.delete(f"/task/{task_id}", headers={**headers, "If-Match": "*"})
+
+    assert updated.status_code == 200 and updated.headers["etag"] == f'"{task_id}-2"'
+    assert stale_put.status_code == 412 and stale_delete.status_code == 412
+    assert deleted.status_code == 200 and deleted.json()["title"] == "first writer"
+    assert gone.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_user_reads_are_conditional(database):
+    user_id = await database.scalar(select(User.id).where(User.email == "john@gmail.com"))
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        first = await ac.get(f"/user/{user_id}")
+        cached = await ac.get(f"/user/{user_id}", headers={"If-None-Match": first.headers["etag"]})
+        other = await ac.get(f"/user/{user_id}", headers={"If-None-Match": f'"{user_id}-0"'})
+
+    assert first.headers["etag"] == f'"{user_id}-1"'
+    assert cached.status_code == 304
+    assert other.status_code == 200 and other.json()["email"] == "john@gmail.com"
@@ -0,0 +1,63 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from tasks_app.auth.jwt import create_access_token
+from tasks_app.tasks import export
+from conf_test_db import app
+
+TASK = {"description": "exported", "due_date": "2030-01-01T00:00:00", "creation_date": "2024-01-01T00:00:00"}
+
+
+def test_gzip_is_negotiated_from_accept_encoding():
+    assert export.accepts_gzip("gzip, deflate, br")
+    assert export.accepts_gzip("br;q=1, *;q=0.5")
+    assert not export.accepts_gzip("*, gzip;q=0")
+    assert not export.accepts_gzip("identity") and not export.accepts_gzip(None)
+
+
+@pytest.mark.asyncio
+async def test_export_streams_every_task_in_each_format(monkeypatch):
+    # Several cursor batches per export
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        ids = [
+            (await ac.post("/task/tasks/", headers=headers, json={**TASK, "title": f"task, \"{n}\""})).json()["id"]
+            for n in range(5)
+        ]
+        ndjson = await ac.get("/task/export", headers={**headers, "Accept-Encoding": "identity"})
+        as_csv = await ac.get("/task/export", params={"format": "csv"},
+                              headers={**headers, "Accept-Encoding": "identity"})
+        compressed = await ac.get("/task/export", headers={**headers, "Accept-Encoding": "gzip"})
+
+    rows = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="tasks.ndjson"' in ndjson.headers["content-disposition"]
+    assert [row["id"] for row in rows] == ids
+    assert rows[0] == {"id": ids[0], "title": 'task, "0"', "description": "exported", "completed": False,
+                       "due_date": "2030-01-01T00:00:00", "creation_date": "2024-01-01T00:00:00"}
+
+    records = list(csv.reader(io.StringIO(as_csv.text)))
+    assert as_csv.headers["content-type"].startswith("text/csv")
+    assert records[0] == list(export.EXPORT_COLUMNS)
+    assert [int(record[0]) for record in records[1:]] == ids and records[1][1] == 'task, "0"'
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.text == ndjson.text
+
+
+@pytest.mark.asyncio
+async def test_export_of_a_user_without_tasks_is_empty():
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}',
+               "Accept-Encoding": "identity"}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        ndjson = await ac.get("/task/export", headers=headers)
+        as_csv = await ac.get("/task/export", params={"format": "csv"}, headers=headers)
+
+    assert ndjson.status_code == 200 and ndjson.content == b""
+    assert as_csv.text == ",".join(export.EXPORT_COLUMNS) + "\n"
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from tasks_app.auth.jwt import create_access_token
+from tasks_app.tasks import importer
+from conf_test_db import app
+
+TASK = {"title": "imported", "description": "from another tool",
+        "due_date": "2030-01-01T00:00:00", "creation_date": "2024-01-01T00:00:00"}
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@pytest.mark.asyncio
+async def test_csv_records_may_span_lines_and_chunks():
+    data = 'title,description\r\n"Café, ""quoted""","two\nlines"\nshort\n\nplain,row\n'.encode()
+    rows = [row async for rows in importer.csv_rows(chunked(data, 3)) for row in rows]
+
+    assert [line for line, _ in rows] == [2, 4, 6]
+    assert rows[0][1] == {"title": 'Café, "quoted"', "description": "two\nlines"}
+    assert str(rows[1][1]) == "expected 2 fields, found 1"
+    assert rows[2][1] == {"title": "plain", "description": "row"}
+
+
+@pytest.mark.asyncio
+async def test_import_loads_valid_rows_and_reports_the_rest():
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    lines = [
+        json.dumps({**TASK, "title": "first"}),
+        "{not json",
+        json.dumps({**TASK, "title": "x" * 51}),
+        "",
+        json.dumps({key: value for key, value in TASK.items() if key != "due_date"}),
+        json.dumps({**TASK, "title": "last", "due_date": "2030-01-01T02:00:00+02:00"}),
+    ]
+    body = ("\n".join(lines) + "\n").encode()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/task/import", headers=headers, content=chunked(body, 7))
+        tasks = (await ac.get("/task/", headers=headers, params={"limit": 10})).json()["items"]
+
+    result = response.json()
+    assert response.status_code == 200
+    assert result["imported"] == 2 and result["rejected"] == 3
+    assert [error["line"] for error in result["errors"]] == [2, 3, 5]
+    assert result["errors"][1]["errors"] == ["title: at most 50 characters"]
+    assert result["errors"][2]["errors"][0].startswith("due_date: ")
+    assert [task["title"] for task in tasks] == ["first", "last"]
+    assert tasks[1]["due_date"] == "2030-01-01T00:00:00"
+
+
+@pytest.mark.asyncio
+async def test_csv_import():
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    body = (
+        "title,description,due_date,creation_date\n"
+        'Buy milk,"skimmed, two bottles",2030-01-01T00:00:00,2024-01-01T00:00:00\n'
+        "Call the bank,about the card,not a date,2024-01-01T00:00:00\n"
+    )
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/task/import", params={"format": "csv"}, headers=headers, content=body)
+        tasks = (await ac.get("/task/", headers=headers)).json()["items"]
+
+    assert response.json()["imported"] == 1 and response.json()["rejected"] == 1
+    assert response.json()["errors"][0]["line"] == 3
+    assert [(task["title"], task["description"]) for task in tasks] == [("Buy milk", "skimmed, two bottles")]
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, func, insert, select
+
+from tasks_app.db_models.models import Task, User
+from tasks_app.tasks.services import SORT_COLUMNS, _keyset_segments, build_task_listing_query
+from conf_test_db import engine
+
+OWNER_ID = 900001
+
+
+@pytest.fixture(scope="module", autouse=True)
+def seeded_tasks():
+    """Give the planner realistic statistics: several owners, mostly incomplete, due dates around now"""
+    start = datetime.now() - timedelta(hours=10000)
+    owners = [OWNER_ID + offset for offset in range(4)]
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"id": owner, "name": "Planner", "email": f"planner{owner}@example.com", "password": "-"}
+            for owner in owners
+        ])
+        connection.execute(insert(Task), [
+            {
+                "title": f"task {number}",
+                "user_id": owners[number % len(owners)],
+                "completed": number % 10 == 0,
+                "due_date": start + timedelta(hours=number),
+                "creation_date": start - timedelta(minutes=number),
+            }
+            for number in range(20000)
+        ])
+        connection.exec_driver_sql("ANALYZE tasks")
+        first_id, last_id = connection.execute(
+            select(func.min(Task.id), func.max(Task.id)).where(Task.user_id.in_(owners))
+        ).one()
+    # A task id in the middle of the seeded ones, for cursors
+    yield (first_id + last_id) // 2
+    with engine.begin() as connection:
+        connection.execute(delete(User).where(User.id.in_(owners)))
+
+
+def explain(query) -> str:
+    compiled = query.limit(11).compile(dialect=engine.dialect)
+    with engine.connect() as connection:
+        # Forbid the plans that would hide a missing index on an almost empty test table
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        connection.exec_driver_sql("SET LOCAL enable_bitmapscan = off")
+        rows = connection.exec_driver_sql("EXPLAIN " + str(compiled), compiled.params).all()
+    return "\n".join(row[0] for row in rows)
+
+
+@pytest.mark.parametrize("order_by, direction, filters, index", [
+    ("creation_date", "asc", {}, "ix_tasks_user_id_creation_date_id"),
+    ("creation_date", "desc", {}, "ix_tasks_user_id_creation_date_id"),
+    ("due_date", "asc", {}, "ix_tasks_user_id_due_date_id"),
+    ("due_date", "desc", {}, "ix_tasks_user_id_due_date_id"),
+    ("creation_date", "asc", {"completed": True}, "ix_tasks_user_id_completed_creation_date_id"),
+    ("due_date", "asc", {"completed": False}, "ix_tasks_user_id_completed_due_date_id"),
+    ("due_date", "asc", {"overdue": True}, "ix_tasks_user_id_completed_due_date_id"),
+    ("due_date", "desc", {"due_after": datetime.now(), "due_before": datetime.now() + timedelta(days=7)},
+     "ix_tasks_user_id_due_date_id"),
+])
+def test_listing_is_an_ordered_index_range_scan(order_by, direction, filters, index):
+    plan = explain(build_task_listing_query(OWNER_ID, order_by, direction, **filters))
+    assert index in plan
+    assert "Sort" not in plan
+
+
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+def test_keyset_pages_are_ordered_index_range_scans(direction, seeded_tasks):
+    query = build_task_listing_query(OWNER_ID, "due_date", direction)
+    for position in (datetime(2030, 1, 1), None):
+        for segment in _keyset_segments(query, SORT_COLUMNS["due_date"], direction, position, seeded_tasks):
+            plan = explain(segment)
+            assert "ix_tasks_user_id_due_date_id" in plan
+            assert "Sort" not in plan
+
+
+def test_due_range_sorted_by_creation_date_uses_an_owner_index():
+    plan = explain(build_task_listing_query(OWNER_ID, "creation_date", "asc", due_before=datetime(2030, 1, 1)))
+    assert "Seq Scan" not in plan
+    assert "ix_tasks_user_id_" in plan
@@ -0,0 +1,47 @@
+import pytest
+from httpx import AsyncClient
+
+from tasks_app.auth.jwt import create_access_token
+from tasks_app.tasks import pagination
+from conf_test_db import app
+
+
+def test_cursor_round_trip():
+    cursor = pagination.encode_cursor({"order_by": "due_date", "value": None, "id": 7})
+    assert pagination.decode_cursor(cursor) == {"order_by": "due_date", "value": None, "id": 7}
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(pagination.InvalidCursor):
+        pagination.decode_cursor("not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_cover_every_task_once():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+        created = []
+        for day in (3, 1, 2, 1, 3):
+            response = await ac.post("/task/tasks/", headers=headers, json={
+                "title": f"task {day}",
+                "description": "paged",
+                "due_date": f"2030-01-0{day}T00:00:00",
+                "creation_date": "2024-01-01T00:00:00",
+            })
+            created.append(response.json()["id"])
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, "order_by": "due_date"}
+            if cursor:
+                params["cursor"] = cursor
+            response = await ac.get("/task/", params=params, headers=headers)
+            assert response.status_code == 200
+            page = response.json()
+            seen += [task["id"] for task in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+    assert sorted(seen) == sorted(created)
+    assert len(seen) == len(set(seen))
@@ -0,0 +1,61 @@
+import pytest
+from httpx import AsyncClient
+
+from tasks_app.auth.jwt import create_access_token
+from tasks_app.db_models.models import User
+from tasks_app.tasks import services
+from conf_test_db import app
+
+
+def task(title, description):
+    return {
+        "title": title, "description": description,
+        "due_date": "2030-01-01T00:00:00", "creation_date": "2024-01-01T00:00:00",
+    }
+
+
+def test_search_text_becomes_a_prefix_query():
+    assert services.prefix_tsquery("Buy mil") == "buy:* & mil:*"
+    assert services.prefix_tsquery("a|b & !c:*") == "a:* & b:* & c:*"
+    assert services.prefix_tsquery("Buy mil", "A") == "buy:*A & mil:*A"
+    assert services.prefix_tsquery(" -- ") is None
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_title_matches_first_and_pages_with_cursors():
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        in_description = (await ac.post("/task/tasks/", headers=headers,
+                                        json=task("Errands", "buy milk on the way home"))).json()["id"]
+        in_title = (await ac.post("/task/tasks/", headers=headers,
+                                  json=task("Buy milk", "and bread"))).json()["id"]
+        await ac.post("/task/tasks/", headers=headers, json=task("Call the bank", "about the card"))
+
+        typed = await ac.get("/task/search", params={"q": "mil"}, headers=headers)
+        first = await ac.get("/task/search", params={"q": "mil", "limit": 1}, headers=headers)
+        second = await ac.get("/task/search", params={"q": "mil", "limit": 1, "cursor": first.json()["next_cursor"]},
+                              headers=headers)
+        other_search = await ac.get("/task/search", params={"q": "bank", "cursor": first.json()["next_cursor"]},
+                                    headers=headers)
+        no_words = await ac.get("/task/search", params={"q": "!!"}, headers=headers)
+
+    assert [item["id"] for item in typed.json()["items"]] == [in_title, in_description]
+    assert [item["id"] for item in first.json()["items"]] == [in_title]
+    assert [item["id"] for item in second.json()["items"]] == [in_description]
+    assert second.json()["next_cursor"] is None
+    assert other_search.status_code == 400 and no_words.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_search_only_finds_the_callers_tasks(database):
+    database.add(User(name="Jane", email="jane@gmail.com", password_hash="-"))
+    await database.commit()
+    john = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    jane = {'Authorization': f'Bearer {create_access_token({"sub": "jane@gmail.com"})}'}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        await ac.post("/task/tasks/", headers=john, json=task("Quarterly report", "draft"))
+        johns = await ac.get("/task/search", params={"q": "quarter"}, headers=john)
+        janes = await ac.get("/task/search", params={"q": "quarter"}, headers=jane)
+
+    assert len(johns.json()["items"]) == 1
+    assert janes.json() == {"items": [], "next_cursor": None}
@@ -0,0 +1,50 @@
+import pytest
+from httpx import AsyncClient
+
+from tasks_app.auth.jwt import create_access_token
+from conf_test_db import app
+
+TASK = {
+    "title": "write", "description": "returning",
+    "due_date": "2030-01-01T00:00:00", "creation_date": "2024-01-01T00:00:00",
+}
+
+
+def statements(response):
+    # Server-Timing: db;dur=...;desc="N queries"
+    return int(response.headers["server-timing"].rsplit('desc="', 1)[1].split(" ")[0])
+
+
+@pytest.mark.asyncio
+async def test_single_task_writes_are_one_statement_each():
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        await ac.post("/task/tasks/", headers=headers, json=TASK)  # resolves and caches the user
+        created = await ac.post("/task/tasks/", headers=headers, json=TASK)
+        task_id = created.json()["id"]
+        updated = await ac.put(f"/task/tasks/{task_id}", headers=headers, json={**TASK, "title": "renamed"})
+        patched = await ac.patch(f"/task/{task_id}", headers=headers, json={"completed": True})
+        deleted = await ac.delete(f"/task/{task_id}", headers=headers)
+        missing = await ac.delete(f"/task/{task_id}", headers=headers)
+
+    assert created.status_code == 201 and statements(created) == 1
+    assert updated.json()["title"] == "renamed" and statements(updated) == 1
+    assert patched.json()["completed"] is True and statements(patched) == 1
+    assert deleted.json()["id"] == task_id and statements(deleted) == 1
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_patch_changes_only_the_given_fields():
+    headers = {'Authorization': f'Bearer {create_access_token({"sub": "john@gmail.com"})}'}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        task = (await ac.post("/task/tasks/", headers=headers, json=TASK)).json()
+        patched = await ac.patch(f"/task/{task['id']}", headers=headers, json={"due_date": None})
+        null_title = await ac.patch(f"/task/{task['id']}", headers=headers, json={"title": None})
+        empty = await ac.patch(f"/task/{task['id']}", headers=headers, json={})
+        missing = await ac.patch("/task/987654321", headers=headers, json={"completed": True})
+
+    assert patched.status_code == 200
+    assert patched.json() == {**task, "due_date": None}
+    assert null_title.status_code == 422 and empty.status_code == 422
+    assert missing.status_code == 404